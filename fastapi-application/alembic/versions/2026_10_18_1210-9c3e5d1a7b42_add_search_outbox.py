@@ -0,0 +1,60 @@
+"""add search outbox
+
+Revision ID: 9c3e5d1a7b42
+Revises: 2a595c3ac6a9
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c3e5d1a7b42"
+down_revision: Union[str, None] = "2a595c3ac6a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_outbox",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "available_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_search_outbox")),
+    )
+    op.create_index(
+        op.f("ix_search_outbox_product_id"),
+        "search_outbox",
+        ["product_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_search_outbox_available_at_id",
+        "search_outbox",
+        ["available_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_search_outbox_available_at_id", table_name="search_outbox")
+    op.drop_index(op.f("ix_search_outbox_product_id"), table_name="search_outbox")
+    op.drop_table("search_outbox")
@@ -0,0 +1,30 @@
+"""add search_outbox.partial
+
+Revision ID: 4f1b7e2c9a63
+Revises: 9c3e5d1a7b42
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f1b7e2c9a63"
+down_revision: Union[str, None] = "9c3e5d1a7b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "search_outbox",
+        sa.Column("partial", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("search_outbox", "partial")
@@ -0,0 +1,87 @@
+"""add products full-text search (tsvector + pg_trgm)
+
+Revision ID: b7d2e4f61c08
+Revises: 4f1b7e2c9a63
+Create Date: 2026-10-18 17:00:00.000000
+
+Цена записи: search_ru / search_en — STORED-колонки, каждый INSERT и UPDATE
+title/description пересчитывает два to_tsvector и обновляет три GIN-индекса
+(GIN копит изменения в pending list, поэтому вставки дешевле, чем кажется,
+но VACUUM и autovacuum работают больше). Массовые обновления только цен и
+остатков колонки не трогают — генерируемая колонка пересчитывается, лишь
+когда меняются её исходные поля.
+
+Держим их всегда, даже при search.backend = "elasticsearch":
+  - ix_products_title_trgm обслуживает деградированную выдачу
+    (pg_backend.fallback_search/fallback_suggest), пока breaker ES открыт, —
+    без него это последовательный скан таблицы в самый неудачный момент;
+  - tsvector-индексы позволяют переключить search.backend на "postgres"
+    настройкой, без миграции и многочасового построения индекса на проде.
+Если Postgres-бэкенд не нужен, ix_products_search_ru/en и сами колонки
+можно удалить отдельной миграцией; триграммный индекс нужен fallback'у.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d2e4f61c08"
+down_revision: Union[str, None] = "4f1b7e2c9a63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _tsvector(config: str) -> str:
+    return (
+        f"setweight(to_tsvector('{config}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce(description, '')), 'B')"
+    )
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "products",
+        sa.Column(
+            "search_ru",
+            postgresql.TSVECTOR(),
+            sa.Computed(_tsvector("russian"), persisted=True),
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        "products",
+        sa.Column(
+            "search_en",
+            postgresql.TSVECTOR(),
+            sa.Computed(_tsvector("english"), persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_products_search_ru", "products", ["search_ru"], unique=False, postgresql_using="gin"
+    )
+    op.create_index(
+        "ix_products_search_en", "products", ["search_en"], unique=False, postgresql_using="gin"
+    )
+    op.create_index(
+        "ix_products_title_trgm",
+        "products",
+        ["title"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_title_trgm", table_name="products")
+    op.drop_index("ix_products_search_en", table_name="products")
+    op.drop_index("ix_products_search_ru", table_name="products")
+    op.drop_column("products", "search_en")
+    op.drop_column("products", "search_ru")
+    # pg_trgm не удаляем: расширением могут пользоваться и другие объекты БД
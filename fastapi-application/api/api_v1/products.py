@@ -1,3 +1,4 @@
+import logging
 from typing import Annotated
 from fastapi import (
     APIRouter,
@@ -7,20 +8,31 @@ from fastapi import (
     File,
     Query,
 )
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.api_v1.deps import get_current_user_optional, get_current_superuser
 from core.models import db_helper
 from core.models.user import User
+from utils import encode_cursor, decode_cursor
+from core.cache.products_count import get_products_total
+from core.cache.products_cache import (
+    assemble_product,
+    assemble_products_many,
+    load_product_cards_from_db,
+)
 from core.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductReadUser,
     ProductReadSuperuser,
+    ProductSearchItemUser,
+    ProductSearchItemSuperuser,
+    ProductMultiSearch,
 )
 from crud.products import (
-    get_all_products,
     get_products_with_pagination,
+    get_products_after_id,
     get_product_by_id,
     create_product,
     update_product,
@@ -32,29 +44,66 @@ from crud.products import (
 )
 
 # ▶️ Поиск (ES)
-from elasticsearch import AsyncElasticsearch
-from core.search.es import get_client, index_alias
-from crud.products_search import search_products as search_products_crud
-from core.search.indexer import index_product as es_index_product
+from core.search.backend import SearchBackend, SearchQueryError
+from core.search.reindex import create_reindex_job, get_reindex_job
+from crud.products_search import (
+    Hydration,
+    get_search_backend,
+    msearch_products,
+    search_products as search_products_crud,
+    suggest_titles,
+)
+from tasks import rebuild_search_index, reindex_products
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Product"])
 
+BATCH_MAX_IDS = 200
+MSEARCH_MAX_QUERIES = 10
+
+
+def _project_product(obj, is_admin: bool) -> ProductReadUser | ProductReadSuperuser:
+    """Проекция под роль: ORM-модель или dict карточки из кэша."""
+    schema = ProductReadSuperuser if is_admin else ProductReadUser
+    return schema.model_validate(obj, from_attributes=True)
+
 
 @router.get("", summary="Список продуктов с пагинацией")
 async def get_products(
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
     current_user: Annotated[User | None, Depends(get_current_user_optional)],
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Устаревший режим; предпочтительнее cursor"),
+    cursor: str | None = Query(None, description="next_cursor из предыдущего ответа"),
+    include_total: bool = Query(True, description="Считать ли общее количество"),
 ):
-    products, total = await get_products_with_pagination(
-        session=session, limit=limit, offset=offset
-    )
+    if offset and cursor is None:
+        # Старый режим OFFSET/LIMIT — оставлен для обратной совместимости
+        products, total, total_is_estimate = await get_products_with_pagination(
+            session=session, limit=limit, offset=offset, include_total=include_total
+        )
+        next_after_id = products[-1].id if len(products) == limit else None
+    else:
+        after_id = None
+        if cursor is not None:
+            try:
+                after_id = int(decode_cursor(cursor)["id"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPException(status_code=400, detail="Невалидный курсор")
+        products, next_after_id = await get_products_after_id(
+            session=session, limit=limit, after_id=after_id
+        )
+        total, total_is_estimate = None, False
+        if include_total:
+            total, total_is_estimate = await get_products_total(session)
 
     is_admin = bool(current_user and current_user.is_superuser)
 
     return {
         "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": encode_cursor({"id": next_after_id}) if next_after_id else None,
         "items": [
             ProductReadSuperuser.model_validate(p, from_attributes=True)
             if is_admin
@@ -66,34 +115,183 @@ async def get_products(
 
 @router.get(
     "/search",
-    summary="Поиск по товарам (Elasticsearch: title/description/category)",
+    summary="Поиск по товарам (Elasticsearch или Postgres — settings.search.backend)",
 )
 async def search_products_endpoint(
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
-    es: Annotated[AsyncElasticsearch, Depends(get_client)],
+    backend: Annotated[SearchBackend, Depends(get_search_backend)],
     current_user: Annotated[User | None, Depends(get_current_user_optional)],
     q: str = Query("", description="Строка поиска"),
     category_id: int | None = Query(None, description="Фильтр по категории"),
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Устаревший режим; предпочтительнее cursor"),
+    cursor: str | None = Query(None, description="next_cursor из предыдущего ответа"),
+    include_total: bool = Query(True, description="Считать ли количество совпадений"),
+    hydrate: Hydration | None = Query(
+        None, description="Источник карточек: source | cache | db (по умолчанию из настроек)"
+    ),
+    price_min: int | None = Query(None, ge=0, description="Цена от (retail_price)"),
+    price_max: int | None = Query(None, ge=0, description="Цена до (retail_price)"),
+    in_stock: bool | None = Query(None, description="Только в наличии / только отсутствующие"),
+    attr: list[str] = Query([], description="Фильтр по атрибуту: attribute_id:значение, можно несколько"),
+    facets: bool = Query(False, description="Добавить фасеты (только для первой страницы)"),
 ):
-    models, total = await search_products_crud(
-        session=session,
-        es=es,
-        q=q,
-        category_id=category_id,
-        limit=limit,
-        offset=offset,
+    payload = None
+    if cursor is not None:
+        try:
+            payload = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Невалидный курсор")
+
+    attrs: list[tuple[int, str]] = []
+    for item in attr:
+        attribute_id, sep, value = item.partition(":")
+        if not sep or not value or not attribute_id.strip().isdigit():
+            raise HTTPException(status_code=400, detail=f"attr должен быть вида attribute_id:значение, получено {item!r}")
+        attrs.append((int(attribute_id), value))
+
+    is_admin = bool(current_user and current_user.is_superuser)
+    try:
+        cards, total, total_relation, next_payload, facet_data, degraded = await search_products_crud(
+            session=session,
+            backend=backend,
+            q=q,
+            category_id=category_id,
+            limit=limit,
+            offset=offset,
+            cursor=payload,
+            include_total=include_total,
+            hydrate=hydrate,
+            include_inactive=is_admin,
+            price_min=price_min,
+            price_max=price_max,
+            in_stock=in_stock,
+            attrs=attrs,
+            facets=facets,
+        )
+    except SearchQueryError as exc:
+        raise _query_error_response(exc) from exc
+
+    return _search_response(
+        cards, total, total_relation, next_payload, facet_data, degraded, is_admin=is_admin
     )
 
+
+def _query_error_response(exc: SearchQueryError) -> HTTPException:
+    """Бэкенд отклонил запрос: 4xx — ошибка клиента (400), 404 — нет индекса, поиск не готов (503)."""
+    if exc.status == 404:
+        log.error("Поисковый индекс не найден: %s", exc)
+        return HTTPException(status_code=503, detail="Поиск временно недоступен, повторите позже")
+    return HTTPException(status_code=400, detail=str(exc))
+
+
+def _search_response(
+    cards, total, total_relation, next_payload, facet_data, degraded, *, is_admin: bool
+) -> dict:
+    schema = ProductSearchItemSuperuser if is_admin else ProductSearchItemUser
+    return {
+        "total": total,
+        # "eq" — точное число, "gte" — не меньше total (упёрлись в search_track_total_hits)
+        "total_relation": total_relation,
+        "next_cursor": encode_cursor(next_payload) if next_payload else None,
+        "items": [schema.model_validate(card) for card in cards],
+        "facets": facet_data,
+        # true — Elasticsearch недоступен, упрощённый поиск по названию (без total/фасетов/курсора)
+        "degraded": degraded,
+    }
+
+
+@router.post("/msearch", summary="Несколько поисков за один запрос (страница каталога)")
+async def msearch_products_endpoint(
+    body: ProductMultiSearch,
+    session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
+    backend: Annotated[SearchBackend, Depends(get_search_backend)],
+    current_user: Annotated[User | None, Depends(get_current_user_optional)],
+):
+    """
+    queries — те же параметры, что у GET /search; ответы — в том же порядке.
+    Первые страницы уходят в поисковый бэкенд одним _msearch, карточки всех
+    выдач собираются одним походом в кэш/БД. Запрос, который бэкенд отклонил
+    (4xx), не валит остальные: на его месте {"error": {"status", "detail"}}.
+    """
+    if len(body.queries) > MSEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400, detail=f"Не больше {MSEARCH_MAX_QUERIES} запросов за раз"
+        )
+
+    specs = []
+    for n, spec in enumerate(body.queries):
+        params = spec.model_dump(exclude={"attrs"})
+        params["attrs"] = [(a.attribute_id, a.value) for a in spec.attrs]
+        if spec.cursor is not None:
+            try:
+                params["cursor"] = decode_cursor(spec.cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Невалидный курсор в запросе {n}")
+        specs.append(params)
+
     is_admin = bool(current_user and current_user.is_superuser)
-    items = [
-        ProductReadSuperuser.model_validate(p, from_attributes=True)
-        if is_admin
-        else ProductReadUser.model_validate(p, from_attributes=True)
-        for p in models
-    ]
-    return {"total": total, "items": items}
+    try:
+        results = await msearch_products(
+            session, backend, specs, hydrate=body.hydrate, include_inactive=is_admin
+        )
+    except SearchQueryError as exc:
+        # Отклонена вся пачка (а не отдельный запрос в ней)
+        raise _query_error_response(exc) from exc
+    return {
+        "results": [
+            {"error": {"status": result.status, "detail": str(result)}}
+            if isinstance(result, SearchQueryError)
+            else _search_response(*result, is_admin=is_admin)
+            for result in results
+        ]
+    }
+
+
+@router.get("/suggest", summary="Автодополнение по названию товара")
+async def suggest_products_endpoint(
+    session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
+    backend: Annotated[SearchBackend, Depends(get_search_backend)],
+    prefix: str = Query(..., max_length=100, description="Начало названия"),
+    limit: int = Query(10, ge=1, le=100, description="Не больше es.suggest_max_size"),
+):
+    try:
+        items = await suggest_titles(session, backend, prefix=prefix, limit=limit)
+    except SearchQueryError as exc:
+        raise _query_error_response(exc) from exc
+    return {"items": items}
+
+
+@router.get("/batch", summary="Карточки нескольких товаров за один запрос")
+async def read_products_batch(
+    session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
+    current_user: Annotated[User | None, Depends(get_current_user_optional)],
+    ids: str = Query(..., description="id товаров через запятую, например 1,2,3"),
+):
+    try:
+        product_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids должны быть целыми числами")
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="Не передано ни одного id")
+    if len(product_ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Не больше {BATCH_MAX_IDS} id за запрос"
+        )
+
+    try:
+        cards = await assemble_products_many(product_ids, session)
+    except RedisError:
+        log.warning("Redis недоступен, пакет карточек читаем из БД", exc_info=True)
+        cards = await load_product_cards_from_db(product_ids, session)
+
+    is_admin = bool(current_user and current_user.is_superuser)
+    return {
+        "items": [
+            _project_product(cards[pid], is_admin) for pid in product_ids if pid in cards
+        ],
+        "missing": [pid for pid in product_ids if pid not in cards],
+    }
 
 
 @router.post(
@@ -105,11 +303,8 @@ async def create_product_endpoint(
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
     current_superuser: Annotated[User, Depends(get_current_superuser)],
     product_create: ProductCreate,
-    es: Annotated[AsyncElasticsearch, Depends(get_client)],
 ):
-    product = await create_product(
-        session=session, product_create=product_create, es=es
-    )
+    product = await create_product(session=session, product_create=product_create)
     return ProductReadSuperuser.model_validate(product, from_attributes=True)
 
 
@@ -119,17 +314,26 @@ async def read_product(
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
     current_user: Annotated[User | None, Depends(get_current_user_optional)],
 ):
-    product = await get_product_by_id(session=session, product_id=product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Продукт не найден")
-
     is_admin = bool(current_user and current_user.is_superuser)
 
-    return (
-        ProductReadSuperuser.model_validate(product, from_attributes=True)
-        if is_admin
-        else ProductReadUser.model_validate(product, from_attributes=True)
-    )
+    # Карточка из версионированного кэша: на попадании Postgres не трогаем
+    cache_ok = True
+    try:
+        card = await assemble_product(product_id, session)
+    except RedisError:
+        log.warning("Redis недоступен, карточку %s читаем из БД", product_id, exc_info=True)
+        card, cache_ok = None, False
+
+    if card is not None:
+        return _project_product(card, is_admin)
+
+    # Неактивные/удалённые товары в кэш не попадают — их видит только админ
+    if is_admin or not cache_ok:
+        product = await get_product_by_id(session=session, product_id=product_id)
+        if product and (is_admin or (not product.is_deleted and product.is_active)):
+            return _project_product(product, is_admin)
+
+    raise HTTPException(status_code=404, detail="Продукт не найден")
 
 
 @router.patch(
@@ -142,13 +346,11 @@ async def update_product_endpoint(
     update_data: ProductUpdate,
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
     current_superuser: Annotated[User, Depends(get_current_superuser)],
-    es: Annotated[AsyncElasticsearch, Depends(get_client)],
 ):
     updated_product = await update_product(
         session=session,
         product_id=product_id,
         update_data=update_data.model_dump(exclude_unset=True),
-        es=es,
     )
     return ProductReadSuperuser.model_validate(updated_product, from_attributes=True)
 
@@ -158,9 +360,8 @@ async def delete_product_endpoint(
     product_id: int,
     session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
     current_superuser: Annotated[User, Depends(get_current_superuser)],
-    es: Annotated[AsyncElasticsearch, Depends(get_client)],
 ):
-    success = await delete_product(session=session, product_id=product_id, es=es)
+    success = await delete_product(session=session, product_id=product_id)
     if not success:
         raise HTTPException(status_code=404, detail="Продукт не найден")
     return {"message": "Продукт удален"}
@@ -239,12 +440,36 @@ async def get_product_images_endpoint(
     summary="Переиндексировать все товары (только для суперпользователя)",
 )
 async def reindex_all_products(
-    session: Annotated[AsyncSession, Depends(db_helper.session_getter)],
-    es: Annotated[AsyncElasticsearch, Depends(get_client)],
     current_superuser: Annotated[User, Depends(get_current_superuser)],
 ):
-    products = await get_all_products(session)
-    for p in products:
-        await es_index_product(es, p)
-    await es.indices.refresh(index=index_alias())
-    return {"indexed": len(products)}
+    # Сама индексация — в воркере taskiq, потоково и пачками (core/search/reindex.py)
+    job_id = await create_reindex_job()
+    await reindex_products.kiq(job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.post(
+    "/reindex/rebuild",
+    summary="Пересобрать индекс с новым маппингом без простоя (только для суперпользователя)",
+)
+async def rebuild_search_index_endpoint(
+    current_superuser: Annotated[User, Depends(get_current_superuser)],
+):
+    # products_v{N+1} -> заливка -> сверка -> атомарное переключение алиаса
+    job_id = await create_reindex_job()
+    await rebuild_search_index.kiq(job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get(
+    "/reindex/{job_id}",
+    summary="Прогресс переиндексации (только для суперпользователя)",
+)
+async def reindex_status(
+    job_id: str,
+    current_superuser: Annotated[User, Depends(get_current_superuser)],
+):
+    job = await get_reindex_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
@@ -8,10 +8,16 @@ def product_ver(product_id: int) -> str:
     """Версия стабильной части товара."""
     return f"product:{product_id}:ver"
 
-def product_card(product_id: int, version: int) -> str:
+VERSION_PLACEHOLDER = "{ver}"
+
+def product_card(product_id: int, version: int | str) -> str:
     """Карточка товара (контент). Версионируется по product_ver()."""
     return f"product:{product_id}:v{version}:card"
 
+def product_card_template(product_id: int) -> str:
+    """Ключ карточки без версии: её подставляет Lua-скрипт на стороне Redis."""
+    return product_card(product_id, VERSION_PLACEHOLDER)
+
 def product_price(product_id: int) -> str:
     """Динамика (цены и остатки) для товара."""
     return f"product:{product_id}:pricing_stock"
@@ -19,3 +25,51 @@ def product_price(product_id: int) -> str:
 def lock_key(key: str) -> str:
     """Ключ для блокировки при обновлении."""
     return f"lock:{key}"
+
+def products_count() -> str:
+    """Счётчик неудалённых товаров (для total в листингах)."""
+    return "products:count"
+
+def l1_invalidation_channel() -> str:
+    """Pub/sub-канал: рассылка инвалидаций in-process (L1) кэша по воркерам."""
+    return "product:l1:invalidate"
+
+def warmup_lock() -> str:
+    """Блокировка прогрева кэша: после деплоя прогревает один воркер, а не все."""
+    return "products:warmup:lock"
+
+def reindex_job(job_id: str) -> str:
+    """Прогресс задачи полной переиндексации ES (hash)."""
+    return f"search:reindex:{job_id}"
+
+def reindex_job_errors(job_id: str) -> str:
+    """Ошибки по документам задачи переиндексации (list, с ограничением длины)."""
+    return f"search:reindex:{job_id}:errors"
+
+def rebuild_lock() -> str:
+    """Пересборка индекса ES: не больше одной одновременно."""
+    return "search:rebuild:lock"
+
+def rebuild_dirty() -> str:
+    """id товаров, изменённых во время пересборки (set) — доиграть в новый индекс."""
+    return "search:rebuild:dirty"
+
+def search_generation() -> str:
+    """Поколение поискового индекса: INCR после переиндексации/пересборки."""
+    return "search:gen"
+
+def search_result(digest: str) -> str:
+    """Кэш выдачи /products/search (id + total) по хэшу нормализованного запроса."""
+    return f"search:res:{digest}"
+
+def search_suggest(digest: str) -> str:
+    """Кэш подсказок /products/suggest по хэшу нормализованного префикса."""
+    return f"search:suggest:{digest}"
+
+def reconcile_lock() -> str:
+    """Сверка индекса ES с Postgres: не больше одной одновременно."""
+    return "search:reconcile:lock"
+
+def reconcile_report() -> str:
+    """Отчёт последней сверки ES с Postgres (JSON) — из него приложение берёт метрики."""
+    return "search:reconcile:last"
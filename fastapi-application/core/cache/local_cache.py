@@ -0,0 +1,149 @@
+"""
+In-process (L1) кэш перед Redis: свой в каждом воркере gunicorn.
+
+Держит уже декодированные карточки, поэтому горячий товар отдаётся
+без сетевых походов вообще. Согласованность между воркерами —
+через Redis pub/sub: bump_product_version/invalidate_dynamic публикуют
+"<family>:<product_id>", а фоновый слушатель выкидывает запись из L1.
+TTL у L1 короткий — это страховка на случай потерянного сообщения.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from core.cache.keys import l1_invalidation_channel
+from core.cache.metrics import L1_INVALIDATIONS, L1_REQUESTS
+from core.cache.redis_client import get_redis
+from core.config import settings
+
+log = logging.getLogger(__name__)
+
+CARD = "card"
+PRICE = "price"
+
+
+class LocalTTLCache:
+    """Ограниченный LRU с TTL на запись. Не потокобезопасен — только для event loop."""
+
+    def __init__(self, family: str, max_items: int, ttl: float) -> None:
+        self.family = family
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data: OrderedDict[int, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: int) -> Any | None:
+        if self.max_items <= 0:
+            return None
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            L1_REQUESTS.labels(self.family, "miss").inc()
+            return None
+        self._data.move_to_end(key)
+        L1_REQUESTS.labels(self.family, "hit").inc()
+        return item[1]
+
+    def set(self, key: int, value: Any, ttl: float | None = None) -> None:
+        if self.max_items <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def pop(self, key: int) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+product_cards_l1 = LocalTTLCache(
+    CARD, settings.redis.local_max_items, settings.redis.local_card_ttl
+)
+product_prices_l1 = LocalTTLCache(
+    PRICE, settings.redis.local_max_items, settings.redis.local_price_ttl
+)
+
+_CACHES = {CARD: product_cards_l1, PRICE: product_prices_l1}
+
+
+def clear_all() -> None:
+    for cache in _CACHES.values():
+        cache.clear()
+
+
+def apply_invalidation(message: str | bytes) -> None:
+    """Формат сообщения: "<family>:<product_id>"."""
+    if isinstance(message, bytes):
+        message = message.decode()
+    family, _, raw_id = message.partition(":")
+    cache = _CACHES.get(family)
+    if cache is None or not raw_id.isdigit():
+        return
+    cache.pop(int(raw_id))
+    L1_INVALIDATIONS.labels(family).inc()
+
+
+def invalidation_message(family: str, product_id: int) -> str:
+    return f"{family}:{product_id}"
+
+
+# =========================
+# СЛУШАТЕЛЬ PUB/SUB
+# =========================
+
+_listener_task: asyncio.Task | None = None
+
+
+async def _listen() -> None:
+    delay = 0.5
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(l1_invalidation_channel())
+            # Пока не были подписаны, могли пропустить инвалидации
+            clear_all()
+            delay = 0.5
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.warning("L1: потеряна подписка на инвалидации, переподключаемся", exc_info=True)
+            clear_all()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+        finally:
+            if pubsub is not None:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+
+
+def start_invalidation_listener() -> None:
+    """Вызывать на старте воркера (lifespan)."""
+    global _listener_task
+    if settings.redis.local_max_items <= 0 or _listener_task is not None:
+        return
+    _listener_task = asyncio.create_task(_listen(), name="product-l1-invalidation")
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _listener_task
+    _listener_task = None
@@ -0,0 +1,102 @@
+"""
+Серверные Lua-скрипты кэша товаров.
+Загружаются один раз на старте (SCRIPT LOAD) и вызываются через EVALSHA;
+если Redis перезапустился и скрипт пропал, AsyncScript сам сделает EVAL.
+"""
+
+import logging
+
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+from core.cache.redis_client import get_cache_redis
+
+# Один поход в Redis на быстрый путь read-aside:
+# версия -> значение -> метаданные stale/expire -> попытка взять lock.
+# Формат записи — см. core/cache/serializers.py (stale/expire в заголовке).
+#
+# KEYS[1] — ключ версии (необязателен: у динамики версии нет)
+# ARGV[1] — ключ значения; "{ver}" заменяется на текущую версию
+# ARGV[2] — now (сек), ARGV[3] — race (сек), ARGV[4] — lock_ttl (сек)
+# ARGV[5] — префикс ключа блокировки (lock_key(""))
+# ARGV[6] — множитель XFetch: beta * -ln(rand) (0 — без раннего обновления).
+#           Случайное число генерируем в Python: в Lua math.random детерминирован.
+#
+# Ключ значения вычисляется внутри скрипта, поэтому в Redis Cluster
+# скрипт не годится — у нас одиночный инстанс.
+#
+# Ответ: {ver, key, raw | nil, stale_at | nil, expire_at | nil, locked}
+FETCH_ENTRY = """
+-- Нет ключа версии = версия 0: первый INCR в bump_product_version даст 1
+local ver = '0'
+if #KEYS > 0 then
+    ver = redis.call('GET', KEYS[1]) or '0'
+end
+local key = string.gsub(ARGV[1], '{ver}', ver)
+local now = tonumber(ARGV[2])
+
+local function u32(s, i)
+    local a, b, c, d = string.byte(s, i, i + 3)
+    return ((a * 256 + b) * 256 + c) * 256 + d
+end
+
+local raw = redis.call('GET', key)
+local stale_at, expire_at = false, false
+local delta_ms = 0
+if raw and string.byte(raw, 1) == 0xC1 and #raw >= 11 then
+    -- бинарный заголовок: magic, format, flags, stale_at:u32, expire_at:u32[, delta_ms:u32]
+    stale_at, expire_at = u32(raw, 4), u32(raw, 8)
+    if string.byte(raw, 2) >= 2 and #raw >= 15 then
+        delta_ms = u32(raw, 12)
+    end
+elseif raw then
+    -- старый формат: JSON-обёртка
+    local ok, obj = pcall(cjson.decode, raw)
+    if ok and type(obj) == 'table' and obj['stale_at'] and obj['expire_at'] then
+        stale_at = tonumber(obj['stale_at'])
+        expire_at = tonumber(obj['expire_at'])
+    else
+        local pttl = redis.call('PTTL', key)
+        if pttl > 0 then
+            expire_at = now + math.floor(pttl / 1000)
+            stale_at = math.max(now, expire_at - math.max(1, tonumber(ARGV[3])))
+        end
+    end
+end
+
+-- XFetch: свежая запись, но пора обновить заранее
+local early = false
+local factor = tonumber(ARGV[6])
+if raw and stale_at and now <= stale_at and factor > 0 and delta_ms > 0 then
+    early = now + delta_ms / 1000 * factor >= stale_at
+end
+
+local locked = 0
+if (not raw) or (not stale_at) or now > stale_at or early then
+    if redis.call('SET', ARGV[5] .. key, '1', 'EX', ARGV[4], 'NX') then
+        locked = 1
+    end
+end
+
+return {ver, key, raw, stale_at, expire_at, locked}
+"""
+
+log = logging.getLogger(__name__)
+
+_fetch_entry: AsyncScript | None = None
+
+
+def fetch_entry_script() -> AsyncScript:
+    global _fetch_entry
+    if _fetch_entry is None:
+        _fetch_entry = get_cache_redis().register_script(FETCH_ENTRY)
+    return _fetch_entry
+
+
+async def load_scripts() -> None:
+    """Вызывать на старте приложения: прогреваем кэш скриптов в Redis."""
+    try:
+        await get_cache_redis().script_load(FETCH_ENTRY)
+    except RedisError:
+        # Не валим старт: AsyncScript загрузит скрипт при первом вызове
+        log.warning("Не удалось загрузить Lua-скрипты кэша", exc_info=True)
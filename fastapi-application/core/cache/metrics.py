@@ -0,0 +1,107 @@
+"""
+Prometheus-метрики кэша товаров.
+Отдаются тем же /metrics, что и метрики prometheus_fastapi_instrumentator
+(общий REGISTRY по умолчанию).
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# family: card | price
+# (для пакетных операций assemble_products_many/прогрева — many)
+
+# Обращения к Redis-кэшу (L2):
+#   fresh_hit — значение свежее; stale_hit — протухло, но в race window
+#   (или XFetch решил обновить заранее) — отдали старое; miss — значения нет.
+CACHE_REQUESTS = Counter(
+    "product_cache_requests_total",
+    "Обращения к Redis-кэшу товаров",
+    ["family", "result"],
+)
+
+# Lock на перезагрузку значения: acquired — грузим мы;
+# contended — lock уже у другого запроса/воркера (всплеск — признак stampede)
+CACHE_LOCKS = Counter(
+    "product_cache_lock_total",
+    "Попытки взять lock на обновление значения кэша",
+    ["family", "outcome"],
+)
+
+LOADER_LATENCY = Histogram(
+    "product_cache_loader_seconds",
+    "Сколько заняла загрузка значения из Postgres при промахе",
+    ["family"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+PAYLOAD_SIZE = Histogram(
+    "product_cache_payload_bytes",
+    "Размер записи, положенной в Redis (после кодека и сжатия)",
+    ["family"],
+    buckets=(64, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144),
+)
+
+# op: fetch (Lua) | poll | store | mget | pipeline
+REDIS_RTT = Histogram(
+    "product_cache_redis_seconds",
+    "Время round trip до Redis по операциям кэша товаров",
+    ["family", "op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+L1_REQUESTS = Counter(
+    "product_cache_l1_requests_total",
+    "Обращения к in-process (L1) кэшу товаров",
+    ["family", "result"],  # result: hit | miss
+)
+
+L1_INVALIDATIONS = Counter(
+    "product_cache_l1_invalidations_total",
+    "Инвалидации L1-кэша, пришедшие через Redis pub/sub",
+    ["family"],
+)
+
+# Single-flight при промахах:
+#   joined         — дождались in-flight загрузки в этом же воркере;
+#   remote_filled  — другой воркер положил значение, пока мы ждали;
+#   remote_gave_up — дедлайн вышел или lock отпущен без значения: грузим сами.
+SINGLEFLIGHT = Counter(
+    "product_cache_singleflight_total",
+    "Запросы, объединённые с уже идущей загрузкой значения",
+    ["family", "outcome"],
+)
+
+SINGLEFLIGHT_WAIT = Histogram(
+    "product_cache_singleflight_wait_seconds",
+    "Сколько ждали загрузку, которую делает другой воркер",
+    ["family"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Негативный кэш карточек: event — hit (отдали «надгробие») | store (положили)
+NEGATIVE_CACHE = Counter(
+    "product_cache_tombstones_total",
+    "Обращения к «надгробиям» несуществующих/неактивных товаров",
+    ["family", "event"],
+)
+
+# Прогрев кэша после деплоя/сброса Redis (последний прогон)
+WARMUP_DURATION = Gauge(
+    "product_cache_warmup_duration_seconds",
+    "Длительность последнего прогрева кэша товаров",
+)
+
+WARMUP_PRODUCTS = Gauge(
+    "product_cache_warmup_products",
+    "Товары последнего прогрева: requested — кандидаты, warmed — положены в кэш",
+    ["result"],
+)
+
+WARMUP_COVERAGE = Gauge(
+    "product_cache_warmup_coverage_ratio",
+    "Доля кандидатов, которые удалось прогреть в последнем прогоне",
+)
+
+WARMUP_LAST_SUCCESS = Gauge(
+    "product_cache_warmup_last_success_timestamp_seconds",
+    "Unix-время последнего успешного прогрева",
+)
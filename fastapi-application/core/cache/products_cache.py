@@ -1,15 +1,47 @@
 import asyncio
-import json
+import functools
+import math
+import random
 import time
-from typing import Awaitable, Callable
+from typing import Awaitable, Callable, Iterable, Optional
 
+import redis.asyncio as aioredis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from core.cache.keys import lock_key, product_card, product_price, product_ver
-from core.cache.redis_client import get_redis
+from core.cache.keys import (
+    l1_invalidation_channel,
+    lock_key,
+    product_card,
+    product_card_template,
+    product_price,
+    product_ver,
+)
+from core.cache.local_cache import (
+    CARD,
+    PRICE,
+    invalidation_message,
+    product_cards_l1,
+    product_prices_l1,
+)
+from core.cache.lua import fetch_entry_script
+from core.cache.metrics import (
+    CACHE_LOCKS,
+    CACHE_REQUESTS,
+    LOADER_LATENCY,
+    NEGATIVE_CACHE,
+    PAYLOAD_SIZE,
+    REDIS_RTT,
+    SINGLEFLIGHT,
+    SINGLEFLIGHT_WAIT,
+)
+from core.cache.redis_client import get_cache_redis
 from core.cache.serializers import (
+    TOMBSTONE,
+    decode_entry,
+    encode_entry,
+    encode_tombstone,
     serialize_product_base,
     serialize_product_dynamic,
 )
@@ -26,27 +58,17 @@ def _now() -> int:
     return int(time.time())
 
 
-def _dumps(obj) -> str:
-    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
-
-
-def _loads(s: str | None):
-    return json.loads(s) if s else None
-
-
-async def _get_version(product_id: int) -> int:
-    r = get_redis()
-    ver = await r.get(product_ver(product_id))
-    return int(ver) if ver else 1
-
-
 async def bump_product_version(product_id: int) -> int:
     """
     Вызвать при изменении стабильной части товара:
     название/описание/фото/атрибуты/категория и т.п.
     """
-    r = get_redis()
-    ver = await r.incr(product_ver(product_id))
+    r = get_cache_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.incr(product_ver(product_id))
+        pipe.publish(l1_invalidation_channel(), invalidation_message(CARD, product_id))
+        ver, _ = await pipe.execute()
+    product_cards_l1.pop(product_id)
     return int(ver)
 
 
@@ -78,109 +100,294 @@ async def _load_product_dynamic_from_db(product_id: int, session: AsyncSession)
     return res.scalars().first()
 
 
+async def _load_products_many_from_db(
+    product_ids: list[int], session: AsyncSession
+) -> list[Product]:
+    """Один `WHERE id IN (...)` + selectin-загрузка связей пачкой."""
+    stmt = (
+        select(Product)
+        .options(
+            selectinload(Product.images),
+            selectinload(Product.attributes).selectinload(ProductAttributeValue.attribute),
+            selectinload(Product.category),
+        )
+        .where(Product.id.in_(product_ids))
+    )
+    res = await session.execute(stmt)
+    return list(res.scalars().all())
+
+
 # ======================================================================
 #  READ-ASIDE кэш с "race window"
 # ======================================================================
 
-async def _store_set(key: str, data: dict | object, ttl: int, race: int) -> None:
+def _pack(
+    family: str, data: dict | object, ttl: int, race: int, delta: float = 0.0
+) -> tuple[bytes, int]:
     """
-    Кладём значение с «окном гонки». Если пришла Pydantic-модель,
-    конвертируем её в dict через .model_dump().
+    Упаковываем значение с «окном гонки» -> (payload, ex для SET).
+    delta — сколько секунд заняла загрузка (нужна для XFetch).
+    Если пришла Pydantic-модель, конвертируем её в dict через .model_dump().
     """
     if hasattr(data, "model_dump"):
         data = data.model_dump(mode="json", exclude_none=True)
 
-    r = get_redis()
     now = _now()
-    payload = {
-        "data": data,
-        "stale_at": now + ttl,
-        "expire_at": now + ttl + race,
-    }
-    await r.set(key, _dumps(payload), ex=max(1, ttl + race))
+    payload = encode_entry(data, now + ttl, now + ttl + race, int(delta * 1000))
+    PAYLOAD_SIZE.labels(family).observe(len(payload))
+    return payload, max(1, ttl + race)
+
 
+def _unpack(raw: bytes | None) -> tuple[dict | None, int | None, int | None, int]:
+    return decode_entry(raw)
+
+
+def _xfetch_factor(family: str) -> float:
+    """
+    beta * -ln(rand) для XFetch; 0 — семейство живёт по фиксированному окну.
+    Запись обновляется заранее, если now + delta * factor >= stale_at.
+    """
+    policy = REFRESH_POLICY.get(family, "race_window")
+    if policy != "xfetch":
+        return 0.0
+    return settings.redis.xfetch_beta * -math.log(1.0 - random.random())
 
-async def _store_get(key: str, race: int) -> tuple[dict | None, int | None, int | None]:
-    r = get_redis()
-    raw = await r.get(key)
-    if not raw:
-        return None, None, None
 
-    obj = _loads(raw)
-    data = obj.get("data")
-    stale_at = obj.get("stale_at")
-    expire_at = obj.get("expire_at")
+async def _store_set(
+    family: str, key: str, data: dict | object, ttl: int, race: int, delta: float = 0.0
+) -> None:
+    payload, ex = _pack(family, data, ttl, race, delta)
+    r = get_cache_redis()
+    with REDIS_RTT.labels(family, "store").time():
+        await r.set(key, payload, ex=ex)
 
-    if stale_at is None or expire_at is None:
-        pttl = await r.pttl(key)  # мс
-        if pttl is None or pttl < 0:
-            return data, None, None
-        now = _now()
-        expire_at = now + int(pttl / 1000)
-        stale_at = max(now, expire_at - max(1, race))
 
-    return data, int(stale_at), int(expire_at)
+async def _store_tombstone(family: str, key: str, negative_ttl: int) -> None:
+    """Короткоживущее «надгробие» в том же ключе: товара нет или он неактивен."""
+    now = _now()
+    r = get_cache_redis()
+    with REDIS_RTT.labels(family, "store").time():
+        await r.set(key, encode_tombstone(now + negative_ttl, now + negative_ttl), ex=max(1, negative_ttl))
 
 
-async def _try_lock(lkey: str, lock_ttl: int) -> bool:
-    r = get_redis()
-    return bool(await r.set(lkey, "1", ex=max(1, lock_ttl), nx=True))
+async def _fetch_entry(
+    family: str, key: str, ver_key: str | None, race: int, lock_ttl: int, xfetch: float = 0.0
+) -> tuple[str, dict | None, int | None, int | None, bool]:
+    """
+    Один round trip через Lua: версия, значение, stale/expire и попытка
+    взять lock (если значение отсутствует, протухло или пора обновить
+    заранее по XFetch). Возвращает (фактический ключ, data, stale_at, expire_at, locked).
+    """
+    script = fetch_entry_script()
+    with REDIS_RTT.labels(family, "fetch").time():
+        _, real_key, raw, stale_at, expire_at, locked = await script(
+            keys=[ver_key] if ver_key else [],
+            args=[key, _now(), race, max(1, lock_ttl), lock_key(""), xfetch],
+            client=get_cache_redis(),
+        )
+    data, _, _, _ = _unpack(raw)
+    return (
+        real_key.decode(),
+        data,
+        int(stale_at) if stale_at is not None else None,
+        int(expire_at) if expire_at is not None else None,
+        bool(locked),
+    )
 
 
 async def _unlock(lkey: str) -> None:
-    r = get_redis()
+    r = get_cache_redis()
     await r.delete(lkey)
 
 
-async def _read_aside_cached(
+async def _poll_entry(family: str, key: str) -> tuple[dict | None, bool]:
+    """(data, lock всё ещё удерживается) — одним pipeline."""
+    r = get_cache_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.exists(lock_key(key))
+        with REDIS_RTT.labels(family, "poll").time():
+            raw, lock_held = await pipe.execute()
+    data, _, _, _ = _unpack(raw)
+    return data, bool(lock_held)
+
+
+async def _wait_for_other_worker(
+    *, family: str, key: str, wait: float
+) -> dict | None:
+    """
+    Lock держит другой воркер: ждём его результат с экспоненциальным
+    опросом до дедлайна. None — дождаться не удалось.
+    """
+    started = time.monotonic()
+    deadline = started + wait
+    delay = 0.02
+    try:
+        while True:
+            await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            data, lock_held = await _poll_entry(family, key)
+            if data is not None:
+                SINGLEFLIGHT.labels(family, "remote_filled").inc()
+                return data
+            if not lock_held or time.monotonic() >= deadline:
+                SINGLEFLIGHT.labels(family, "remote_gave_up").inc()
+                return None
+            delay = min(delay * 2, 0.5)
+    finally:
+        SINGLEFLIGHT_WAIT.labels(family).observe(time.monotonic() - started)
+
+
+async def _load_and_store(
+    *,
+    family: str,
+    key: str,
+    ttl: int,
+    race: int,
+    negative_ttl: int | None,
+    loader: Callable[[], Awaitable[dict | object | None]],
+) -> dict | object | None:
+    started = time.monotonic()
+    fresh = await loader()
+    delta = time.monotonic() - started
+    LOADER_LATENCY.labels(family).observe(delta)
+    if fresh is None:
+        if not negative_ttl:
+            return None
+        await _store_tombstone(family, key, negative_ttl)
+        return TOMBSTONE
+    if hasattr(fresh, "model_dump"):
+        fresh = fresh.model_dump(mode="json", exclude_none=True)
+    await _store_set(family, key, fresh, ttl, race, delta)
+    return fresh
+
+
+async def _read_aside_uncoalesced(
     *,
+    family: str,
     key: str,
+    ver_key: str | None,
     ttl: int,
     race: int,
     lock_ttl: int,
+    negative_ttl: int | None,
     loader: Callable[[], Awaitable[dict | object | None]],
-) -> dict | None:
-    """
-    Реализация схемы read-aside cache с race window.
-    """
-    data, stale_at, expire_at = await _store_get(key, race=race)
+) -> dict | object | None:
+    key, data, stale_at, expire_at, locked = await _fetch_entry(
+        family, key, ver_key, race=race, lock_ttl=lock_ttl, xfetch=_xfetch_factor(family)
+    )
     now = _now()
+    load = functools.partial(
+        _load_and_store,
+        family=family,
+        key=key,
+        ttl=ttl,
+        race=race,
+        negative_ttl=negative_ttl,
+        loader=loader,
+    )
 
     if data is not None and stale_at is not None and expire_at is not None:
-        if now <= stale_at:
+        if now <= stale_at and not locked:
+            CACHE_REQUESTS.labels(family, "fresh_hit").inc()
+            if data is TOMBSTONE:
+                NEGATIVE_CACHE.labels(family, "hit").inc()
             return data
         if now <= expire_at:
-            lkey = lock_key(key)
-            if await _try_lock(lkey, lock_ttl):
+            # Протухла (race window) или XFetch решил обновить заранее:
+            # обновляет тот, кто взял lock, остальные получают текущее значение
+            CACHE_REQUESTS.labels(family, "stale_hit").inc()
+            CACHE_LOCKS.labels(family, "acquired" if locked else "contended").inc()
+            if locked:
                 try:
-                    fresh = await loader()
-                    if fresh is not None:
-                        if hasattr(fresh, "model_dump"):
-                            fresh = fresh.model_dump(mode="json", exclude_none=True)
-                        await _store_set(key, fresh, ttl, race)
-                        return fresh
-                    return data
+                    fresh = await load()
+                    return fresh if fresh is not None else data
                 finally:
-                    await _unlock(lkey)
+                    await _unlock(lock_key(key))
             return data
 
     # Кэша нет или полностью протух
-    lkey = lock_key(key)
-    if await _try_lock(lkey, lock_ttl):
+    CACHE_REQUESTS.labels(family, "miss").inc()
+    CACHE_LOCKS.labels(family, "acquired" if locked else "contended").inc()
+    if locked:
         try:
-            fresh = await loader()
-            if fresh is None:
-                return None
-            if hasattr(fresh, "model_dump"):
-                fresh = fresh.model_dump(mode="json", exclude_none=True)
-            await _store_set(key, fresh, ttl, race)
-            return fresh
+            return await load()
         finally:
-            await _unlock(lkey)
+            await _unlock(lock_key(key))
+
+    # Значение прямо сейчас грузит другой воркер — ждём его, а не отдаём 404
+    data = await _wait_for_other_worker(
+        family=family, key=key, wait=settings.redis.singleflight_wait
+    )
+    if data is not None:
+        return data
+    return await load()
+
+
+# Загрузки в процессе в этом воркере: ключ -> future с результатом
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def _consume_exception(fut: asyncio.Future) -> None:
+    if not fut.cancelled():
+        fut.exception()
+
 
-    await asyncio.sleep(0.05)
-    data2, _, _ = await _store_get(key, race=race)
-    return data2
+async def _read_aside_cached(
+    *,
+    family: str,
+    key: str,
+    ver_key: str | None = None,
+    ttl: int,
+    race: int,
+    lock_ttl: int,
+    negative_ttl: int | None = None,
+    loader: Callable[[], Awaitable[dict | object | None]],
+) -> dict | None:
+    """
+    Реализация схемы read-aside cache с race window.
+    Если передан ver_key, в key подставляется версия ("{ver}") на стороне Redis.
+    Если передан negative_ttl, «не найдено» тоже кэшируется («надгробие»).
+
+    Single-flight: конкурентные запросы одного ключа в воркере делят одну
+    future; между воркерами — ждут того, кто взял lock (см. _wait_for_other_worker).
+    """
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        SINGLEFLIGHT.labels(family, "joined").inc()
+        try:
+            data = await asyncio.shield(inflight)
+            return None if data is TOMBSTONE else data
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise  # отменили нас самих
+            # Отменили запрос-лидер — грузим сами
+
+    fut = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(_consume_exception)
+    _inflight[key] = fut
+    try:
+        data = await _read_aside_uncoalesced(
+            family=family,
+            key=key,
+            ver_key=ver_key,
+            ttl=ttl,
+            race=race,
+            lock_ttl=lock_ttl,
+            negative_ttl=negative_ttl,
+            loader=loader,
+        )
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as exc:
+        fut.set_exception(exc)
+        raise
+    else:
+        fut.set_result(data)
+        return None if data is TOMBSTONE else data
+    finally:
+        if _inflight.get(key) is fut:
+            del _inflight[key]
 
 
 # =========================
@@ -195,14 +402,22 @@ PRICE_RACE = max(1, min(10, max(1, PRICE_TTL // 2)))    # до 10 сек race-о
 
 LOCK_TTL = settings.redis.lock_ttl
 
+NEGATIVE_TTL = settings.redis.negative_ttl
+
+REFRESH_POLICY = {
+    CARD: settings.redis.card_refresh_policy,
+    PRICE: settings.redis.price_refresh_policy,
+}
+
 
 # =========================
 # ПУБЛИЧНЫЕ ФУНКЦИИ
 # =========================
 
 async def get_product_base(product_id: int, session: AsyncSession) -> dict | None:
-    ver = await _get_version(product_id)
-    key = product_card(product_id, ver)
+    cached = product_cards_l1.get(product_id)
+    if cached is not None:
+        return cached
 
     async def _loader():
         p = await _load_product_base_from_db(product_id, session)
@@ -210,16 +425,26 @@ async def get_product_base(product_id: int, session: AsyncSession) -> dict | Non
             return None
         return serialize_product_base(p)
 
-    return await _read_aside_cached(
-        key=key,
+    data = await _read_aside_cached(
+        family=CARD,
+        key=product_card_template(product_id),
+        ver_key=product_ver(product_id),
         ttl=PRODUCT_TTL,
         race=PRODUCT_RACE,
         lock_ttl=LOCK_TTL,
+        negative_ttl=NEGATIVE_TTL,
         loader=_loader,
     )
+    if data is not None:
+        product_cards_l1.set(product_id, data)
+    return data
 
 
 async def get_product_dynamic(product_id: int, session: AsyncSession) -> dict | None:
+    cached = product_prices_l1.get(product_id)
+    if cached is not None:
+        return cached
+
     key = product_price(product_id)
 
     async def _loader():
@@ -228,13 +453,17 @@ async def get_product_dynamic(product_id: int, session: AsyncSession) -> dict |
             return None
         return serialize_product_dynamic(p)
 
-    return await _read_aside_cached(
+    data = await _read_aside_cached(
+        family=PRICE,
         key=key,
         ttl=PRICE_TTL,
         race=PRICE_RACE,
         lock_ttl=LOCK_TTL,
         loader=_loader,
     )
+    if data is not None:
+        product_prices_l1.set(product_id, data)
+    return data
 
 
 async def assemble_product(product_id: int, session: AsyncSession) -> dict | None:
@@ -243,11 +472,213 @@ async def assemble_product(product_id: int, session: AsyncSession) -> dict | Non
         return None
 
     dyn = await get_product_dynamic(product_id, session)
-    if dyn:
-        base.update(dyn)
-    return base
+    # Не мутируем base: тот же dict может лежать в L1
+    return {**base, **dyn} if dyn else base
 
 
 async def invalidate_dynamic(product_id: int):
-    r = get_redis()
-    await r.delete(product_price(product_id))
+    r = get_cache_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.delete(product_price(product_id))
+        pipe.publish(l1_invalidation_channel(), invalidation_message(PRICE, product_id))
+        await pipe.execute()
+    product_prices_l1.pop(product_id)
+
+
+# =========================
+# ПАКЕТНОЕ ЧТЕНИЕ
+# =========================
+
+MANY = "many"  # метка метрик для пакетных операций (карточки и цены разом)
+
+def _is_fresh(family: str, stale_at: int | None, delta_ms: int, now: int) -> bool:
+    """Свежая и (для XFetch) ещё не пора обновлять заранее."""
+    if stale_at is None:
+        return False
+    early = delta_ms / 1000 * _xfetch_factor(family)
+    return now + early < stale_at if early else now <= stale_at
+
+
+def _count_request(
+    family: str, data: dict | object | None, stale_at: int | None, delta_ms: int, now: int
+) -> bool:
+    """Учитывает обращение в CACHE_REQUESTS; True — значение свежее."""
+    if data is None:
+        CACHE_REQUESTS.labels(family, "miss").inc()
+        return False
+    fresh = _is_fresh(family, stale_at, 0 if data is TOMBSTONE else delta_ms, now)
+    CACHE_REQUESTS.labels(family, "fresh_hit" if fresh else "stale_hit").inc()
+    return fresh
+
+
+def _card_from_product(p: Product) -> tuple[dict | None, dict]:
+    """(стабильная часть или None для неактивного товара, динамика)."""
+    dyn = serialize_product_dynamic(p).model_dump(mode="json", exclude_none=True)
+    if p.is_deleted or not p.is_active:
+        return None, dyn
+    base = serialize_product_base(p).model_dump(mode="json", exclude_none=True)
+    return base, dyn
+
+
+async def load_product_cards_from_db(
+    product_ids: list[int], session: AsyncSession
+) -> dict[int, dict]:
+    """Собранные карточки напрямую из БД (без кэша) — запасной путь."""
+    cards: dict[int, dict] = {}
+    for p in await _load_products_many_from_db(product_ids, session):
+        base, dyn = _card_from_product(p)
+        if base is not None:
+            cards[p.id] = {**base, **dyn}
+    return cards
+
+
+async def assemble_products_many(
+    product_ids: list[int], session: AsyncSession
+) -> dict[int, dict]:
+    """
+    Пакетный аналог assemble_product:
+    1) MGET всех product_ver;
+    2) MGET всех product_card + product_price;
+    3) промахи/протухшие — одним запросом в БД, обратно в Redis одним pipeline
+       (для несуществующих/неактивных — «надгробия»).
+    Возвращает {id: карточка}; неактивных/несуществующих товаров в ответе нет.
+    """
+    cards: dict[int, dict] = {}
+    pending: list[int] = []
+    for pid in product_ids:
+        base, dyn = product_cards_l1.get(pid), product_prices_l1.get(pid)
+        if base is not None and dyn is not None:
+            cards[pid] = {**base, **dyn}
+        else:
+            pending.append(pid)
+    product_ids = pending
+    if not product_ids:
+        return cards
+
+    r = get_cache_redis()
+    with REDIS_RTT.labels(MANY, "mget").time():
+        raw_versions = await r.mget([product_ver(pid) for pid in product_ids])
+    versions = {
+        pid: int(v) if v else 0 for pid, v in zip(product_ids, raw_versions)
+    }
+
+    card_keys = [product_card(pid, versions[pid]) for pid in product_ids]
+    price_keys = [product_price(pid) for pid in product_ids]
+    with REDIS_RTT.labels(MANY, "mget").time():
+        raws = await r.mget(card_keys + price_keys)
+    raw_cards, raw_prices = raws[: len(product_ids)], raws[len(product_ids):]
+
+    now = _now()
+    to_load: list[int] = []
+    for pid, raw_card, raw_price in zip(product_ids, raw_cards, raw_prices):
+        base, base_stale_at, _, base_delta = _unpack(raw_card)
+        dyn, dyn_stale_at, _, dyn_delta = _unpack(raw_price)
+        base_fresh = _count_request(CARD, base, base_stale_at, base_delta, now)
+        if base is TOMBSTONE and base_fresh:
+            NEGATIVE_CACHE.labels(CARD, "hit").inc()
+            continue
+        dyn_fresh = _count_request(PRICE, dyn, dyn_stale_at, dyn_delta, now)
+        if base is not None and dyn is not None and base_fresh and dyn_fresh:
+            product_cards_l1.set(pid, base, ttl=base_stale_at - now)
+            product_prices_l1.set(pid, dyn, ttl=dyn_stale_at - now)
+            cards[pid] = {**base, **dyn}
+        else:
+            to_load.append(pid)
+
+    if not to_load:
+        return cards
+
+    await _load_and_store_many(to_load, versions, session, cards)
+    return cards
+
+
+async def _load_and_store_many(
+    product_ids: list[int],
+    versions: dict[int, int],
+    session: AsyncSession,
+    cards: dict[int, dict] | None = None,
+) -> int:
+    """
+    Один запрос в БД на всю пачку и один pipeline записи в Redis
+    (для несуществующих/неактивных — «надгробия»).
+    Собранные карточки складывает в cards, если он передан.
+    Возвращает, сколько карточек положили в кэш.
+    """
+    r = get_cache_redis()
+    now = _now()
+    started = time.monotonic()
+    products = await _load_products_many_from_db(product_ids, session)
+    delta = time.monotonic() - started
+    LOADER_LATENCY.labels(MANY).observe(delta)
+    tombstone = encode_tombstone(now + NEGATIVE_TTL, now + NEGATIVE_TTL)
+    stored = 0
+    async with r.pipeline(transaction=False) as pipe:
+        found = {p.id for p in products}
+        for pid in product_ids:
+            if pid not in found:
+                pipe.set(product_card(pid, versions[pid]), tombstone, ex=max(1, NEGATIVE_TTL))
+        for p in products:
+            base, dyn = _card_from_product(p)
+            payload, ex = _pack(PRICE, dyn, PRICE_TTL, PRICE_RACE, delta)
+            pipe.set(product_price(p.id), payload, ex=ex)
+            if base is None:
+                pipe.set(product_card(p.id, versions[p.id]), tombstone, ex=max(1, NEGATIVE_TTL))
+                continue
+            payload, ex = _pack(CARD, base, PRODUCT_TTL, PRODUCT_RACE, delta)
+            pipe.set(product_card(p.id, versions[p.id]), payload, ex=ex)
+            stored += 1
+            if cards is not None:
+                product_cards_l1.set(p.id, base)
+                product_prices_l1.set(p.id, dyn)
+                cards[p.id] = {**base, **dyn}
+        with REDIS_RTT.labels(MANY, "pipeline").time():
+            await pipe.execute()
+    return stored
+
+
+async def invalidate_products(
+    card_ids: Iterable[int] = (),
+    dynamic_ids: Iterable[int] = (),
+    client: Optional[aioredis.Redis] = None,
+) -> None:
+    """
+    Пакетная инвалидация (одна транзакция = один pipeline):
+    INCR product_ver для изменённых карточек, DEL динамики,
+    рассылка инвалидаций L1 по воркерам.
+    client — свой клиент вместо общего (вызов вне event loop приложения).
+    """
+    card_ids, dynamic_ids = sorted(set(card_ids)), sorted(set(dynamic_ids))
+    if not card_ids and not dynamic_ids:
+        return
+    channel = l1_invalidation_channel()
+    r = client or get_cache_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        for pid in card_ids:
+            pipe.incr(product_ver(pid))
+            pipe.publish(channel, invalidation_message(CARD, pid))
+        if dynamic_ids:
+            pipe.delete(*[product_price(pid) for pid in dynamic_ids])
+        for pid in dynamic_ids:
+            pipe.publish(channel, invalidation_message(PRICE, pid))
+        with REDIS_RTT.labels(MANY, "pipeline").time():
+            await pipe.execute()
+    for pid in card_ids:
+        product_cards_l1.pop(pid)
+    for pid in dynamic_ids:
+        product_prices_l1.pop(pid)
+
+
+async def warm_product_cards(product_ids: list[int], session: AsyncSession) -> int:
+    """
+    Прогрев: безусловно перезаливает product_card/product_price для пачки
+    товаров (MGET версий + один запрос в БД + один pipeline).
+    L1 не трогаем — прогреваем общий Redis, а не память текущего воркера.
+    """
+    if not product_ids:
+        return 0
+    with REDIS_RTT.labels(MANY, "mget").time():
+        raw_versions = await get_cache_redis().mget([product_ver(pid) for pid in product_ids])
+    versions = {
+        pid: int(v) if v else 0 for pid, v in zip(product_ids, raw_versions)
+    }
+    return await _load_and_store_many(product_ids, versions, session)
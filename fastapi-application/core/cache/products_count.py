@@ -0,0 +1,129 @@
+"""
+Дешёвый total для листингов товаров.
+
+Вместо `SELECT count(*)` на каждый запрос:
+1. читаем счётчик из Redis (его двигают create/delete и периодически сверяет таска);
+2. если счётчика нет — берём оценку планировщика из pg_class.reltuples,
+   а счётчик засеваем точным count(*) в фоне (один воркер — под NX-блокировкой),
+   чтобы оценка отдавалась только до первого засева, а не до ближайшей сверки;
+3. только если и оценки нет (таблицу ни разу не анализировали) — честный count(*).
+"""
+
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache.keys import lock_key, products_count
+from core.cache.redis_client import get_redis
+from core.config import settings
+from core.models import db_helper
+from core.models.product import Product
+
+log = logging.getLogger(__name__)
+
+# Сколько держится блокировка засева: count(*) дольше — засеет следующий промах
+_SEED_LOCK_TTL = 30
+
+# Держим ссылки на фоновые задачи, иначе их может собрать GC
+_tasks: set[asyncio.Task] = set()
+
+# INCRBY только если счётчик уже есть: иначе создадим ключ со значением ±1,
+# и до ближайшей сверки total будет врать.
+_INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+async def count_products_exact(session: AsyncSession) -> int:
+    res = await session.execute(
+        select(func.count()).select_from(Product).where(Product.is_deleted == False)  # noqa: E712
+    )
+    return int(res.scalar_one())
+
+
+async def estimate_products_count(session: AsyncSession) -> int | None:
+    """
+    Оценка планировщика (обновляется autovacuum/ANALYZE). Учитывает и
+    мягко удалённые строки, поэтому годится только для «~N товаров».
+    """
+    res = await session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": Product.__tablename__},
+    )
+    estimate = res.scalar_one_or_none()
+    if estimate is None or estimate < 0:  # -1: таблицу ещё не анализировали
+        return None
+    return int(estimate)
+
+
+async def _store_count(value: int) -> None:
+    r = get_redis()
+    await r.set(products_count(), value, ex=max(1, settings.redis.count_ttl))
+
+
+async def _seed_count() -> None:
+    """Точный count(*) своей сессией: сессия запроса закроется раньше."""
+    try:
+        async with db_helper.session_factory() as session:
+            await _store_count(await count_products_exact(session))
+    except Exception:
+        log.warning("Не удалось засеять счётчик товаров", exc_info=True)
+
+
+async def _start_seeding() -> None:
+    """Засев в фоне, если его ещё никто не начал (NX-блокировка на _SEED_LOCK_TTL)."""
+    if not await get_redis().set(lock_key(products_count()), 1, ex=_SEED_LOCK_TTL, nx=True):
+        return
+    task = asyncio.create_task(_seed_count(), name="products-count-seed")
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def get_products_total(session: AsyncSession) -> tuple[int, bool]:
+    """Возвращает (total, total_is_estimate)."""
+    redis_ok = True
+    try:
+        cached = await get_redis().get(products_count())
+        if cached is not None:
+            return int(cached), False
+    except RedisError:
+        redis_ok = False
+        log.warning("Redis недоступен, total товаров берём из Postgres", exc_info=True)
+
+    estimate = await estimate_products_count(session)
+    if estimate is not None:
+        if redis_ok:
+            try:
+                await _start_seeding()
+            except RedisError:
+                log.warning("Не удалось начать засев счётчика товаров", exc_info=True)
+        return estimate, True
+
+    exact = await count_products_exact(session)
+    try:
+        await _store_count(exact)
+    except RedisError:
+        pass
+    return exact, False
+
+
+async def adjust_products_count(delta: int) -> None:
+    """Вызывать после commit создания (+1) / мягкого удаления (-1) товара."""
+    try:
+        await get_redis().eval(_INCR_IF_EXISTS, 1, products_count(), delta)
+    except RedisError:
+        # Счётчик поправит ближайшая сверка
+        log.warning("Не удалось обновить счётчик товаров", exc_info=True)
+
+
+async def reconcile_products_count(session: AsyncSession) -> int:
+    """Сверка с Postgres: кладём точное значение и продлеваем TTL."""
+    exact = await count_products_exact(session)
+    await _store_count(exact)
+    return exact
@@ -3,6 +3,8 @@ from core.config import settings
 
 # глобальный клиент (ленивая инициализация)
 _redis: aioredis.Redis | None = None
+# клиент кэша карточек: записи бинарные, ответы не декодируются
+_cache_redis: aioredis.Redis | None = None
 
 
 def init_redis() -> aioredis.Redis:
@@ -13,7 +15,7 @@ def init_redis() -> aioredis.Redis:
     global _redis
     if _redis is None:
         _redis = aioredis.from_url(
-            settings.redis.url,  # читаем из нового RedisConfig
+            str(settings.redis.url),  # читаем из нового RedisConfig
             encoding="utf-8",
             decode_responses=True,
         )
@@ -31,9 +33,29 @@ def get_redis() -> aioredis.Redis:
     return _redis
 
 
+def get_cache_redis() -> aioredis.Redis:
+    """
+    Клиент кэша карточек товаров (core/cache/products_cache.py, lua.py).
+    Записи там бинарные (core/cache/serializers.py), поэтому ответы не декодируются;
+    пул соединений — свой, у общего клиента get_redis() ответы по-прежнему str.
+    """
+    global _cache_redis
+    if _cache_redis is None:
+        _cache_redis = create_cache_redis()
+    return _cache_redis
+
+
+def create_cache_redis() -> aioredis.Redis:
+    """Новый клиент кэша карточек — для кода вне event loop приложения (закрывает вызывающий)."""
+    return aioredis.from_url(str(settings.redis.url), decode_responses=False)
+
+
 async def close_redis():
-    """Закрывает соединение при завершении приложения."""
-    global _redis
+    """Закрывает соединения при завершении приложения."""
+    global _redis, _cache_redis
     if _redis is not None:
         await _redis.close()
         _redis = None
+    if _cache_redis is not None:
+        await _cache_redis.close()
+        _cache_redis = None
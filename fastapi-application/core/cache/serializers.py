@@ -1,5 +1,34 @@
+import json
+import logging
+import struct
+import zlib
+from typing import Any
+
+import orjson
+
+from core.config import settings
 from core.models.product import Product
-from core.schemas.cache import ProductBaseCache, ProductDynamicCache
+from core.schemas.cache import (
+    ProductAttributeCache,
+    ProductBaseCache,
+    ProductDynamicCache,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover — опциональная зависимость
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
 
 def serialize_product_base(p: Product) -> ProductBaseCache:
     images = sorted(p.images, key=lambda im: (not im.is_main, im.id))
@@ -8,10 +37,11 @@ def serialize_product_base(p: Product) -> ProductBaseCache:
         title=p.title,
         description=p.description,
         category_id=p.category_id,
+        category_name=p.category.name if p.category is not None else None,
         is_deleted=p.is_deleted,
         is_active=p.is_active,
         images=[im.image_path for im in images],
-        attributes=p.serialized_attributes,
+        attributes=[ProductAttributeCache.model_validate(a) for a in p.attributes],
     )
 
 def serialize_product_dynamic(p: Product) -> ProductDynamicCache:
@@ -22,3 +52,178 @@ def serialize_product_dynamic(p: Product) -> ProductDynamicCache:
         quantity=p.quantity,
         in_stock=qty > 0,
     )
+
+
+# ======================================================================
+#  БИНАРНЫЙ ФОРМАТ ЗАПИСЕЙ КЭША
+# ======================================================================
+#
+# v1: [0xC1][1][flags][stale_at:u32][expire_at:u32][body...]
+# v2: [0xC1][2][flags][stale_at:u32][expire_at:u32][delta_ms:u32][body...]
+#   flags & 0x03      — кодек тела: 0 — JSON (orjson), 1 — msgpack
+#   (flags >> 2) & 3  — сжатие: 0 — нет, 1 — zlib, 2 — zstd, 3 — lz4
+#   flags & 0x10      — «надгробие»: товара нет/неактивен, тело пустое
+#   delta_ms          — сколько длилась загрузка значения (для XFetch)
+#
+# Пишем всегда v2, читаем обе версии.
+# Старые записи — JSON-текст {"data", "stale_at", "expire_at"}: начинаются
+# с "{", поэтому отличаются от нового формата по первому байту и читаются
+# как раньше, пока не истечёт их TTL.
+# Заголовок фиксированной длины, чтобы Lua-скрипт (core/cache/lua.py)
+# доставал stale/expire по смещениям, не разбирая тело.
+
+log = logging.getLogger(__name__)
+
+ENTRY_MAGIC = 0xC1
+ENTRY_FORMAT_V1 = 1
+ENTRY_FORMAT_V2 = 2
+_HEADER_V1 = struct.Struct(">BBBII")
+_HEADER_V2 = struct.Struct(">BBBIII")
+
+FLAG_TOMBSTONE = 0x10
+
+CODEC_JSON, CODEC_MSGPACK = 0, 1
+COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD, COMPRESSION_LZ4 = 0, 1, 2, 3
+
+_CODECS = {"orjson": CODEC_JSON, "msgpack": CODEC_MSGPACK}
+_COMPRESSIONS = {
+    "none": COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "zstd": COMPRESSION_ZSTD,
+    "lz4": COMPRESSION_LZ4,
+}
+
+
+def _available_codec(name: str) -> int:
+    codec = _CODECS[name]
+    if codec == CODEC_MSGPACK and msgpack is None:
+        log.warning("msgpack не установлен — кэш пишем в JSON (orjson)")
+        return CODEC_JSON
+    return codec
+
+
+def _available_compression(name: str) -> int:
+    compression = _COMPRESSIONS[name]
+    if (compression == COMPRESSION_ZSTD and zstandard is None) or (
+        compression == COMPRESSION_LZ4 and lz4_frame is None
+    ):
+        log.warning("Библиотека сжатия %s не установлена — используем zlib", name)
+        return COMPRESSION_ZLIB
+    return compression
+
+
+_WRITE_CODEC = _available_codec(settings.redis.codec)
+_WRITE_COMPRESSION = _available_compression(settings.redis.compression)
+_COMPRESS_MIN_SIZE = settings.redis.compress_min_size
+
+
+def _encode_body(data: Any, codec: int) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return orjson.dumps(data)
+
+
+def _decode_body(body: bytes, codec: int) -> Any:
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack не установлен")
+        return msgpack.unpackb(body, raw=False)
+    return orjson.loads(body)
+
+
+def _compress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(body, 6)
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if compression == COMPRESSION_LZ4:
+        return lz4_frame.compress(body)
+    return body
+
+
+def _decompress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard не установлен")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if compression == COMPRESSION_LZ4:
+        if lz4_frame is None:
+            raise ValueError("lz4 не установлен")
+        return lz4_frame.decompress(body)
+    return body
+
+
+def encode_entry(data: Any, stale_at: int, expire_at: int, delta_ms: int = 0) -> bytes:
+    body = _encode_body(data, _WRITE_CODEC)
+    compression = COMPRESSION_NONE
+    if _WRITE_COMPRESSION != COMPRESSION_NONE and len(body) >= _COMPRESS_MIN_SIZE:
+        compressed = _compress(body, _WRITE_COMPRESSION)
+        if len(compressed) < len(body):
+            body, compression = compressed, _WRITE_COMPRESSION
+    flags = _WRITE_CODEC | (compression << 2)
+    header = _HEADER_V2.pack(
+        ENTRY_MAGIC,
+        ENTRY_FORMAT_V2,
+        flags,
+        stale_at,
+        expire_at,
+        min(max(0, delta_ms), 0xFFFFFFFF),
+    )
+    return header + body
+
+
+class _Tombstone:
+    """Маркер негативного кэша: «такого товара нет или он неактивен»."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "TOMBSTONE"
+
+
+TOMBSTONE = _Tombstone()
+
+
+def encode_tombstone(stale_at: int, expire_at: int) -> bytes:
+    return _HEADER_V2.pack(
+        ENTRY_MAGIC, ENTRY_FORMAT_V2, FLAG_TOMBSTONE, stale_at, expire_at, 0
+    )
+
+
+def decode_entry(
+    raw: bytes | str | None,
+) -> tuple[Any, int | None, int | None, int]:
+    """
+    -> (data, stale_at, expire_at, delta_ms). Для «надгробия» data — TOMBSTONE.
+    Нечитаемая запись (неизвестный формат, нет библиотеки) считается
+    промахом: её перезапишет загрузчик.
+    """
+    if not raw:
+        return None, None, None, 0
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+
+    try:
+        if raw[0] == ENTRY_MAGIC:
+            fmt = raw[1]
+            if fmt == ENTRY_FORMAT_V2:
+                _, _, flags, stale_at, expire_at, delta_ms = _HEADER_V2.unpack_from(raw)
+                body = raw[_HEADER_V2.size:]
+            elif fmt == ENTRY_FORMAT_V1:
+                _, _, flags, stale_at, expire_at = _HEADER_V1.unpack_from(raw)
+                delta_ms, body = 0, raw[_HEADER_V1.size:]
+            else:
+                return None, None, None, 0
+            if flags & FLAG_TOMBSTONE:
+                return TOMBSTONE, stale_at, expire_at, delta_ms
+            body = _decompress(body, (flags >> 2) & 0x03)
+            return _decode_body(body, flags & 0x03), stale_at, expire_at, delta_ms
+
+        # Старый формат: JSON-обёртка
+        obj = json.loads(raw)
+        return obj.get("data"), obj.get("stale_at"), obj.get("expire_at"), 0
+    except Exception:
+        log.warning("Не удалось декодировать запись кэша", exc_info=True)
+        return None, None, None, 0
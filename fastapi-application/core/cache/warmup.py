@@ -0,0 +1,132 @@
+"""
+Прогрев кэша товаров после деплоя или сброса Redis.
+
+Кандидаты: топ продаж (crud.reports) + первая страница каждой категории.
+Грузим пачками (один `WHERE id IN (...)` на пачку, запись — одним pipeline),
+пачки идут параллельно, но не больше warmup_concurrency одновременно —
+чтобы прогрев не съел пул соединений у живого трафика.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.cache.keys import warmup_lock
+from core.cache.metrics import (
+    WARMUP_COVERAGE,
+    WARMUP_DURATION,
+    WARMUP_LAST_SUCCESS,
+    WARMUP_PRODUCTS,
+)
+from core.cache.products_cache import warm_product_cards
+from core.cache.redis_client import get_redis
+from core.config import settings
+from crud.products import get_first_page_ids_per_category
+from crud.reports import top_product_ids
+
+log = logging.getLogger(__name__)
+
+
+async def collect_warmup_ids(session: AsyncSession) -> list[int]:
+    """Топ продаж в начале списка: если прогрев прервут, самое горячее уже в кэше."""
+    cfg = settings.redis
+    ids: list[int] = []
+    if cfg.warmup_top_n > 0:
+        ids += await top_product_ids(session, limit=cfg.warmup_top_n)
+    if cfg.warmup_per_category > 0:
+        ids += await get_first_page_ids_per_category(session, cfg.warmup_per_category)
+    return list(dict.fromkeys(ids))  # без дублей, порядок сохраняем
+
+
+async def warm_products_cache(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[str, int | float]:
+    """Один прогон прогрева. Возвращает сводку для логов/результата таски."""
+    cfg = settings.redis
+    started = time.monotonic()
+
+    async with session_factory() as session:
+        ids = await collect_warmup_ids(session)
+
+    batch = max(1, cfg.warmup_batch_size)
+    chunks = [ids[i:i + batch] for i in range(0, len(ids), batch)]
+    sem = asyncio.Semaphore(max(1, cfg.warmup_concurrency))
+
+    async def warm_chunk(chunk: list[int]) -> int:
+        async with sem:
+            # своя сессия на пачку: AsyncSession нельзя делить между корутинами
+            async with session_factory() as session:
+                return await warm_product_cards(chunk, session)
+
+    warmed = sum(await asyncio.gather(*(warm_chunk(c) for c in chunks)))
+    duration = time.monotonic() - started
+
+    WARMUP_DURATION.set(duration)
+    WARMUP_PRODUCTS.labels("requested").set(len(ids))
+    WARMUP_PRODUCTS.labels("warmed").set(warmed)
+    WARMUP_COVERAGE.set(warmed / len(ids) if ids else 1.0)
+    WARMUP_LAST_SUCCESS.set_to_current_time()
+
+    log.info("Прогрев кэша: %s из %s товаров за %.2f с", warmed, len(ids), duration)
+    return {"requested": len(ids), "warmed": warmed, "duration": round(duration, 3)}
+
+
+async def warm_products_cache_once(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[str, int | float] | None:
+    """
+    То же, но не чаще раза в warmup_lock_ttl на весь кластер: при старте
+    все воркеры gunicorn зовут прогрев, а выполняет его тот, кто взял lock.
+    None — прогрев уже сделал/делает кто-то другой.
+    """
+    try:
+        acquired = await get_redis().set(
+            warmup_lock(), "1", ex=max(1, settings.redis.warmup_lock_ttl), nx=True
+        )
+    except RedisError:
+        log.warning("Redis недоступен, прогрев кэша пропущен", exc_info=True)
+        return None
+    if not acquired:
+        return None
+    return await warm_products_cache(session_factory)
+
+
+# =========================
+# ХУК СТАРТА ПРИЛОЖЕНИЯ
+# =========================
+
+_startup_task: asyncio.Task | None = None
+
+
+async def _run_startup_warmup(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    try:
+        await warm_products_cache_once(session_factory)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # Холодный кэш — не повод не стартовать
+        log.warning("Прогрев кэша при старте не удался", exc_info=True)
+
+
+def start_startup_warmup(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """Вызывать на старте воркера (lifespan): прогрев идёт в фоне, старт не ждёт."""
+    global _startup_task
+    if not settings.redis.warmup_on_startup or _startup_task is not None:
+        return
+    _startup_task = asyncio.create_task(
+        _run_startup_warmup(session_factory), name="product-cache-warmup"
+    )
+
+
+async def stop_startup_warmup() -> None:
+    global _startup_task
+    if _startup_task is None:
+        return
+    _startup_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _startup_task
+    _startup_task = None
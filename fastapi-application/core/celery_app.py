@@ -6,10 +6,25 @@ celery_app = Celery(
     "worker",
     broker=settings.celery.broker_url,      # ✅ автоматически выбирает local/docker
     backend=settings.celery.result_backend,   # ✅ backend для результатов
-    include=["tasks.reports"],                # ✅ регистрируем модуль с тасками
+    include=["tasks.reports", "tasks.products_count", "tasks.search_reconcile"],  # ✅ регистрируем модули с тасками
 )
 
 # Роутинг задач по очередям
 celery_app.conf.task_routes = {
     "tasks.reports.*": {"queue": "reports"},
+    "tasks.products_count.*": {"queue": "maintenance"},
+    "tasks.search_reconcile.*": {"queue": "maintenance"},
 }
+
+# Периодические задачи (celery beat)
+celery_app.conf.beat_schedule = {
+    "reconcile-products-count": {
+        "task": "tasks.products_count.reconcile",
+        "schedule": settings.redis.count_reconcile_interval,
+    },
+}
+if settings.es.reconcile_interval and settings.search.backend == "elasticsearch":
+    celery_app.conf.beat_schedule["reconcile-search-index"] = {
+        "task": "tasks.search_reconcile.reconcile",
+        "schedule": settings.es.reconcile_interval,
+    }
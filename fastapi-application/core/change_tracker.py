@@ -0,0 +1,258 @@
+"""
+Автоматическая инвалидация кэша и поиска по событиям сессии SQLAlchemy.
+
+after_flush собирает id затронутых товаров (Product, ProductImage,
+ProductAttributeValue, переименование Category):
+  - для Elasticsearch сразу пишет строки search_outbox тем же соединением —
+    в той же транзакции, что и само изменение (core/search/outbox.py);
+  - для кэша копит id в session.info, а after_commit отправляет одну пачку
+    на транзакцию: INCR product_ver / DEL динамики одним pipeline (+ L1).
+after_rollback выбрасывает накопленное (строки outbox откатятся вместе с транзакцией).
+
+Когда уходит пачка кэша:
+  - сессия запроса (db_helper.session_getter) и commit_and_invalidate — пачка
+    ждёт в session.info и отправляется await'ом сразу после commit, до ответа:
+    следующий GET того же клиента не увидит старую карточку (read-your-writes);
+  - прочие сессии (taskiq, celery, скрипты) — фоновой задачей в текущем event loop;
+  - вне event loop — отдельным asyncio.run со своим клиентом Redis.
+Outbox пишется всегда, в самой транзакции.
+
+UPDATE/DELETE-выражения (session.execute(update(...))) через flush не проходят
+и здесь не видны — в местах записи товаров меняем ORM-объекты.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.cache.products_cache import invalidate_products
+from core.cache.redis_client import create_cache_redis
+from core.config import settings
+from core.models.category import Category
+from core.models.product import Product, ProductImage
+from core.models.product_attribute import ProductAttributeValue
+from core.search.outbox import enqueue as enqueue_search_outbox
+
+log = logging.getLogger(__name__)
+
+_INFO_KEY = "product_changes"
+# Сессия сама отправит пачку после commit (flush_invalidations), фоновая задача не нужна
+_DEFER_KEY = "defer_invalidation"
+_COMMITTED_KEY = "committed_product_changes"
+
+# Колонки товара, которые лежат в динамике кэша (product_price), а не в карточке
+DYNAMIC_COLUMNS = frozenset({"retail_price", "opt_price", "quantity"})
+# Колонки документа Elasticsearch (см. core/search/indexer._to_doc):
+# изменение этих — документ пересобирается целиком...
+SEARCH_COLUMNS = frozenset({"title", "description", "category_id", "is_deleted"})
+# ...а этих — частичный update (indexer.dynamic_doc)
+SEARCH_DYNAMIC_COLUMNS = frozenset({"retail_price", "opt_price", "quantity", "is_active"})
+
+
+class ProductChanges:
+    """Id затронутых товаров по видам изменений."""
+
+    __slots__ = ("card", "dynamic", "search", "search_partial")
+
+    def __init__(self) -> None:
+        self.card: set[int] = set()     # стабильная часть карточки -> bump версии
+        self.dynamic: set[int] = set()  # цены/остатки -> DEL product_price
+        self.search: set[int] = set()   # документ в ES -> строка search_outbox
+        self.search_partial: set[int] = set()  # только динамика документа ES
+
+    def __bool__(self) -> bool:
+        return bool(self.card or self.dynamic or self.search or self.search_partial)
+
+    def merge(self, other: "ProductChanges") -> None:
+        self.card |= other.card
+        self.dynamic |= other.dynamic
+        self.search |= other.search
+        self.search_partial |= other.search_partial
+
+
+def _changed_columns(obj) -> set[str]:
+    state = inspect(obj)
+    return {
+        attr.key
+        for attr in state.mapper.column_attrs
+        if state.attrs[attr.key].history.has_changes()
+    }
+
+
+def _pending(session: Session) -> ProductChanges:
+    changes = session.info.get(_INFO_KEY)
+    if changes is None:
+        changes = session.info[_INFO_KEY] = ProductChanges()
+    return changes
+
+
+# =========================
+# СБОР ИЗМЕНЕНИЙ
+# =========================
+
+def _after_flush(session: Session, flush_context) -> None:
+    # В after_flush new/dirty/deleted и история атрибутов ещё «до flush»,
+    # а первичные ключи новых строк уже известны.
+    changes = ProductChanges()
+    renamed_categories: set[int] = set()
+
+    for obj in session.new:
+        if isinstance(obj, Product):
+            changes.card.add(obj.id)
+            changes.dynamic.add(obj.id)
+            changes.search.add(obj.id)
+        elif isinstance(obj, (ProductImage, ProductAttributeValue)) and obj.product_id:
+            changes.card.add(obj.product_id)
+            changes.search.add(obj.product_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            columns = _changed_columns(obj)
+            if columns - DYNAMIC_COLUMNS:
+                changes.card.add(obj.id)
+            if columns & DYNAMIC_COLUMNS:
+                changes.dynamic.add(obj.id)
+            if columns & SEARCH_COLUMNS:
+                changes.search.add(obj.id)
+            elif columns & SEARCH_DYNAMIC_COLUMNS:
+                changes.search_partial.add(obj.id)
+        elif isinstance(obj, (ProductImage, ProductAttributeValue)):
+            if _changed_columns(obj):
+                # Картинку/значение могли перенести к другому товару — старому тоже
+                history = inspect(obj).attrs.product_id.history
+                pids = [pid for pid in (obj.product_id, *history.deleted) if pid]
+                changes.card.update(pids)
+                changes.search.update(pids)
+        elif isinstance(obj, Category) and "name" in _changed_columns(obj):
+            renamed_categories.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes.card.add(obj.id)
+            changes.dynamic.add(obj.id)
+            changes.search.add(obj.id)
+        elif isinstance(obj, (ProductImage, ProductAttributeValue)) and obj.product_id:
+            changes.card.add(obj.product_id)
+            changes.search.add(obj.product_id)
+
+    if renamed_categories:
+        # category_name лежит и в документе ES, и в карточке кэша.
+        # Через connection(), а не session.execute: без autoflush внутри flush.
+        res = session.connection().execute(
+            select(Product.id).where(Product.category_id.in_(renamed_categories))
+        )
+        product_ids = set(res.scalars())
+        changes.card.update(product_ids)
+        changes.search.update(product_ids)
+
+    if settings.search.backend != "elasticsearch":
+        # Postgres-бэкенд ищет по самой таблице — индексировать нечего
+        changes.search.clear()
+        changes.search_partial.clear()
+    if changes.search or changes.search_partial:
+        enqueue_search_outbox(session.connection(), changes.search, changes.search_partial)
+        changes.search.clear()
+        changes.search_partial.clear()
+    if changes:
+        _pending(session).merge(changes)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
+
+
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_INFO_KEY, None)
+    if not changes:
+        return
+    if session.info.get(_DEFER_KEY):
+        committed = session.info.get(_COMMITTED_KEY)
+        if committed is None:
+            committed = session.info[_COMMITTED_KEY] = ProductChanges()
+        committed.merge(changes)
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _dispatch_without_loop(changes)
+        return
+    task = loop.create_task(dispatch_changes(changes), name="product-invalidation")
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+# =========================
+# ОТПРАВКА ПОСЛЕ COMMIT
+# =========================
+
+# Держим ссылки на фоновые задачи, иначе их может собрать GC
+_tasks: set[asyncio.Task] = set()
+
+
+async def dispatch_changes(changes: ProductChanges, client: Optional[aioredis.Redis] = None) -> None:
+    """Одна пачка на транзакцию; недоступный Redis не должен ронять запись."""
+    try:
+        await invalidate_products(changes.card, changes.dynamic, client=client)
+    except RedisError:
+        log.warning("Не удалось сбросить кэш товаров %s", sorted(changes.card | changes.dynamic), exc_info=True)
+
+
+def _dispatch_without_loop(changes: ProductChanges) -> None:
+    """Синхронный контекст: общий клиент привязан к чужому loop'у — свой на один вызов."""
+    async def run() -> None:
+        client = create_cache_redis()
+        try:
+            await dispatch_changes(changes, client=client)
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def defer_invalidation(session: AsyncSession | Session) -> None:
+    """Пачки этой сессии отправляет flush_invalidations после commit, а не фоновая задача."""
+    session.info[_DEFER_KEY] = True
+
+
+async def flush_invalidations(session: AsyncSession | Session) -> None:
+    """Отправить пачки уже закоммиченных транзакций сессии (await — до ответа клиенту)."""
+    changes = session.info.pop(_COMMITTED_KEY, None)
+    if changes:
+        await dispatch_changes(changes)
+
+
+async def commit_and_invalidate(session: AsyncSession) -> None:
+    """commit + сброс кэша затронутых товаров до возврата — для любой сессии, не только запроса."""
+    deferred = session.info.get(_DEFER_KEY, False)
+    session.info[_DEFER_KEY] = True
+    try:
+        await session.commit()
+    finally:
+        session.info[_DEFER_KEY] = deferred
+    await flush_invalidations(session)
+
+
+async def drain_pending_invalidations() -> None:
+    """Вызывать на остановке (lifespan): дождаться уже отправленных пачек."""
+    if _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+_installed = False
+
+
+def install_change_tracker() -> None:
+    """Подписка на события всех сессий (AsyncSession работает поверх Session)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _installed = True
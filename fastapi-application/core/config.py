@@ -119,6 +119,92 @@ class RedisConfig(BaseModel):
     product_ttl: int = 1800         # 30 минут для стабильной части карточки
     price_ttl: int = 30             # 30 секунд для динамики (цены/остатки)
     lock_ttl: int = 30              # 30 секунд для anti dog-pile lock
+    singleflight_wait: float = 2.0  # сколько ждём чужую загрузку при промахе (сек)
+    negative_ttl: int = 60          # «надгробие» для несуществующих/неактивных товаров
+    codec: Literal["orjson", "msgpack"] = "orjson"   # формат тела записей кэша
+    compression: Literal["none", "zlib", "zstd", "lz4"] = "zlib"  # zstd/lz4 — если установлены
+    compress_min_size: int = 1024   # сжимаем тела не меньше этого размера (байт)
+    # Политика обновления по семействам ключей:
+    #   race_window — обновляем после stale_at (в окне гонки под lock'ом);
+    #   xfetch      — вероятностно заранее: delta * beta * -ln(rand) (XFetch)
+    card_refresh_policy: Literal["race_window", "xfetch"] = "race_window"
+    price_refresh_policy: Literal["race_window", "xfetch"] = "race_window"
+    xfetch_beta: float = 1.0        # >1 — обновляем раньше, <1 — позже
+    count_ttl: int = 3600           # час жизни счётчика товаров без сверки
+    count_reconcile_interval: int = 300  # как часто сверять счётчик с Postgres (сек)
+    local_max_items: int = 10_000   # L1-кэш карточек в памяти воркера (0 — выключен)
+    local_card_ttl: int = 60        # сколько живёт карточка в L1
+    local_price_ttl: int = 5        # сколько живёт динамика в L1
+    warmup_on_startup: bool = True  # прогревать карточки при старте приложения
+    warmup_top_n: int = 500         # сколько самых продаваемых товаров прогревать
+    warmup_per_category: int = 20   # первая страница каждой категории
+    warmup_batch_size: int = 100    # товаров на один запрос в БД / pipeline
+    warmup_concurrency: int = 4     # сколько пачек грузим параллельно
+    warmup_lock_ttl: int = 300      # прогрев не чаще раза в N секунд на весь кластер
+
+
+class ElasticsearchConfig(BaseModel):
+    url: str = "http://localhost:9200"
+    index_alias: str = "products"   # приложение всегда работает через алиас
+    request_timeout: int = 10
+    # Полная переиндексация (POST /products/reindex)
+    reindex_chunk_size: int = 500   # документов в одном _bulk
+    reindex_max_chunk_bytes: int = 10 * 1024 * 1024
+    reindex_concurrency: int = 2    # параллельных потоков (партиции по id)
+    reindex_job_ttl: int = 86400    # сколько хранить прогресс задачи в Redis
+    reindex_max_errors: int = 1000  # сколько ошибок по документам сохранять
+    # Пересборка индекса без простоя (products_v{N+1} + переключение алиаса)
+    replicas: int = 1               # реплики после заливки (во время заливки — 0)
+    refresh_interval: str = "1s"    # refresh после заливки (во время заливки — -1)
+    rebuild_keep_indices: int = 2   # сколько версий индекса хранить (текущая + откат)
+    rebuild_lock_ttl: int = 6 * 3600
+    rebuild_max_count_diff: int = 0  # допустимое расхождение count ES и Postgres
+    # Outbox-индексатор (taskiq worker): search_outbox -> _bulk
+    outbox_batch_size: int = 500    # строк outbox за один проход
+    outbox_poll_interval: float = 1.0  # пауза, когда outbox пуст (сек)
+    outbox_max_backoff: int = 300   # потолок задержки повтора после ошибки (сек)
+    outbox_claim_timeout: int = 120  # аренда захваченной пачки: упал воркер — строки вернутся через столько (сек)
+    outbox_metrics_interval: int = 15  # как часто приложение обновляет метрику лага
+    # Откуда брать карточки для выдачи /products/search (можно переопределить ?hydrate=):
+    # source — из _source документа, cache — из кэша карточек Redis, db — из Postgres.
+    # Промахи source/cache добираются из кэша/Postgres.
+    search_hydration: Literal["source", "cache", "db"] = "source"
+    # Пагинация поиска: search_after по (_score, id) внутри point-in-time
+    search_track_total_hits: int = 1000  # точный total до этого порога, дальше — "gte"
+    search_pit_keep_alive: str = "2m"    # сколько ES держит PIT между страницами
+    # Кэш выдачи поиска в Redis (id + total); 0 — выключен
+    search_cache_ttl: int = 30
+    # Фасеты выдачи поиска (?facets=true)
+    facet_categories_size: int = 20
+    facet_price_interval: int = 1000  # шаг гистограммы цен
+    facet_attributes_size: int = 10   # атрибутов на категорию
+    facet_values_size: int = 10       # значений на атрибут
+    # Автодополнение /products/suggest
+    suggest_max_size: int = 10      # жёсткий потолок limit
+    suggest_min_prefix: int = 2     # короче — не ищем (edge_ngram начинается с 2 символов)
+    suggest_cache_ttl: int = 60
+    # Сверка индекса с Postgres и починка расхождений (core/search/reconcile.py, celery beat)
+    reconcile_interval: int = 3600   # сек между проходами; 0 — не планировать
+    reconcile_page_size: int = 1000  # документов ES / строк Postgres за один заход
+    reconcile_repair_batch: int = 500  # товаров в одном _bulk починки
+    reconcile_repair: bool = True    # False — только считать расхождение
+    reconcile_lock_ttl: int = 3 * 3600
+
+
+class SearchConfig(BaseModel):
+    # elasticsearch — индекс через outbox (core/search/outbox.py);
+    # postgres — tsvector + pg_trgm прямо в БД (core/search/pg_backend.py), без ES
+    backend: Literal["elasticsearch", "postgres"] = "elasticsearch"
+    # Circuit breaker вокруг Elasticsearch (core/search/breaker.py)
+    es_latency_budget_ms: int = 800   # бюджет одного запроса в ES; дольше — отмена и фолбэк
+    breaker_window: int = 50          # последних вызовов в скользящем окне
+    breaker_min_calls: int = 20       # меньше вызовов в окне — не открываемся
+    breaker_failure_rate: float = 0.5  # доля ошибок/медленных вызовов для открытия
+    breaker_slow_call_ms: int = 500   # вызов дольше — считается неудачным
+    breaker_open_seconds: float = 10.0  # сколько не ходим в ES до пробы
+    breaker_half_open_calls: int = 3  # пробных вызовов в half_open
+    # Деградированный поиск по названию в Postgres, пока ES недоступен
+    fallback_max_results: int = 100   # потолок offset + limit
 
 
 class Settings(BaseSettings):
@@ -140,6 +226,8 @@ class Settings(BaseSettings):
     frontend: FrontendConfig
     security: SecurityConfig
     redis: RedisConfig = RedisConfig()
+    es: ElasticsearchConfig = ElasticsearchConfig()
+    search: SearchConfig = SearchConfig()
 
 
 settings = Settings()
@@ -10,6 +10,7 @@ __all__ = (
     "ProductAttributeDefinition",
     "ProductAttributeValue",
     "ProductImage",
+    "SearchOutbox",
 
 
 
@@ -24,4 +25,5 @@ from .order import Order
 from .order_item import OrderItem
 from .category import Category
 from .product_attribute import ProductAttributeDefinition, ProductAttributeValue
-from .product_image import ProductImage
\ No newline at end of file
+from .product_image import ProductImage
+from .search_outbox import SearchOutbox
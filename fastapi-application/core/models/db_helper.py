@@ -37,8 +37,16 @@ class DatabaseHelper:
         await self.engine.dispose()
 
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
+        # Здесь, а не на уровне модуля: change_tracker сам импортирует модели
+        from core.change_tracker import defer_invalidation, flush_invalidations
+
         async with self.session_factory() as session:
-            yield session
+            # Кэш товаров сбрасываем до ответа, а не фоновой задачей: read-your-writes
+            defer_invalidation(session)
+            try:
+                yield session
+            finally:
+                await flush_invalidations(session)
 
 
 db_helper = DatabaseHelper(
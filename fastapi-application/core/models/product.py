@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, Integer, String, Boolean, Text
+from sqlalchemy import ForeignKey, Integer, String, Boolean, Text, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from core.models.mixins.int_id_pk import IntIdPkMixin
 from core.models.base import Base
 from core.models.category import Category
@@ -21,6 +22,28 @@ class Product(IntIdPkMixin, Base):
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    # Полнотекстовый поиск силами Postgres (settings.search.backend = "postgres",
+    # core/search/pg_backend.py). Колонки генерируемые — БД пересчитывает их сама;
+    # deferred — обычные SELECT товаров их не тянут.
+    search_ru: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+    search_en: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
     # Категория
     category_id: Mapped[int | None] = mapped_column(ForeignKey("categories.id"), nullable=True)
     category: Mapped["Category"] = relationship(back_populates="products")
@@ -37,6 +60,18 @@ class Product(IntIdPkMixin, Base):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_products_search_ru", "search_ru", postgresql_using="gin"),
+        Index("ix_products_search_en", "search_en", postgresql_using="gin"),
+        # pg_trgm: префиксы (ILIKE 'abc%') и опечатки (<%) по названию
+        Index(
+            "ix_products_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
     @property
     def serialized_attributes(self) -> dict[str, str]:
         """
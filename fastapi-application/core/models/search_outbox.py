@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Index, Integer, Text, false, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import Base
+
+
+class SearchOutbox(Base):
+    """
+    Transactional outbox для индексатора ES: строка пишется в той же
+    транзакции, что и изменение товара (core/change_tracker.py), и
+    удаляется фоновым индексатором после успешного _bulk (core/search/outbox.py).
+    Без FK на products — событие должно пережить и удаление товара.
+    """
+
+    __tablename__ = "search_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    # True — изменились только цены/остатки/активность: хватит частичного update документа
+    partial: Mapped[bool] = mapped_column(Boolean, server_default=false(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # Когда можно брать в работу (после ошибки — с экспоненциальной задержкой)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, server_default="0", nullable=False)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_search_outbox_available_at_id", "available_at", "id"),
+    )
@@ -1,15 +1,31 @@
-from typing import List, Dict, Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
+
+class ProductAttributeCache(BaseModel):
+    """
+    Атрибут в карточке храним «как в БД» (имя с meta_):
+    проекцию под роль делают схемы ProductReadUser/ProductReadSuperuser.
+    """
+    id: int
+    attribute_id: int
+    value: str
+    name: str
+    unit: Optional[str] = None
+
+    model_config = dict(from_attributes=True)
+
+
 class ProductBaseCache(BaseModel):
     id: int
     title: str
     description: Optional[str] = None
     category_id: Optional[int] = None
+    category_name: Optional[str] = None
     is_deleted: bool
     is_active: bool
     images: List[str] = Field(default_factory=list)
-    attributes: Dict[str, str] = Field(default_factory=dict)
+    attributes: List[ProductAttributeCache] = Field(default_factory=list)
 
     model_config = dict(from_attributes=True)
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, field_serializer
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
+from typing import Literal, Optional, List
 
 # ---------- Константа для namespace ----------
 META_PREFIX = "meta_"
@@ -85,3 +85,37 @@ class ProductReadSuperuser(ProductReadBase):
     attributes: List[ProductAttributeReadSuperuser] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# ---------- Выдача поиска ----------
+
+class ProductSearchItemUser(ProductReadUser):
+    main_image: Optional[str] = None
+    category_name: Optional[str] = None
+
+
+class ProductSearchItemSuperuser(ProductReadSuperuser):
+    main_image: Optional[str] = None
+    category_name: Optional[str] = None
+
+
+# ---------- Пакетный поиск (POST /products/msearch) ----------
+
+class ProductSearchSpec(BaseModel):
+    """Один запрос пакета — те же параметры, что у GET /products/search."""
+    q: str = ""
+    category_id: Optional[int] = None
+    limit: int = Field(10, ge=1, le=100)
+    offset: int = Field(0, ge=0)
+    cursor: Optional[str] = None
+    include_total: bool = True
+    price_min: Optional[int] = Field(None, ge=0)
+    price_max: Optional[int] = Field(None, ge=0)
+    in_stock: Optional[bool] = None
+    attrs: List[ProductAttributeInput] = []
+    facets: bool = False
+
+
+class ProductMultiSearch(BaseModel):
+    queries: List[ProductSearchSpec] = Field(min_length=1)
+    hydrate: Optional[Literal["source", "cache", "db"]] = None
@@ -0,0 +1,94 @@
+"""
+Интерфейс поискового бэкенда для crud/products_search.
+
+Бэкенд отвечает только за «какие id, в каком порядке и сколько всего»
+(+ фасеты и подсказки). Гидрация карточек, кэш выдачи и курсоры — общие,
+в crud/products_search.py.
+
+Реализации:
+  - core/search/es_backend.py — Elasticsearch (индекс через outbox);
+  - core/search/pg_backend.py — Postgres: tsvector + pg_trgm, без отдельного сервиса.
+Выбор — settings.search.backend.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Protocol, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .breaker import SearchUnavailable
+
+
+@dataclass
+class SearchHits:
+    ids: list[int]                  # в порядке релевантности
+    total: Optional[int]            # None — не считали (include_total=False)
+    total_relation: Optional[str]   # "eq" | "gte"
+    after: Optional[list] = None    # позиция последнего хита для следующей страницы
+    pit: Optional[str] = None       # point-in-time (только ES)
+    facets: Optional[dict[str, Any]] = None
+    # Готовые карточки из самого индекса (ES _source) — если бэкенд их умеет
+    sources: Optional[dict[int, dict]] = None
+
+
+class SearchQueryError(Exception):
+    """
+    Бэкенд отклонил сам запрос (4xx: ответ _search или элемент _msearch) — не недоступность.
+    status 404 — нет индекса (алиаса): это уже не ошибка клиента, а неготовый поиск.
+    """
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class SearchBackend(Protocol):
+    name: str
+
+    async def search(
+        self,
+        session: AsyncSession,
+        *,
+        q: str,
+        category_id: Optional[int],
+        filters: dict[str, Any],
+        limit: int,
+        offset: int,
+        after: Optional[list],
+        pit: Optional[str],
+        include_total: bool,
+        facets: bool,
+        with_source: bool,
+    ) -> SearchHits: ...
+
+    async def msearch(
+        self, session: AsyncSession, queries: Sequence[dict[str, Any]]
+    ) -> list[SearchHits | SearchUnavailable | SearchQueryError]:
+        """
+        Несколько первых страниц (аргументы search без after) за раз, ответы — в том же порядке.
+        Ошибка отдельного запроса — на его месте, а не исключение на всю пачку:
+        SearchUnavailable — бэкенд не смог (5xx/429), SearchQueryError — запрос отклонён (4xx).
+        """
+        ...
+
+    async def suggest(
+        self, session: AsyncSession, *, prefix: str, limit: int
+    ) -> list[dict[str, Any]]: ...
+
+
+def search_filters(
+    *,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    in_stock: Optional[bool] = None,
+    attrs: Sequence[tuple[int, str]] = (),
+    include_inactive: bool = False,
+) -> dict[str, Any]:
+    """Фильтры поиска в нормализованном виде — одинаковы для запроса, ключа кэша и курсора."""
+    return {
+        "price_min": price_min,
+        "price_max": price_max,
+        "in_stock": in_stock,
+        "attrs": sorted([int(aid), value] for aid, value in attrs),
+        "inactive": include_inactive,
+    }
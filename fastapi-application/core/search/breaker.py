@@ -0,0 +1,168 @@
+"""
+Circuit breaker вокруг вызовов Elasticsearch из API (поиск и подсказки).
+
+Каждый вызов ограничен бюджетом search.es_latency_budget_ms (дольше — отмена),
+исход пишется в скользящее окно последних breaker_window вызовов. Неудача —
+недоступность ES (сеть, таймаут, 5xx/429) или вызов дольше breaker_slow_call_ms.
+  - closed    — вызовы идут в ES; доля неудач в окне >= breaker_failure_rate
+                (при не менее breaker_min_calls вызовах) -> open;
+  - open      — в ES не ходим вовсе, сразу SearchUnavailable;
+                через breaker_open_seconds -> half_open;
+  - half_open — пропускаем breaker_half_open_calls пробных вызовов:
+                все удачны -> closed, любая неудача -> снова open.
+SearchUnavailable ловит crud/products_search и отвечает деградированной
+выдачей из Postgres (pg_backend.fallback_search).
+
+Состояние — на процесс (у каждого воркера gunicorn своё), без Redis:
+breaker должен работать и тогда, когда плохо всем сразу.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from core.config import settings
+from .metrics import SEARCH_BREAKER_STATE, SEARCH_BREAKER_TRANSITIONS
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# Значение gauge search_breaker_state
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class SearchUnavailable(Exception):
+    """Поисковый бэкенд недоступен (или breaker открыт) — пора в деградированный режим."""
+
+    def __init__(self, message: str, reason: str) -> None:
+        super().__init__(message)
+        self.reason = reason  # open | timeout | error
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ) -> None:
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True — неудача
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0     # пробных вызовов выпущено в half_open
+        self._probes_ok = 0
+        SEARCH_BREAKER_STATE.labels(name).set(_STATE_VALUE[CLOSED])
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        log.warning("Circuit breaker %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        SEARCH_BREAKER_STATE.labels(self.name).set(_STATE_VALUE[state])
+        SEARCH_BREAKER_TRANSITIONS.labels(self.name, state).inc()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes = self._probes_ok = 0
+        else:
+            self._outcomes.clear()
+
+    def _acquire(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        return False
+
+    def _record(self, failed: bool) -> None:
+        if self._state == HALF_OPEN:
+            if failed:
+                self._transition(OPEN)
+            else:
+                self._probes_ok += 1
+                if self._probes_ok >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self._state == OPEN:
+            # Ответ, начатый ещё до открытия, — на решение уже не влияет
+            return
+        self._outcomes.append(failed)
+        if (
+            len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+        ):
+            self._transition(OPEN)
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        timeout: float,
+        is_failure: Callable[[BaseException], bool],
+    ) -> T:
+        """
+        fn() под breaker'ом и бюджетом timeout (сек).
+        Недоступность (is_failure, таймаут) -> SearchUnavailable; прочие ошибки
+        (например, 400 на кривой запрос) пробрасываются как есть и неудачей не считаются.
+        """
+        if not self._acquire():
+            raise SearchUnavailable(f"{self.name}: circuit open", reason="open")
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError as exc:
+            self._record(True)
+            raise SearchUnavailable(f"{self.name}: latency budget {timeout:.3f}s exceeded", reason="timeout") from exc
+        except Exception as exc:
+            if is_failure(exc):
+                self._record(True)
+                raise SearchUnavailable(f"{self.name}: {exc!r}", reason="error") from exc
+            self._record(False)
+            raise
+        except BaseException:
+            # Отмена клиентом: исхода нет, но пробный слот half_open не должен пропасть
+            if self._state == HALF_OPEN:
+                self._probes -= 1
+            raise
+        self._record(time.monotonic() - started > self.slow_call)
+        return result
+
+
+def _from_settings(name: str) -> CircuitBreaker:
+    cfg = settings.search
+    return CircuitBreaker(
+        name,
+        window=cfg.breaker_window,
+        min_calls=cfg.breaker_min_calls,
+        failure_rate=cfg.breaker_failure_rate,
+        slow_call=cfg.breaker_slow_call_ms / 1000,
+        open_seconds=cfg.breaker_open_seconds,
+        half_open_calls=cfg.breaker_half_open_calls,
+    )
+
+
+es_breaker = _from_settings("elasticsearch")
@@ -6,16 +6,16 @@ from core.config import settings
 _client: Optional[AsyncElasticsearch] = None
 
 def _es_url() -> str:
-    # можно вынести в ENV: ELASTICSEARCH_URL=http://localhost:9200
-    return getattr(settings, "ELASTICSEARCH_URL", "http://localhost:9200")
+    # ENV: APP_CONFIG__ES__URL=http://localhost:9200
+    return settings.es.url
 
 def index_alias() -> str:
-    return getattr(settings, "ELASTICSEARCH_INDEX_ALIAS", "products")
+    return settings.es.index_alias
 
 async def get_client() -> AsyncElasticsearch:
     global _client
     if _client is None:
-        _client = AsyncElasticsearch(_es_url(), request_timeout=10)
+        _client = AsyncElasticsearch(_es_url(), request_timeout=settings.es.request_timeout)
     return _client
 
 async def close_client():
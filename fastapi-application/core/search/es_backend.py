@@ -0,0 +1,407 @@
+"""
+Поисковый бэкенд на Elasticsearch (settings.search.backend = "elasticsearch").
+Документы пишет outbox-индексатор (core/search/outbox.py), маппинг — core/search/mapping.py.
+Все вызовы — через es_breaker (core/search/breaker.py): при недоступности ES
+search/suggest бросают SearchUnavailable за бюджет, а не висят request_timeout.
+"""
+
+import functools
+import logging
+from typing import Any, Optional, Sequence
+
+from elasticsearch import ApiError, AsyncElasticsearch, NotFoundError, TransportError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.schemas.product import META_PREFIX
+from .backend import SearchHits, SearchQueryError, search_filters
+from .breaker import SearchUnavailable, es_breaker
+from .es import index_alias
+from .metrics import SEARCH_PIT
+
+log = logging.getLogger(__name__)
+
+# Порядок выдачи: релевантность + id как тай-брейкер для search_after.
+# unmapped_type — для индексов, собранных до появления поля id.
+SEARCH_SORT = [
+    {"_score": "desc"},
+    {"id": {"order": "asc", "unmapped_type": "long"}},
+]
+# Поля, по которым ищем (под v2 маппинг: RU + EN)
+SEARCH_FIELDS = [
+    "title^3",            # русский анализатор (основное поле)
+    "title.prefix^2",     # русские префиксы (edge_ngram)
+    "title.en^2",         # английский
+    "title.prefix_en^2",  # английские префиксы
+    "description",
+    "description.en",
+    "category_name^0.75",
+    "category_name.en^0.6",
+]
+
+
+def _build_es_query(
+    q: str, category_id: Optional[int], filters: Optional[dict[str, Any]] = None
+) -> dict[str, Any]:
+    f = filters or search_filters()
+    clauses: list[dict[str, Any]] = []
+    must_not: list[dict[str, Any]] = []
+    if category_id is not None:
+        # В индексе category_id — keyword, безопаснее приводить к строке
+        clauses.append({"term": {"category_id": str(category_id)}})
+    if f["price_min"] is not None or f["price_max"] is not None:
+        price = {"gte": f["price_min"], "lte": f["price_max"]}
+        clauses.append({"range": {"retail_price": {k: v for k, v in price.items() if v is not None}}})
+    if f["in_stock"] is not None:
+        clauses.append({"term": {"in_stock": f["in_stock"]}})
+    for attribute_id, value in f["attrs"]:
+        clauses.append({
+            "nested": {
+                "path": "attributes",
+                "query": {"bool": {"filter": [
+                    {"term": {"attributes.attribute_id": attribute_id}},
+                    {"term": {"attributes.value": value}},
+                ]}},
+            }
+        })
+    if not f["inactive"]:
+        # must_not, а не term is_active=true: документы без поля (до пересборки) не теряем
+        must_not.append({"term": {"is_active": False}})
+
+    should: list[dict[str, Any]] = []
+    q = (q or "").strip()
+    if q:
+        should.append({
+            "multi_match": {
+                "query": q,
+                "type": "best_fields",
+                "fields": SEARCH_FIELDS,
+                "fuzziness": "AUTO",
+                "operator": "and",
+            }
+        })
+
+    return {
+        "bool": {
+            "filter": clauses,
+            "must_not": must_not,
+            "should": should,
+            "minimum_should_match": 1 if should else 0,
+        }
+    }
+
+
+# =========================
+# ФАСЕТЫ
+# =========================
+
+def _build_aggs(category_id: Optional[int]) -> dict[str, Any]:
+    cfg = settings.es
+    aggs: dict[str, Any] = {
+        "categories": {"terms": {"field": "category_id", "size": cfg.facet_categories_size}},
+        "price_stats": {"stats": {"field": "retail_price"}},
+        "price": {
+            "histogram": {"field": "retail_price", "interval": cfg.facet_price_interval, "min_doc_count": 1}
+        },
+        "in_stock": {"filter": {"term": {"in_stock": True}}},
+    }
+    if category_id is not None:
+        # Атрибуты у категорий разные — топ значений считаем только внутри категории
+        aggs["attributes"] = {
+            "nested": {"path": "attributes"},
+            "aggs": {
+                "by_attribute": {
+                    "terms": {"field": "attributes.attribute_id", "size": cfg.facet_attributes_size},
+                    "aggs": {
+                        "name": {"terms": {"field": "attributes.name", "size": 1}},
+                        "values": {"terms": {"field": "attributes.value", "size": cfg.facet_values_size}},
+                    },
+                }
+            },
+        }
+    return aggs
+
+
+def _parse_facets(aggs: dict[str, Any]) -> dict[str, Any]:
+    stats = aggs["price_stats"]
+    facets: dict[str, Any] = {
+        "categories": [
+            {"category_id": int(b["key"]), "count": b["doc_count"]}
+            for b in aggs["categories"]["buckets"]
+        ],
+        "price": {
+            "min": stats["min"],
+            "max": stats["max"],
+            "histogram": [
+                {"from": int(b["key"]), "count": b["doc_count"]} for b in aggs["price"]["buckets"]
+            ],
+        },
+        "in_stock": aggs["in_stock"]["doc_count"],
+    }
+    if "attributes" in aggs:
+        facets["attributes"] = []
+        for b in aggs["attributes"]["by_attribute"]["buckets"]:
+            names = b["name"]["buckets"]
+            name = names[0]["key"] if names else ""
+            facets["attributes"].append({
+                "attribute_id": int(b["key"]),
+                # Служебный префикс в выдаче не показываем (как в ProductAttributeReadUser)
+                "name": name.removeprefix(META_PREFIX),
+                "values": [{"value": v["key"], "count": v["doc_count"]} for v in b["values"]["buckets"]],
+            })
+    return facets
+
+
+# =========================
+# АВТОДОПОЛНЕНИЕ
+# =========================
+
+def _build_suggest_query(prefix: str) -> dict[str, Any]:
+    """
+    Только edge_ngram-подполя заголовка, без fuzziness.
+    Анализатор запроса — обычный ru/en: иначе ru_prefix/en_prefix разрезал бы
+    на n-граммы и сам префикс, и «теле» совпало бы со всем, что начинается на «те».
+    """
+    return {
+        "bool": {
+            "should": [
+                {"match": {"title.prefix": {"query": prefix, "analyzer": "ru", "operator": "and"}}},
+                {"match": {"title.prefix_en": {"query": prefix, "analyzer": "en", "operator": "and"}}},
+            ],
+            "minimum_should_match": 1,
+            "must_not": [{"term": {"is_active": False}}],
+        }
+    }
+
+
+# =========================
+# БЭКЕНД
+# =========================
+
+def _from_source(hit: dict[str, Any]) -> dict | None:
+    """Карточка прямо из _source; None — документ проиндексирован до появления display."""
+    src = hit.get("_source") or {}
+    display = src.get("display")
+    if not display:
+        return None
+    return {**display, "description": src.get("description")}
+
+
+def _search_params(
+    q: str,
+    category_id: Optional[int],
+    filters: dict[str, Any],
+    limit: int,
+    include_total: bool,
+    facets: bool,
+    with_source: bool,
+) -> dict[str, Any]:
+    """Тело _search (оно же — элемент _msearch) без пагинации."""
+    params: dict[str, Any] = dict(
+        query=_build_es_query(q, category_id, filters),
+        sort=SEARCH_SORT,
+        size=limit,
+        track_total_hits=settings.es.search_track_total_hits if include_total else False,
+        # для source тянем только то, что отдаём; иначе хватит _id/sort
+        _source=["display", "description"] if with_source else False,
+    )
+    if facets:
+        params["aggs"] = _build_aggs(category_id)
+    return params
+
+
+def _to_hits(
+    res: dict[str, Any], limit: int, facets: bool, with_source: bool, pit: Optional[str]
+) -> SearchHits:
+    hits = res["hits"]["hits"]
+    total_info = res["hits"].get("total")
+    sources = None
+    if with_source:
+        sources = {}
+        for hit in hits:
+            card = _from_source(hit)
+            if card is not None:
+                sources[int(hit["_id"])] = card
+    return SearchHits(
+        ids=[int(h["_id"]) for h in hits],
+        total=int(total_info["value"]) if total_info else None,
+        total_relation=total_info["relation"] if total_info else None,
+        after=hits[-1]["sort"] if len(hits) == limit else None,
+        pit=pit,
+        facets=_parse_facets(res["aggregations"]) if facets else None,
+        sources=sources,
+    )
+
+
+def _is_outage(exc: BaseException) -> bool:
+    """Сеть/таймаут транспорта, 5xx и 429 — недоступность; прочие 4xx — ошибка запроса."""
+    if isinstance(exc, TransportError):
+        return True
+    if isinstance(exc, ApiError):
+        return exc.meta.status >= 500 or exc.meta.status == 429
+    return False
+
+
+class ElasticsearchBackend:
+    name = "elasticsearch"
+
+    def __init__(self, es: AsyncElasticsearch) -> None:
+        self.es = es
+
+    async def _guarded(self, fn, /, **kwargs: Any):
+        try:
+            return await es_breaker.call(
+                functools.partial(fn, **kwargs),
+                timeout=settings.search.es_latency_budget_ms / 1000,
+                is_failure=_is_outage,
+            )
+        except ApiError as exc:
+            # Не недоступность (breaker пропустил как есть): 400 на запрос, 404 — нет индекса/алиаса
+            raise SearchQueryError(f"{self.name}: {exc.message}", exc.meta.status) from exc
+
+    async def _open_pit(self) -> str:
+        res = await self.es.open_point_in_time(
+            index=index_alias(), keep_alive=settings.es.search_pit_keep_alive
+        )
+        SEARCH_PIT.labels("opened").inc()
+        return res["id"]
+
+    async def _close_pit(self, pit_id: str) -> None:
+        """Последняя страница отдана — не ждём keep_alive. Не закрылся — истечёт сам."""
+        try:
+            await self.es.close_point_in_time(id=pit_id)
+        except (ApiError, TransportError):
+            log.debug("Не удалось закрыть PIT поиска", exc_info=True)
+            return
+        SEARCH_PIT.labels("closed").inc()
+
+    async def _search_after(
+        self, pit: Optional[str], after: list, **kwargs: Any
+    ) -> tuple[dict, str]:
+        """
+        Следующая страница внутри PIT: все страницы видят один и тот же снимок
+        индекса, и выдача не «съезжает» от параллельной индексации.
+        PIT открываем со второй страницы — первая (её смотрят почти все) обходится без него,
+        и закрываем на последней; брошенные на середине истекают через search_pit_keep_alive.
+        """
+        keep_alive = settings.es.search_pit_keep_alive
+        pit_id = pit or await self._open_pit()
+        try:
+            res = await self.es.search(pit={"id": pit_id, "keep_alive": keep_alive}, search_after=after, **kwargs)
+        except NotFoundError:
+            # PIT истёк — продолжаем с той же позиции в новом снимке
+            SEARCH_PIT.labels("expired").inc()
+            pit_id = await self._open_pit()
+            res = await self.es.search(pit={"id": pit_id, "keep_alive": keep_alive}, search_after=after, **kwargs)
+        return res, res.get("pit_id", pit_id)
+
+    async def search(
+        self,
+        session: AsyncSession,
+        *,
+        q: str,
+        category_id: Optional[int],
+        filters: dict[str, Any],
+        limit: int,
+        offset: int,
+        after: Optional[list],
+        pit: Optional[str],
+        include_total: bool,
+        facets: bool,
+        with_source: bool,
+    ) -> SearchHits:
+        # Бюджет — на всю страницу, включая переоткрытие истёкшего PIT
+        return await self._guarded(
+            self._search,
+            q=q,
+            category_id=category_id,
+            filters=filters,
+            limit=limit,
+            offset=offset,
+            after=after,
+            pit=pit,
+            include_total=include_total,
+            facets=facets,
+            with_source=with_source,
+        )
+
+    async def suggest(
+        self, session: AsyncSession, *, prefix: str, limit: int
+    ) -> list[dict[str, Any]]:
+        return await self._guarded(self._suggest, prefix=prefix, limit=limit)
+
+    async def msearch(
+        self, session: AsyncSession, queries: Sequence[dict[str, Any]]
+    ) -> list[SearchHits | SearchUnavailable | SearchQueryError]:
+        # Вся пачка — один вызов под breaker'ом и одним бюджетом
+        return await self._guarded(self._msearch, queries=queries)
+
+    async def _search(
+        self,
+        *,
+        q: str,
+        category_id: Optional[int],
+        filters: dict[str, Any],
+        limit: int,
+        offset: int,
+        after: Optional[list],
+        pit: Optional[str],
+        include_total: bool,
+        facets: bool,
+        with_source: bool,
+    ) -> SearchHits:
+        params = _search_params(q, category_id, filters, limit, include_total, facets, with_source)
+        if after is None:
+            res = await self.es.search(index=index_alias(), from_=offset, **params)
+            return _to_hits(res, limit, facets, with_source, None)
+        res, pit = await self._search_after(pit, after, **params)
+        hits = _to_hits(res, limit, facets, with_source, pit)
+        if hits.after is None:
+            await self._close_pit(pit)
+            hits.pit = None
+        return hits
+
+    async def _msearch(
+        self, *, queries: Sequence[dict[str, Any]]
+    ) -> list[SearchHits | SearchUnavailable | SearchQueryError]:
+        searches: list[dict[str, Any]] = []
+        for query in queries:
+            searches.append({"index": index_alias()})
+            searches.append({
+                **_search_params(
+                    query["q"], query["category_id"], query["filters"], query["limit"],
+                    query["include_total"], query["facets"], query["with_source"],
+                ),
+                "from": query["offset"],
+            })
+        res = await self.es.msearch(searches=searches)
+
+        results: list[SearchHits | SearchUnavailable | SearchQueryError] = []
+        for query, item in zip(queries, res["responses"]):
+            if "error" in item:
+                status = item.get("status")
+                # Как _is_outage: недоступность — только 5xx/429 (и ответ без статуса)
+                if status is None or status >= 500 or status == 429:
+                    results.append(
+                        SearchUnavailable(f"{self.name}: {item['error']}", reason="error")
+                    )
+                else:
+                    error = item["error"]
+                    reason = error.get("reason", error) if isinstance(error, dict) else error
+                    results.append(SearchQueryError(f"{self.name}: {reason}", status))
+            else:
+                results.append(_to_hits(item, query["limit"], query["facets"], query["with_source"], None))
+        return results
+
+    async def _suggest(self, *, prefix: str, limit: int) -> list[dict[str, Any]]:
+        res = await self.es.search(
+            index=index_alias(),
+            query=_build_suggest_query(prefix),
+            size=limit,
+            _source=["title"],
+            track_total_hits=False,
+        )
+        return [
+            {"id": int(h["_id"]), "title": (h.get("_source") or {}).get("title")}
+            for h in res["hits"]["hits"]
+        ]
@@ -1,21 +1,99 @@
 # core/search/indexer.py
-from typing import Any
+import hashlib
+import json
+import logging
+from typing import Any, Iterable
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from core.cache.serializers import serialize_product_base, serialize_product_dynamic
 from core.models.product import Product
+from core.models.product_attribute import ProductAttributeValue
 from .es import index_alias
 
+log = logging.getLogger(__name__)
+
 def _category_name(p: Product) -> str | None:
     cat = getattr(p, "category", None)
     return getattr(cat, "name", None) if cat is not None else None
 
+# Связи, без которых не собрать документ (display); грузить пачкой через selectinload
+DOC_LOAD_OPTIONS = (
+    selectinload(Product.category),
+    selectinload(Product.images),
+    selectinload(Product.attributes).selectinload(ProductAttributeValue.attribute),
+)
+
+def product_display(p: Product) -> dict[str, Any]:
+    """
+    Поля для выдачи поиска — та же карточка, что лежит в кэше (serializers),
+    но вместо списка картинок только главная, а description берётся из самого документа.
+    """
+    base = serialize_product_base(p).model_dump(mode="json", exclude_none=True)
+    dyn = serialize_product_dynamic(p).model_dump(mode="json", exclude_none=True)
+    base.pop("description", None)
+    images = base.pop("images", [])
+    return {**base, **dyn, "main_image": images[0] if images else None}
+
+def fingerprint(part: dict[str, Any]) -> str:
+    """Короткий хэш части документа: по нему сверка (core/search/reconcile.py) находит устаревшие."""
+    raw = json.dumps(part, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+def dynamic_doc(p: Product) -> dict[str, Any]:
+    """
+    Часть документа, которая меняется с ценами/остатками/активностью —
+    её шлём частичным update, не пересобирая документ (и не грузя связи).
+    None передаём явно: update сливает объекты, пропущенный ключ остался бы старым.
+    fp_dyn — отпечаток этой части; едет тем же update, поэтому не расходится с ней.
+    """
+    dyn = serialize_product_dynamic(p).model_dump(mode="json")
+    doc = {
+        "retail_price": dyn["retail_price"],
+        "quantity":     dyn["quantity"],
+        "in_stock":     dyn["in_stock"],
+        "is_active":    p.is_active,
+        "display":      {**dyn, "is_active": p.is_active},
+    }
+    doc["fp_dyn"] = fingerprint(doc)
+    return doc
+
 def _to_doc(p: Product) -> dict[str, Any]:
-    return {
+    dynamic = dynamic_doc(p)
+    display = product_display(p)
+    static = {
+        "id":           p.id,
         "title":        getattr(p, "title", None),
         "description":  getattr(p, "description", None),
         "category_id":  getattr(p, "category_id", None),
         "category_name": _category_name(p),
+        "attributes": [
+            {"attribute_id": a.attribute_id, "name": a.name, "value": a.value}
+            for a in p.attributes
+        ],
+    }
+    # fp — отпечаток всего, что частичный update не трогает
+    static_display = {k: v for k, v in display.items() if k not in dynamic["display"]}
+    return {
+        **static,
+        # Фильтры и фасеты
+        **{k: v for k, v in dynamic.items() if k != "display"},
+        # Не индексируется (enabled: false в маппинге) — только для отдачи из _source
+        "display":      display,
+        "fp":           fingerprint({**static, "display": static_display}),
     }
 
+def doc_fingerprints(p: Product) -> tuple[str, str]:
+    """(fp, fp_dyn) документа товара — то же, что _to_doc положит в индекс."""
+    doc = _to_doc(p)
+    return doc["fp"], doc["fp_dyn"]
+
+def index_action(p: Product, index: str | None = None) -> dict[str, Any]:
+    """Действие index для helpers.async_bulk / async_streaming_bulk (по умолчанию — в алиас)."""
+    return {"_op_type": "index", "_index": index or index_alias(), "_id": str(p.id), "_source": _to_doc(p)}
+
 async def index_product(es: AsyncElasticsearch, p: Product):
     # если применяешь soft-delete — просто не индексируй удалённые: удаляй документ из ES в CRUD на delete
     await es.index(index=index_alias(), id=str(p.id), document=_to_doc(p), refresh="false")
@@ -25,3 +103,71 @@ async def delete_product(es: AsyncElasticsearch, product_id: int):
         await es.delete(index=index_alias(), id=str(product_id), refresh="false")
     except Exception:
         pass
+
+def _bulk_failures(errors: list[dict]) -> tuple[dict[int, str], set[int]]:
+    """({product_id: ошибка}, id, для которых update не нашёл документа)."""
+    failed: dict[int, str] = {}
+    missing: set[int] = set()
+    for error in errors:
+        op, info = next(iter(error.items()))
+        if info.get("status") == 404:
+            # delete: документа и так нет; update: документа нет — проиндексируем целиком
+            if op == "update":
+                missing.add(int(info["_id"]))
+            continue
+        failed[int(info["_id"])] = str(info.get("error") or info.get("exception") or info.get("status"))
+    return failed, missing
+
+
+async def sync_products(
+    es: AsyncElasticsearch,
+    session: AsyncSession,
+    product_ids: Iterable[int],
+    index: str | None = None,
+    partial_ids: Iterable[int] = (),
+) -> tuple[int, dict[int, str]]:
+    """
+    Приводит документы пачки товаров к состоянию БД одним _bulk:
+    живые — index, удалённые/несуществующие — delete.
+    partial_ids — товары, у которых менялась только динамика: им частичный
+    update (dynamic_doc) без загрузки связей; не нашёлся документ — index целиком.
+    index — конкретный индекс (при пересборке), по умолчанию алиас.
+    Возвращает (успешных действий, {product_id: ошибка}).
+    """
+    index = index or index_alias()
+    ids = sorted(set(product_ids))
+    partial = sorted(set(partial_ids) - set(ids))
+    if not ids and not partial:
+        return 0, {}
+
+    actions: list[dict[str, Any]] = []
+    if ids:
+        res = await session.execute(
+            select(Product).options(*DOC_LOAD_OPTIONS).where(Product.id.in_(ids))
+        )
+        alive = {p.id: p for p in res.scalars().all() if not p.is_deleted}
+        for pid in ids:
+            if pid in alive:
+                actions.append(index_action(alive[pid], index))
+            else:
+                actions.append({"_op_type": "delete", "_index": index, "_id": str(pid)})
+    if partial:
+        res = await session.execute(select(Product).where(Product.id.in_(partial)))
+        alive = {p.id: p for p in res.scalars().all() if not p.is_deleted}
+        for pid in partial:
+            if pid in alive:
+                actions.append(
+                    {"_op_type": "update", "_index": index, "_id": str(pid), "doc": dynamic_doc(alive[pid])}
+                )
+            else:
+                actions.append({"_op_type": "delete", "_index": index, "_id": str(pid)})
+
+    ok, errors = await async_bulk(es, actions, raise_on_error=False, raise_on_exception=False)
+    failed, missing = _bulk_failures(errors)
+    if missing:
+        more_ok, more_failed = await sync_products(es, session, missing, index)
+        ok += more_ok
+        failed.update(more_failed)
+    if failed:
+        log.warning("ES: %s ошибок синхронизации товаров, первая: %s", len(failed), next(iter(failed.items())))
+    return ok, failed
@@ -0,0 +1,88 @@
+"""
+Маппинг и настройки индекса товаров.
+Общие для scripts/es_bootstrap.py и пересборки индекса (core/search/rebuild.py).
+"""
+
+# Маппинг/настройки: русский + английский анализаторы.
+# Сохраняем back-compat: поле title имеет подполе "prefix" (RU-префикс),
+# добавляем англ. подполя: "title.en" и "title.prefix_en".
+BODY = {
+    "settings": {
+        "analysis": {
+            "filter": {
+                # RU
+                "ru_stop": {"type": "stop", "stopwords": "_russian_"},
+                "ru_stemmer": {"type": "stemmer", "language": "russian"},
+                # EN
+                "en_stop": {"type": "stop", "stopwords": "_english_"},
+                "en_stemmer": {"type": "stemmer", "language": "english"},
+                # Общий edge-ngram для префиксного поиска
+                "edge": {"type": "edge_ngram", "min_gram": 2, "max_gram": 15},
+            },
+            "analyzer": {
+                # Базовые анализаторы
+                "ru": {"tokenizer": "standard", "filter": ["lowercase", "ru_stop", "ru_stemmer"]},
+                "en": {"tokenizer": "standard", "filter": ["lowercase", "en_stop", "en_stemmer"]},
+                # Префиксные
+                "ru_prefix": {"tokenizer": "standard", "filter": ["lowercase", "ru_stop", "ru_stemmer", "edge"]},
+                "en_prefix": {"tokenizer": "standard", "filter": ["lowercase", "en_stop", "en_stemmer", "edge"]},
+            },
+        }
+    },
+    "mappings": {
+        "properties": {
+            # Что ищем (RU + EN + префиксы)
+            "title": {
+                "type": "text",
+                "analyzer": "ru",  # основное поле — русский
+                "fields": {
+                    "prefix": {"type": "text", "analyzer": "ru_prefix"},     # back-compat для текущего запроса "title.prefix"
+                    "en": {"type": "text", "analyzer": "en"},
+                    "prefix_en": {"type": "text", "analyzer": "en_prefix"},
+                },
+            },
+            "description": {
+                "type": "text",
+                "analyzer": "ru",
+                "fields": {
+                    "en": {"type": "text", "analyzer": "en"},
+                },
+            },
+            "category_name": {
+                "type": "text",
+                "analyzer": "ru",
+                "fields": {
+                    "en": {"type": "text", "analyzer": "en"},
+                },
+            },
+
+            # Фильтры
+            "category_id": {"type": "keyword"},
+            # Тай-брейкер сортировки для search_after (_score, id)
+            "id": {"type": "long"},
+            # Цены/остатки/активность — обновляются частичным update (indexer.dynamic_doc)
+            "retail_price": {"type": "long"},
+            "quantity": {"type": "integer"},
+            "in_stock": {"type": "boolean"},
+            "is_active": {"type": "boolean"},
+            # Значения атрибутов для фильтров и фасетов; nested — чтобы пара
+            # (attribute_id, value) не смешивалась с соседними атрибутами товара
+            "attributes": {
+                "type": "nested",
+                "properties": {
+                    "attribute_id": {"type": "integer"},
+                    "name": {"type": "keyword"},
+                    "value": {"type": "keyword"},
+                },
+            },
+
+            # Готовая карточка для выдачи (см. indexer.product_display):
+            # хранится только в _source, не индексируется и не анализируется
+            "display": {"type": "object", "enabled": False},
+            # Отпечатки документа для сверки с Postgres (core/search/reconcile.py):
+            # читаются из _source, поиск по ним не нужен
+            "fp": {"type": "keyword", "index": False},
+            "fp_dyn": {"type": "keyword", "index": False},
+        }
+    },
+}
@@ -0,0 +1,80 @@
+"""
+Prometheus-метрики поиска и индексации в Elasticsearch.
+Лаг outbox считает приложение (его /metrics и так скрейпится),
+а не taskiq-воркер — у воркера своего эндпоинта метрик нет.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+OUTBOX_PENDING = Gauge(
+    "search_outbox_pending",
+    "Необработанные строки search_outbox",
+)
+
+OUTBOX_LAG = Gauge(
+    "search_outbox_lag_seconds",
+    "Возраст самой старой необработанной строки search_outbox",
+)
+
+OUTBOX_RETRYING = Gauge(
+    "search_outbox_retrying",
+    "Строки search_outbox, ожидающие повтора после ошибки ES",
+)
+
+SEARCH_HYDRATED = Counter(
+    "search_hydrated_total",
+    "Товары выдачи /products/search по источнику карточки",
+    ["source"],  # es_source | cache | db
+)
+
+SEARCH_RESULT_CACHE = Counter(
+    "search_result_cache_requests_total",
+    "Обращения к кэшу выдачи поиска",
+    ["kind", "result"],  # kind: search | suggest; result: hit | miss | stale_generation | error
+)
+
+SUGGEST_LATENCY = Histogram(
+    "search_suggest_seconds",
+    "Время ответа /products/suggest (включая кэш)",
+    buckets=(0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 1.0),
+)
+
+SEARCH_PIT = Counter(
+    "search_pit_total",
+    "Point-in-time пагинации /products/search",
+    ["event"],  # opened | closed | expired
+)
+
+SEARCH_BREAKER_STATE = Gauge(
+    "search_breaker_state",
+    "Состояние circuit breaker поискового бэкенда: 0 closed, 1 half_open, 2 open",
+    ["backend"],
+)
+
+SEARCH_BREAKER_TRANSITIONS = Counter(
+    "search_breaker_transitions_total",
+    "Переходы circuit breaker поискового бэкенда",
+    ["backend", "state"],
+)
+
+SEARCH_DEGRADED = Counter(
+    "search_degraded_total",
+    "Запросы, обслуженные деградированным поиском по Postgres",
+    ["kind", "reason"],  # kind: search | suggest; reason: open | timeout | error
+)
+
+SEARCH_INDEX_DRIFT = Gauge(
+    "search_index_drift",
+    "Расхождения индекса ES с Postgres в последней сверке",
+    ["kind"],  # missing | extra | stale | broken
+)
+
+SEARCH_RECONCILE_REPAIRED = Gauge(
+    "search_reconcile_repaired",
+    "Документы, исправленные последней сверкой ES с Postgres",
+)
+
+SEARCH_RECONCILE_LAST_RUN = Gauge(
+    "search_reconcile_last_run_timestamp_seconds",
+    "Время окончания последней сверки ES с Postgres",
+)
@@ -0,0 +1,218 @@
+"""
+Transactional outbox для индексации товаров в Elasticsearch.
+
+Писатель — core/change_tracker.py: в after_flush кладёт строки search_outbox
+тем же соединением, т.е. в той же транзакции, что и изменение товара.
+Откат транзакции откатывает и событие, commit — гарантирует, что оно не потеряется.
+
+Читатель — фоновый цикл в taskiq-воркере (tasks/search_outbox.py), проход в три шага:
+  1. захват — пачка строк `FOR UPDATE SKIP LOCKED` в порядке id получает аренду
+     (available_at = now + outbox_claim_timeout), транзакция сразу коммитится;
+  2. индексация — без открытой транзакции и блокировок строк: схлопываем по
+     product_id и одним _bulk приводим документы к текущему состоянию БД
+     (indexer.sync_products): целиком или, если менялись только
+     цены/остатки/активность, частичным update;
+  3. подтверждение — отдельной транзакцией: удачные строки удаляем, неудачные
+     (в том числе все строки пачки при ошибке ES целиком) откладываем
+     с экспоненциальной задержкой.
+Упал воркер между шагами — строки снова станут доступны, когда истечёт аренда.
+Порядок по товару: одновременно проходит только один воркер (сессионный
+pg_try_advisory_lock на отдельном соединении, без транзакции), а документ
+всегда строится из актуальной строки в БД — более старое состояние не может
+перезаписать более новое.
+"""
+
+import asyncio
+import contextlib
+import logging
+from typing import Iterable
+
+from elasticsearch import ApiError, AsyncElasticsearch, TransportError
+from sqlalchemy import Connection, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import settings
+from core.models.search_outbox import SearchOutbox
+from .indexer import sync_products
+from .metrics import OUTBOX_LAG, OUTBOX_PENDING, OUTBOX_RETRYING
+from .rebuild import mark_dirty
+from .reconcile import refresh_reconcile_metrics
+
+log = logging.getLogger(__name__)
+
+# Ключ advisory lock'а: один активный индексатор на кластер
+OUTBOX_LOCK_KEY = 0x5EA7C4
+
+
+def enqueue(
+    connection: Connection, product_ids: Iterable[int], partial_ids: Iterable[int] = ()
+) -> None:
+    """
+    Вызывается внутри flush (синхронно, тем же соединением, что и запись товара).
+    partial_ids — товары, у которых поменялась только динамика (цены/остатки/активность).
+    """
+    full = set(product_ids)
+    rows = [{"product_id": pid, "partial": False} for pid in sorted(full)]
+    rows += [{"product_id": pid, "partial": True} for pid in sorted(set(partial_ids) - full)]
+    if rows:
+        connection.execute(insert(SearchOutbox), rows)
+
+
+async def drain_once(
+    es: AsyncElasticsearch, session_factory: async_sessionmaker[AsyncSession]
+) -> int:
+    """Один проход: сколько строк outbox обработано (0 — пусто или занято другим воркером)."""
+    engine = session_factory.kw["bind"]
+    async with engine.connect() as lock_conn:
+        locked = await lock_conn.scalar(select(func.pg_try_advisory_lock(OUTBOX_LOCK_KEY)))
+        # Lock сессионный: держится на соединении и после commit, без открытой транзакции
+        await lock_conn.commit()
+        if not locked:
+            return 0
+        try:
+            return await _drain_batch(es, session_factory)
+        finally:
+            try:
+                await lock_conn.execute(select(func.pg_advisory_unlock(OUTBOX_LOCK_KEY)))
+                await lock_conn.commit()
+            except Exception:
+                # Не отдаём в пул соединение, на котором мог остаться lock
+                await lock_conn.invalidate()
+                raise
+
+
+async def _drain_batch(
+    es: AsyncElasticsearch, session_factory: async_sessionmaker[AsyncSession]
+) -> int:
+    cfg = settings.es
+
+    # 1. Захват
+    async with session_factory() as session, session.begin():
+        rows = (
+            await session.execute(
+                select(SearchOutbox.id, SearchOutbox.product_id, SearchOutbox.partial)
+                .where(SearchOutbox.available_at <= func.now())
+                .order_by(SearchOutbox.id)
+                .limit(cfg.outbox_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not rows:
+            return 0
+        await session.execute(
+            update(SearchOutbox)
+            .where(SearchOutbox.id.in_([row.id for row in rows]))
+            .values(
+                available_at=func.now()
+                + func.make_interval(0, 0, 0, 0, 0, 0, cfg.outbox_claim_timeout)
+            )
+        )
+
+    # 2. Индексация
+    product_ids = {row.product_id for row in rows}
+    # Хоть одна полная строка по товару — документ пересобираем целиком
+    full_ids = {row.product_id for row in rows if not row.partial}
+    # Идёт пересборка индекса — эти товары доиграют и в новый индекс
+    await mark_dirty(product_ids)
+    try:
+        async with session_factory() as session:
+            _, failed = await sync_products(es, session, full_ids, partial_ids=product_ids - full_ids)
+    except (TransportError, ApiError) as exc:
+        # ES недоступен целиком — неудача у всех товаров пачки
+        log.warning("Outbox: _bulk не выполнен: %r", exc)
+        failed = {product_id: repr(exc) for product_id in product_ids}
+
+    # 3. Подтверждение
+    async with session_factory() as session, session.begin():
+        done = [row.id for row in rows if row.product_id not in failed]
+        if done:
+            await session.execute(delete(SearchOutbox).where(SearchOutbox.id.in_(done)))
+        for product_id, error in failed.items():
+            backoff = func.least(cfg.outbox_max_backoff, func.power(2, SearchOutbox.attempts))
+            await session.execute(
+                update(SearchOutbox)
+                .where(
+                    SearchOutbox.id.in_([row.id for row in rows if row.product_id == product_id])
+                )
+                .values(
+                    attempts=SearchOutbox.attempts + 1,
+                    available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, backoff),
+                    last_error=error[:1000],
+                )
+            )
+    if failed:
+        log.warning("Outbox: %s товаров отложено до повтора", len(failed))
+    return len(rows)
+
+
+async def run_outbox_consumer(
+    es: AsyncElasticsearch, session_factory: async_sessionmaker[AsyncSession]
+) -> None:
+    """Бесконечный цикл индексатора; пока есть полные пачки — без пауз."""
+    cfg = settings.es
+    delay = cfg.outbox_poll_interval
+    while True:
+        try:
+            processed = await drain_once(es, session_factory)
+            delay = cfg.outbox_poll_interval
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.warning("Outbox: проход индексатора упал", exc_info=True)
+            processed = 0
+            delay = min(delay * 2, 30)
+        if processed < cfg.outbox_batch_size:
+            await asyncio.sleep(delay)
+
+
+# =========================
+# МЕТРИКИ ЛАГА И СВЕРКИ (в процессе приложения)
+# =========================
+
+async def refresh_outbox_metrics(session: AsyncSession) -> None:
+    row = (
+        await session.execute(
+            select(
+                func.count(),
+                func.count().filter(SearchOutbox.attempts > 0),
+                func.extract("epoch", func.now() - func.min(SearchOutbox.created_at)),
+            )
+        )
+    ).one()
+    pending, retrying, lag = row
+    OUTBOX_PENDING.set(pending)
+    OUTBOX_RETRYING.set(retrying)
+    OUTBOX_LAG.set(float(lag or 0))
+
+
+_metrics_task: asyncio.Task | None = None
+
+
+async def _metrics_loop(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    while True:
+        try:
+            async with session_factory() as session:
+                await refresh_outbox_metrics(session)
+            await refresh_reconcile_metrics()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.warning("Outbox: не удалось обновить метрики", exc_info=True)
+        await asyncio.sleep(settings.es.outbox_metrics_interval)
+
+
+def start_outbox_metrics(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """Вызывать на старте приложения (lifespan)."""
+    global _metrics_task
+    if _metrics_task is None:
+        _metrics_task = asyncio.create_task(_metrics_loop(session_factory), name="search-outbox-metrics")
+
+
+async def stop_outbox_metrics() -> None:
+    global _metrics_task
+    if _metrics_task is None:
+        return
+    _metrics_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _metrics_task
+    _metrics_task = None
@@ -0,0 +1,313 @@
+"""
+Поисковый бэкенд на Postgres (settings.search.backend = "postgres").
+
+Ни отдельного сервиса, ни индексатора: products.search_ru / search_en —
+генерируемые tsvector-колонки (title — вес A, description — вес B) с GIN-индексами,
+по title — триграммный GIN (pg_trgm). Миграция b7d2e4f61c08.
+
+Совпадение — любое из:
+  - полнотекстовое по русской или английской конфигурации, последнее слово
+    запроса — префиксом (`слово:*`), как edge_ngram в ES;
+  - нечёткое по названию: `q <% title` (word_similarity, опечатки).
+Релевантность — ts_rank по обеим конфигурациям + word_similarity.
+В отличие от ES, по названию категории не ищем: генерируемая колонка
+не может ссылаться на другую таблицу.
+"""
+
+import re
+from collections import defaultdict
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import and_, exists, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from core.config import settings
+from core.models.product import Product
+from core.models.product_attribute import ProductAttributeDefinition, ProductAttributeValue
+from core.schemas.product import META_PREFIX
+from .backend import SearchHits, SearchQueryError
+from .breaker import SearchUnavailable
+
+_WORDS = re.compile(r"\w+")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix_tsquery(config: str, q: str):
+    """'iphone 15 pr' -> to_tsquery('iphone & 15 & pr:*'); слова — только \\w, операторы не пролезут."""
+    words = _WORDS.findall(q.lower())
+    if not words:
+        return None
+    return func.to_tsquery(config, " & ".join(words[:-1] + [f"{words[-1]}:*"]))
+
+
+def _text_match(q: str):
+    """(условие совпадения, выражение релевантности) или (None, 0) для пустого запроса."""
+    ts_ru, ts_en = _prefix_tsquery("russian", q), _prefix_tsquery("english", q)
+    if ts_ru is None:
+        return None, literal(0.0)
+    condition = or_(
+        Product.search_ru.op("@@")(ts_ru),
+        Product.search_en.op("@@")(ts_en),
+        literal(q).op("<%")(Product.title),
+    )
+    rank = (
+        func.ts_rank(Product.search_ru, ts_ru)
+        + func.ts_rank(Product.search_en, ts_en)
+        + func.word_similarity(q, Product.title)
+    )
+    return condition, rank
+
+
+def _conditions(category_id: Optional[int], filters: dict[str, Any]) -> list:
+    conds = [Product.is_deleted == False]  # noqa: E712
+    if not filters["inactive"]:
+        conds.append(Product.is_active == True)  # noqa: E712
+    if category_id is not None:
+        conds.append(Product.category_id == category_id)
+    if filters["price_min"] is not None:
+        conds.append(Product.retail_price >= filters["price_min"])
+    if filters["price_max"] is not None:
+        conds.append(Product.retail_price <= filters["price_max"])
+    if filters["in_stock"] is not None:
+        in_stock = func.coalesce(Product.quantity, 0) > 0
+        conds.append(in_stock if filters["in_stock"] else ~in_stock)
+    for attribute_id, value in filters["attrs"]:
+        # alias: иначе в фасетах EXISTS скоррелировал бы с внешним product_attribute_values
+        pav = aliased(ProductAttributeValue)
+        conds.append(
+            exists().where(
+                pav.product_id == Product.id,
+                pav.attribute_id == attribute_id,
+                pav.value == value,
+            )
+        )
+    return conds
+
+
+# =========================
+# ФАСЕТЫ
+# =========================
+
+async def _facets(
+    session: AsyncSession, conds: list, category_id: Optional[int]
+) -> dict[str, Any]:
+    """Тот же формат, что у ES-бэкенда; несколько GROUP BY по одной подвыборке."""
+    cfg = settings.es
+    base = select(Product.id, Product.category_id, Product.retail_price, Product.quantity).where(*conds).subquery()
+
+    cnt = func.count()
+    categories = (
+        await session.execute(
+            select(base.c.category_id, cnt)
+            .where(base.c.category_id.isnot(None))
+            .group_by(base.c.category_id)
+            .order_by(cnt.desc())
+            .limit(cfg.facet_categories_size)
+        )
+    ).all()
+    price_min, price_max, in_stock = (
+        await session.execute(
+            select(
+                func.min(base.c.retail_price),
+                func.max(base.c.retail_price),
+                func.count().filter(func.coalesce(base.c.quantity, 0) > 0),
+            )
+        )
+    ).one()
+    bucket = (base.c.retail_price // cfg.facet_price_interval) * cfg.facet_price_interval
+    histogram = (
+        await session.execute(
+            select(bucket, func.count())
+            .where(base.c.retail_price.isnot(None))
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+    ).all()
+
+    facets: dict[str, Any] = {
+        "categories": [{"category_id": cid, "count": n} for cid, n in categories],
+        "price": {
+            "min": float(price_min) if price_min is not None else None,
+            "max": float(price_max) if price_max is not None else None,
+            "histogram": [{"from": int(b), "count": n} for b, n in histogram],
+        },
+        "in_stock": in_stock,
+    }
+
+    if category_id is not None:
+        rows = (
+            await session.execute(
+                select(
+                    ProductAttributeValue.attribute_id,
+                    ProductAttributeDefinition.name,
+                    ProductAttributeValue.value,
+                    func.count(),
+                )
+                .join(base, base.c.id == ProductAttributeValue.product_id)
+                .join(ProductAttributeDefinition, ProductAttributeDefinition.id == ProductAttributeValue.attribute_id)
+                .group_by(
+                    ProductAttributeValue.attribute_id,
+                    ProductAttributeDefinition.name,
+                    ProductAttributeValue.value,
+                )
+            )
+        ).all()
+        by_attr: dict[int, dict[str, Any]] = defaultdict(lambda: {"count": 0, "values": []})
+        for attribute_id, name, value, n in rows:
+            entry = by_attr[attribute_id]
+            entry["name"] = name
+            entry["count"] += n
+            entry["values"].append({"value": value, "count": n})
+        top = sorted(by_attr.items(), key=lambda kv: -kv[1]["count"])[: cfg.facet_attributes_size]
+        facets["attributes"] = [
+            {
+                "attribute_id": attribute_id,
+                # Служебный префикс в выдаче не показываем (как в ProductAttributeReadUser)
+                "name": entry["name"].removeprefix(META_PREFIX),
+                "values": sorted(entry["values"], key=lambda v: -v["count"])[: cfg.facet_values_size],
+            }
+            for attribute_id, entry in top
+        ]
+    return facets
+
+
+# =========================
+# БЭКЕНД
+# =========================
+
+class PostgresSearchBackend:
+    name = "postgres"
+
+    async def search(
+        self,
+        session: AsyncSession,
+        *,
+        q: str,
+        category_id: Optional[int],
+        filters: dict[str, Any],
+        limit: int,
+        offset: int,
+        after: Optional[list],
+        pit: Optional[str],
+        include_total: bool,
+        facets: bool,
+        with_source: bool,
+    ) -> SearchHits:
+        conds = _conditions(category_id, filters)
+        match, rank = _text_match(q.strip())
+        if match is not None:
+            conds.append(match)
+
+        stmt = select(Product.id, rank.label("rank")).where(*conds)
+        if after is not None:
+            # keyset по (rank DESC, id ASC) — аналог search_after
+            last_rank, last_id = after
+            stmt = stmt.where(or_(rank < last_rank, and_(rank == last_rank, Product.id > last_id)))
+        else:
+            stmt = stmt.offset(offset)
+        rows = (await session.execute(stmt.order_by(rank.desc(), Product.id).limit(limit))).all()
+
+        total = relation = None
+        if include_total:
+            # Как track_total_hits в ES: точно до порога, дальше — "не меньше"
+            cap = settings.es.search_track_total_hits
+            counted = await session.scalar(
+                select(func.count()).select_from(select(Product.id).where(*conds).limit(cap + 1).subquery())
+            )
+            total, relation = (cap, "gte") if counted > cap else (counted, "eq")
+
+        return SearchHits(
+            ids=[row.id for row in rows],
+            total=total,
+            total_relation=relation,
+            after=[float(rows[-1].rank), rows[-1].id] if len(rows) == limit else None,
+            facets=await _facets(session, conds, category_id) if facets else None,
+        )
+
+    async def msearch(
+        self, session: AsyncSession, queries: Sequence[dict[str, Any]]
+    ) -> list[SearchHits | SearchUnavailable | SearchQueryError]:
+        # Одна сессия — запросы по очереди; выигрыш msearch здесь в общей гидрации
+        return [await self.search(session, **query) for query in queries]
+
+    async def suggest(
+        self, session: AsyncSession, *, prefix: str, limit: int
+    ) -> list[dict[str, Any]]:
+        ts_ru, ts_en = _prefix_tsquery("russian", prefix), _prefix_tsquery("english", prefix)
+        if ts_ru is None:
+            return []
+        escaped = _escape_like(prefix)
+        rows = await session.execute(
+            select(Product.id, Product.title)
+            .where(
+                Product.is_deleted == False,  # noqa: E712
+                Product.is_active == True,  # noqa: E712
+                or_(
+                    Product.search_ru.op("@@")(ts_ru),
+                    Product.search_en.op("@@")(ts_en),
+                    Product.title.ilike(f"{escaped}%", escape="\\"),
+                ),
+            )
+            .order_by(func.similarity(Product.title, prefix).desc(), Product.id)
+            .limit(limit)
+        )
+        return [{"id": pid, "title": title} for pid, title in rows]
+
+
+# =========================
+# ДЕГРАДИРОВАННЫЙ РЕЖИМ (Elasticsearch недоступен)
+# =========================
+
+async def fallback_search(
+    session: AsyncSession,
+    *,
+    q: str,
+    category_id: Optional[int],
+    filters: dict[str, Any],
+    limit: int,
+    offset: int,
+) -> SearchHits:
+    """
+    Пока breaker ES открыт (core/search/breaker.py): только по названию —
+    подстрока (ILIKE) или близость по триграммам; оба условия обслуживает
+    ix_products_title_trgm. Без total, фасетов и курсора; глубина — не больше
+    search.fallback_max_results, чтобы деградация не превратилась в тяжёлые скан-запросы.
+    """
+    limit = min(limit, settings.search.fallback_max_results - offset)
+    if limit <= 0:
+        return SearchHits(ids=[], total=None, total_relation=None)
+
+    stmt = select(Product.id).where(*_conditions(category_id, filters))
+    q = q.strip()
+    if q:
+        stmt = stmt.where(
+            or_(
+                Product.title.ilike(f"%{_escape_like(q)}%", escape="\\"),
+                literal(q).op("<%")(Product.title),
+            )
+        ).order_by(func.word_similarity(q, Product.title).desc(), Product.id)
+    else:
+        stmt = stmt.order_by(Product.id.desc())
+    ids = (await session.scalars(stmt.offset(offset).limit(limit))).all()
+    return SearchHits(ids=list(ids), total=None, total_relation=None)
+
+
+async def fallback_suggest(
+    session: AsyncSession, *, prefix: str, limit: int
+) -> list[dict[str, Any]]:
+    """Подсказки без ES: название начинается с prefix."""
+    rows = await session.execute(
+        select(Product.id, Product.title)
+        .where(
+            Product.is_deleted == False,  # noqa: E712
+            Product.is_active == True,  # noqa: E712
+            Product.title.ilike(f"{_escape_like(prefix)}%", escape="\\"),
+        )
+        .order_by(func.length(Product.title), Product.id)
+        .limit(limit)
+    )
+    return [{"id": pid, "title": title} for pid, title in rows]
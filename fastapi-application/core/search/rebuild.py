@@ -0,0 +1,261 @@
+"""
+Пересборка индекса товаров без простоя (blue/green).
+
+1. Берём lock в Redis: с этого момента change_tracker помечает изменённые
+   товары в dirty-set (запись в живой индекс через алиас идёт как обычно).
+2. Создаём products_v{N+1} из core/search/mapping.BODY c refresh_interval=-1
+   и без реплик — так заливка в разы быстрее.
+3. Заливаем товары потоком (core/search/reindex.bulk_load).
+4. Возвращаем refresh/реплики, доигрываем dirty-set, сверяем count с Postgres.
+5. Атомарно переключаем алиас одним _aliases (remove + add).
+6. Снимаем lock, доигрываем то, что успело попасть в dirty-set, удаляем
+   старые версии сверх rebuild_keep_indices.
+
+Если что-то пошло не так до переключения — новый индекс удаляется,
+алиас остаётся на старом.
+"""
+
+import logging
+import re
+import time
+from typing import Any, Iterable
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.cache.keys import rebuild_dirty, rebuild_lock
+from core.cache.products_count import count_products_exact
+from core.cache.redis_client import get_redis
+from core.config import settings
+from .es import index_alias
+from .indexer import sync_products
+from .mapping import BODY
+from .reindex import DONE, FAILED, RUNNING, bulk_load, get_reindex_job, update_job
+from .result_cache import bump_search_generation
+
+log = logging.getLogger(__name__)
+
+REPLAY_CHUNK = 500
+
+# Пометить товары «грязными», только если пересборка идёт
+_MARK_DIRTY = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV do
+    redis.call('SADD', KEYS[2], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+# Снять lock, только если он всё ещё наш: пересборка могла пережить
+# rebuild_lock_ttl, и lock уже держит следующая
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Очистить dirty-set, только если никто не пересобирает: иначе он уже чужой
+_DROP_DIRTY = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+return redis.call('DEL', KEYS[2])
+"""
+
+
+class RebuildError(Exception):
+    pass
+
+
+def versioned_index(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
+
+
+async def mark_dirty(product_ids: Iterable[int]) -> None:
+    """
+    Вызывают outbox и сверка перед записью в ES: во время пересборки запоминаем id.
+    Недоступный Redis не должен останавливать индексацию — теряется только
+    доигрывание в пересобираемый индекс (без Redis не работает и сама пересборка).
+    """
+    ids = [str(pid) for pid in product_ids]
+    if not ids:
+        return
+    try:
+        await get_redis().eval(
+            _MARK_DIRTY, 2, rebuild_lock(), rebuild_dirty(), settings.es.rebuild_lock_ttl, *ids
+        )
+    except RedisError:
+        log.warning("Redis недоступен: %s товаров не помечены для пересборки", len(ids), exc_info=True)
+
+
+# =========================
+# ВЕРСИИ И АЛИАС
+# =========================
+
+async def list_versions(es: AsyncElasticsearch, alias: str) -> dict[int, str]:
+    """{N: "products_vN"} для всех версий индекса."""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    indices = await es.indices.get(index=f"{alias}_v*", expand_wildcards="all")
+    versions: dict[int, str] = {}
+    for name in indices:
+        m = pattern.match(name)
+        if m:
+            versions[int(m.group(1))] = name
+    return versions
+
+
+async def alias_targets(es: AsyncElasticsearch, alias: str) -> list[str]:
+    try:
+        return list((await es.indices.get_alias(name=alias)).keys())
+    except NotFoundError:
+        return []
+
+
+async def swap_alias(es: AsyncElasticsearch, alias: str, new_index: str) -> list[str]:
+    """Атомарное переключение: все remove + add одним запросом _aliases."""
+    old = await alias_targets(es, alias)
+    if not old and await es.indices.exists(index=alias):
+        raise RebuildError(
+            f"'{alias}' — обычный индекс, а не алиас: переключать нечего, нужен ручной перенос"
+        )
+    actions: list[dict[str, Any]] = [
+        {"remove": {"index": name, "alias": alias}} for name in old if name != new_index
+    ]
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    await es.indices.update_aliases(actions=actions)
+    return old
+
+
+async def gc_old_indices(es: AsyncElasticsearch, alias: str, keep: int) -> list[str]:
+    """Удаляет старые версии, оставляя keep последних; индекс под алиасом не трогаем."""
+    versions = await list_versions(es, alias)
+    live = set(await alias_targets(es, alias))
+    stale = [versions[n] for n in sorted(versions, reverse=True)[max(1, keep):]]
+    stale = [name for name in stale if name not in live]
+    if stale:
+        await es.indices.delete(index=",".join(stale))
+        log.info("Удалены старые индексы: %s", stale)
+    return stale
+
+
+# =========================
+# ПЕРЕСБОРКА
+# =========================
+
+async def _replay_dirty(
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    index: str,
+) -> int:
+    r = get_redis()
+    replayed = 0
+    while True:
+        ids = await r.spop(rebuild_dirty(), REPLAY_CHUNK)
+        if not ids:
+            return replayed
+        async with session_factory() as session:
+            await sync_products(es, session, [int(i) for i in ids], index=index)
+        replayed += len(ids)
+
+
+async def _counts(
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    index: str,
+) -> tuple[int, int]:
+    await es.indices.refresh(index=index)
+    es_count = (await es.count(index=index))["count"]
+    async with session_factory() as session:
+        db_count = await count_products_exact(session)
+    return es_count, db_count
+
+
+async def rebuild_index(
+    job_id: str,
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[str, Any] | None:
+    cfg = settings.es
+    alias = index_alias()
+    r = get_redis()
+
+    if not await r.set(rebuild_lock(), job_id, ex=cfg.rebuild_lock_ttl, nx=True):
+        await update_job(job_id, status=FAILED, error="Пересборка индекса уже идёт")
+        return await get_reindex_job(job_id)
+
+    new_index: str | None = None
+    swapped = False
+    try:
+        # Всё, что изменится с этого момента, попадёт в dirty-set
+        await r.delete(rebuild_dirty())
+        versions = await list_versions(es, alias)
+        new_index = versioned_index(alias, max(versions, default=0) + 1)
+        await update_job(job_id, status=RUNNING, phase="create", index=new_index)
+
+        await es.indices.create(
+            index=new_index,
+            settings={**BODY["settings"], "number_of_replicas": 0, "refresh_interval": "-1"},
+            mappings=BODY["mappings"],
+        )
+
+        await update_job(job_id, phase="load")
+        await bulk_load(job_id, es, session_factory, index=new_index)
+
+        await update_job(job_id, phase="finalize")
+        await es.indices.put_settings(
+            index=new_index,
+            settings={"number_of_replicas": cfg.replicas, "refresh_interval": cfg.refresh_interval},
+        )
+        await es.cluster.health(index=new_index, wait_for_status="yellow", timeout="120s")
+
+        replayed = await _replay_dirty(es, session_factory, new_index)
+        es_count, db_count = await _counts(es, session_factory, new_index)
+        if abs(es_count - db_count) > cfg.rebuild_max_count_diff:
+            # Могли попасть на запись прямо во время подсчёта — ещё один круг
+            replayed += await _replay_dirty(es, session_factory, new_index)
+            es_count, db_count = await _counts(es, session_factory, new_index)
+        await update_job(job_id, es_count=es_count, db_count=db_count)
+        if abs(es_count - db_count) > cfg.rebuild_max_count_diff:
+            raise RebuildError(f"Расхождение: в {new_index} {es_count} документов, в Postgres {db_count}")
+
+        await update_job(job_id, phase="swap")
+        old = await swap_alias(es, alias, new_index)
+        swapped = True
+        log.info("Алиас %s: %s -> %s", alias, old, new_index)
+    except Exception as exc:
+        log.exception("Пересборка индекса %s упала", new_index)
+        await update_job(job_id, status=FAILED, finished_at=int(time.time()), error=repr(exc))
+        if new_index is not None and not swapped:
+            try:
+                await es.indices.delete(index=new_index, ignore_unavailable=True)
+            except Exception:
+                log.warning("Не удалось удалить недостроенный индекс %s", new_index, exc_info=True)
+        return await get_reindex_job(job_id)
+    finally:
+        await r.eval(RELEASE_LOCK, 1, rebuild_lock(), job_id)
+
+    # Алиас уже на новом индексе; доигрываем хвост, попавший в dirty-set
+    replayed += await _replay_dirty(es, session_factory, new_index)
+    await r.eval(_DROP_DIRTY, 2, rebuild_lock(), rebuild_dirty())
+    await bump_search_generation()
+    try:
+        removed = await gc_old_indices(es, alias, cfg.rebuild_keep_indices)
+    except Exception:
+        log.warning("Не удалось удалить старые индексы", exc_info=True)
+        removed = []
+
+    await update_job(
+        job_id,
+        status=DONE,
+        phase="done",
+        finished_at=int(time.time()),
+        replayed=replayed,
+        removed_indices=",".join(removed),
+    )
+    return await get_reindex_job(job_id)
@@ -0,0 +1,292 @@
+"""
+Сверка индекса товаров в Elasticsearch с Postgres и починка расхождений.
+
+Outbox (core/search/outbox.py) доставляет изменения, но не лечит то, что
+разъехалось раньше или мимо него: ручные правки БД, UPDATE-выражения в обход
+ORM, документы из старых версий индекса. Сверка — периодическая задача
+(celery beat, tasks/search_reconcile.py) и scripts/es_reconcile.py.
+
+Обе стороны читаются потоком, отсортированными по id, и сливаются merge-join'ом:
+  - Postgres — живые товары с yield_per, для каждого считаются отпечатки
+    документа (indexer.doc_fingerprints) — без записи в ES;
+  - ES — PIT + search_after по полю id (missing: _last), из _source — id, fp, fp_dyn.
+    Сливаем по тому же полю id, что и сортируем, а не по _id.
+В памяти — текущая страница каждой стороны и пачка id на починку, а не каталог.
+
+Расхождения:
+  - missing — товар есть в Postgres, документа нет;
+  - extra   — документ есть, живого товара нет;
+  - stale   — отпечатки не совпадают (fp — весь документ целиком,
+              только fp_dyn — достаточно частичного update);
+  - broken  — у документа нет поля id: в merge он не участвует (такие
+              ES отдаёт в конце) и пересобирается/удаляется по своему _id.
+Починка — indexer.sync_products пачками по reconcile_repair_batch: документ
+строится из текущей строки БД, так что гонка с outbox безопасна.
+
+Отчёт последнего прохода лежит в Redis (reconcile_report); метрики из него
+выставляет приложение (refresh_reconcile_metrics) — у celery-воркера своего
+/metrics нет.
+"""
+
+import json
+import logging
+import time
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Optional
+
+from elasticsearch import AsyncElasticsearch
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.cache.keys import rebuild_lock, reconcile_lock, reconcile_report
+from core.cache.redis_client import get_redis
+from core.config import settings
+from core.models.product import Product
+from .es import index_alias
+from .indexer import DOC_LOAD_OPTIONS, doc_fingerprints, sync_products
+from .metrics import SEARCH_INDEX_DRIFT, SEARCH_RECONCILE_LAST_RUN, SEARCH_RECONCILE_REPAIRED
+from .rebuild import RELEASE_LOCK, mark_dirty
+
+log = logging.getLogger(__name__)
+
+MISSING, EXTRA, STALE, BROKEN = "missing", "extra", "stale", "broken"
+# Сколько id каждого вида сохранять в отчёте для разбора
+SAMPLE_SIZE = 20
+
+# (id, fp, fp_dyn)
+Row = tuple[int, Optional[str], Optional[str]]
+# (поле id — None, если его нет; fp; fp_dyn; _id)
+EsRow = tuple[Optional[int], Optional[str], Optional[str], str]
+
+
+# =========================
+# ПОТОКИ (id, отпечатки)
+# =========================
+
+async def _db_rows(session: AsyncSession, page_size: int) -> AsyncIterator[Row]:
+    stmt = (
+        select(Product)
+        .options(*DOC_LOAD_OPTIONS)
+        .where(Product.is_deleted == False)  # noqa: E712
+        .order_by(Product.id)
+        .execution_options(yield_per=page_size)
+    )
+    result = await session.stream_scalars(stmt)
+    async for product in result:
+        fp, fp_dyn = doc_fingerprints(product)
+        yield product.id, fp, fp_dyn
+
+
+async def _es_rows(es: AsyncElasticsearch, page_size: int) -> AsyncIterator[EsRow]:
+    """
+    Все документы алиаса в порядке поля id внутри одного PIT — снимок не «плывёт» от outbox.
+    Документы без id идут последними (missing: _last), id у них — None.
+    """
+    keep_alive = settings.es.search_pit_keep_alive
+    pit_id = (await es.open_point_in_time(index=index_alias(), keep_alive=keep_alive))["id"]
+    after: Optional[list] = None
+    try:
+        while True:
+            res = await es.search(
+                pit={"id": pit_id, "keep_alive": keep_alive},
+                sort=[{"id": {"order": "asc", "missing": "_last", "unmapped_type": "long"}}],
+                search_after=after,
+                size=page_size,
+                _source=["id", "fp", "fp_dyn"],
+                track_total_hits=False,
+            )
+            pit_id = res.get("pit_id", pit_id)
+            hits = res["hits"]["hits"]
+            for hit in hits:
+                src = hit.get("_source") or {}
+                doc_id = src.get("id")
+                yield (
+                    int(doc_id) if doc_id is not None else None,
+                    src.get("fp"),
+                    src.get("fp_dyn"),
+                    hit["_id"],
+                )
+            if len(hits) < page_size:
+                return
+            after = hits[-1]["sort"]
+    finally:
+        await es.close_point_in_time(id=pit_id)
+
+
+# =========================
+# ПОЧИНКА
+# =========================
+
+class _Repairer:
+    """Копит id на починку и сбрасывает их пачками через sync_products."""
+
+    def __init__(
+        self,
+        es: AsyncElasticsearch,
+        session_factory: async_sessionmaker[AsyncSession],
+        enabled: bool,
+    ) -> None:
+        self.es = es
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.batch = settings.es.reconcile_repair_batch
+        self.full: set[int] = set()
+        self.partial: set[int] = set()
+        self.repaired = 0
+        self.failed = 0
+
+    async def add(self, product_id: int, partial: bool = False) -> None:
+        if not self.enabled:
+            return
+        (self.partial if partial else self.full).add(product_id)
+        if len(self.full) + len(self.partial) >= self.batch:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.full and not self.partial:
+            return
+        full, partial = self.full, self.partial
+        self.full, self.partial = set(), set()
+        # Идёт пересборка индекса — пусть доиграет и в новый
+        await mark_dirty(full | partial)
+        # Своя сессия: на сессии потока открыт серверный курсор
+        async with self.session_factory() as session:
+            _, failed = await sync_products(self.es, session, full, partial_ids=partial)
+        self.repaired += len(full) + len(partial) - len(failed)
+        self.failed += len(failed)
+
+
+# =========================
+# СВЕРКА
+# =========================
+
+async def reconcile_index(
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    repair: Optional[bool] = None,
+) -> dict[str, Any]:
+    """
+    Один проход merge-join'а по всему каталогу. repair=False — только посчитать
+    (по умолчанию es.reconcile_repair). Возвращает отчёт и кладёт его в Redis.
+    """
+    cfg = settings.es
+    repair = cfg.reconcile_repair if repair is None else repair
+    started = time.time()
+    counts = {MISSING: 0, EXTRA: 0, STALE: 0, BROKEN: 0}
+    samples: dict[str, list[int | str]] = {MISSING: [], EXTRA: [], STALE: [], BROKEN: []}
+    db_total = es_total = 0
+    repairer = _Repairer(es, session_factory, repair)
+
+    async def found(kind: str, product_id: int, partial: bool = False) -> None:
+        counts[kind] += 1
+        if len(samples[kind]) < SAMPLE_SIZE:
+            samples[kind].append(product_id)
+        await repairer.add(product_id, partial)
+
+    async def broken(doc_id: str) -> None:
+        if not doc_id.isdigit():
+            # Не товар вовсе: sync_products его не тронет — только в отчёт
+            counts[BROKEN] += 1
+            if len(samples[BROKEN]) < SAMPLE_SIZE:
+                samples[BROKEN].append(doc_id)
+            return
+        # Живой товар — переиндексируется с полем id (в merge он уже missing), иначе delete
+        await found(BROKEN, int(doc_id))
+
+    async with (
+        session_factory() as session,
+        aclosing(_db_rows(session, cfg.reconcile_page_size)) as db_iter,
+        aclosing(_es_rows(es, cfg.reconcile_page_size)) as es_iter,
+    ):
+        db_row = await anext(db_iter, None)
+        es_row = await anext(es_iter, None)
+        while db_row is not None or es_row is not None:
+            if es_row is not None and es_row[0] is None:
+                # Упорядоченная часть ES кончилась, дальше только документы без id
+                es_total += 1
+                await broken(es_row[3])
+                es_row = await anext(es_iter, None)
+            elif es_row is None or (db_row is not None and db_row[0] < es_row[0]):
+                db_total += 1
+                await found(MISSING, db_row[0])
+                db_row = await anext(db_iter, None)
+            elif db_row is None or es_row[0] < db_row[0]:
+                es_total += 1
+                # sync_products сам решит: удалённого товара — delete, живого — index
+                await found(EXTRA, es_row[0])
+                es_row = await anext(es_iter, None)
+            else:
+                db_total += 1
+                es_total += 1
+                _, fp, fp_dyn = db_row
+                _, es_fp, es_fp_dyn, _ = es_row
+                if fp != es_fp:
+                    await found(STALE, db_row[0])
+                elif fp_dyn != es_fp_dyn:
+                    await found(STALE, db_row[0], partial=True)
+                db_row = await anext(db_iter, None)
+                es_row = await anext(es_iter, None)
+    await repairer.flush()
+
+    report = {
+        "started_at": int(started),
+        "finished_at": int(time.time()),
+        "duration": round(time.time() - started, 3),
+        "repair": repair,
+        "db": db_total,
+        "es": es_total,
+        **counts,
+        "repaired": repairer.repaired,
+        "failed": repairer.failed,
+        "samples": samples,
+    }
+    if any(counts.values()):
+        log.warning("Сверка ES/Postgres: %s", {k: report[k] for k in (*counts, "repaired", "failed")})
+    else:
+        log.info("Сверка ES/Postgres: расхождений нет (%s товаров)", db_total)
+    await get_redis().set(reconcile_report(), json.dumps(report))
+    return report
+
+
+async def reconcile_index_once(
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    repair: Optional[bool] = None,
+) -> dict[str, Any] | None:
+    """
+    То же под lock'ом: одна сверка на кластер и не во время пересборки
+    (новый индекс после неё и так совпадёт с БД). None — пропущено.
+    """
+    r = get_redis()
+    if await r.exists(rebuild_lock()):
+        log.info("Сверка ES/Postgres пропущена: идёт пересборка индекса")
+        return None
+    token = uuid.uuid4().hex
+    if not await r.set(reconcile_lock(), token, ex=settings.es.reconcile_lock_ttl, nx=True):
+        log.info("Сверка ES/Postgres пропущена: уже идёт")
+        return None
+    try:
+        return await reconcile_index(es, session_factory, repair)
+    finally:
+        await r.eval(RELEASE_LOCK, 1, reconcile_lock(), token)
+
+
+# =========================
+# МЕТРИКИ (в процессе приложения)
+# =========================
+
+async def refresh_reconcile_metrics() -> None:
+    try:
+        raw = await get_redis().get(reconcile_report())
+    except RedisError:
+        log.warning("Не удалось прочитать отчёт сверки ES/Postgres", exc_info=True)
+        return
+    if not raw:
+        return
+    report = json.loads(raw)
+    for kind in (MISSING, EXTRA, STALE, BROKEN):
+        SEARCH_INDEX_DRIFT.labels(kind).set(report.get(kind, 0))
+    SEARCH_RECONCILE_REPAIRED.set(report.get("repaired", 0))
+    SEARCH_RECONCILE_LAST_RUN.set(report.get("finished_at", 0))
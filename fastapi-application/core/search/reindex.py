@@ -0,0 +1,206 @@
+"""
+Полная переиндексация товаров в Elasticsearch.
+
+Товары читаются из Postgres потоком (server-side cursor, yield_per) и
+скармливаются async_streaming_bulk — в памяти одновременно только текущий
+чанк, а не весь каталог. Параллельность — reindex_concurrency потоков,
+каждый читает свой диапазон id (`id BETWEEN lo AND hi`, границы — из
+min/max id) своей сессией: диапазон идёт по индексу первичного ключа,
+а не полным проходом таблицы на каждый поток.
+
+Задача идентифицируется job_id; прогресс и ошибки по документам лежат
+в Redis (hash + ограниченный list), их отдаёт GET /products/reindex/{job_id}.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Optional
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.cache.keys import reindex_job, reindex_job_errors
+from core.cache.products_count import count_products_exact
+from core.cache.redis_client import get_redis
+from core.config import settings
+from core.models.product import Product
+from .es import index_alias
+from .indexer import DOC_LOAD_OPTIONS, index_action
+from .result_cache import bump_search_generation
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# =========================
+# СОСТОЯНИЕ ЗАДАЧИ В REDIS
+# =========================
+
+async def update_job(job_id: str, **fields: Any) -> None:
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hset(reindex_job(job_id), mapping={k: str(v) for k, v in fields.items()})
+        pipe.expire(reindex_job(job_id), settings.es.reindex_job_ttl)
+        await pipe.execute()
+
+
+async def create_reindex_job() -> str:
+    job_id = uuid.uuid4().hex
+    await update_job(job_id, status=QUEUED, created_at=int(time.time()), indexed=0, failed=0)
+    return job_id
+
+
+async def get_reindex_job(job_id: str, errors_limit: int = 50) -> dict[str, Any] | None:
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hgetall(reindex_job(job_id))
+        pipe.lrange(reindex_job_errors(job_id), 0, errors_limit - 1)
+        raw, errors = await pipe.execute()
+    if not raw:
+        return None
+    job: dict[str, Any] = dict(raw)
+    for field in (
+        "total", "indexed", "failed", "created_at", "started_at", "finished_at",
+        "es_count", "db_count", "replayed",
+    ):
+        if field in job:
+            job[field] = int(job[field])
+    job["job_id"] = job_id
+    job["errors"] = [json.loads(e) for e in errors]
+    return job
+
+
+async def _record_progress(job_id: str, indexed: int, errors: list[dict]) -> None:
+    """Сбрасываем счётчики раз в чанк, а не на каждый документ."""
+    r = get_redis()
+    key, errors_key = reindex_job(job_id), reindex_job_errors(job_id)
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.hincrby(key, "indexed", indexed)
+        if errors:
+            pipe.hincrby(key, "failed", len(errors))
+            pipe.rpush(errors_key, *[json.dumps(e, ensure_ascii=False) for e in errors])
+            pipe.ltrim(errors_key, 0, settings.es.reindex_max_errors - 1)
+            pipe.expire(errors_key, settings.es.reindex_job_ttl)
+        await pipe.execute()
+
+
+# =========================
+# ПОТОКОВАЯ ИНДЕКСАЦИЯ
+# =========================
+
+# Диапазон id партиции: (lo, hi) включительно, hi=None — без верхней границы
+IdRange = tuple[int, Optional[int]]
+
+
+def _id_ranges(min_id: Optional[int], max_id: Optional[int], parts: int) -> list[IdRange]:
+    """
+    Делит [min_id, max_id] на parts равных диапазонов. Последний — открытый
+    сверху: товары, созданные после подсчёта границ, тоже попадут в поток.
+    """
+    if min_id is None or max_id is None:
+        return []
+    step = max(1, -(-(max_id - min_id + 1) // parts))
+    ranges: list[IdRange] = []
+    lo = min_id
+    while lo + step <= max_id and len(ranges) < parts - 1:
+        ranges.append((lo, lo + step - 1))
+        lo += step
+    ranges.append((lo, None))
+    return ranges
+
+
+async def _stream_actions(
+    session: AsyncSession, index: str | None, id_range: IdRange, chunk_size: int
+) -> AsyncIterator[dict[str, Any]]:
+    lo, hi = id_range
+    stmt = (
+        select(Product)
+        .options(*DOC_LOAD_OPTIONS)
+        .where(
+            Product.is_deleted == False,  # noqa: E712
+            Product.id.between(lo, hi) if hi is not None else Product.id >= lo,
+        )
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await session.stream_scalars(stmt)
+    async for product in result:
+        yield index_action(product, index)
+
+
+async def _index_partition(
+    job_id: str,
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    index: str | None,
+    id_range: IdRange,
+) -> None:
+    cfg = settings.es
+    indexed, errors = 0, []
+    async with session_factory() as session:
+        async for ok, item in async_streaming_bulk(
+            es,
+            _stream_actions(session, index, id_range, cfg.reindex_chunk_size),
+            chunk_size=cfg.reindex_chunk_size,
+            max_chunk_bytes=cfg.reindex_max_chunk_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+            max_retries=3,  # 429 от ES — повторяем с backoff
+        ):
+            if ok:
+                indexed += 1
+            else:
+                info = item.get("index", {})
+                errors.append(
+                    {"id": info.get("_id"), "status": info.get("status"), "error": info.get("error")}
+                )
+            if indexed + len(errors) >= cfg.reindex_chunk_size:
+                await _record_progress(job_id, indexed, errors)
+                indexed, errors = 0, []
+    await _record_progress(job_id, indexed, errors)
+
+
+async def bulk_load(
+    job_id: str,
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+    index: str | None = None,
+) -> None:
+    """Заливает все живые товары в index (по умолчанию — в алиас) с прогрессом в job_id."""
+    parts = max(1, settings.es.reindex_concurrency)
+    async with session_factory() as session:
+        total = await count_products_exact(session)
+        # min/max по первичному ключу — два спуска по индексу, без прохода таблицы
+        min_id, max_id = (
+            await session.execute(select(func.min(Product.id), func.max(Product.id)))
+        ).one()
+    ranges = _id_ranges(min_id, max_id, parts)
+    await update_job(job_id, status=RUNNING, started_at=int(time.time()), total=total)
+    log.info("Reindex %s -> %s: %s товаров, потоков: %s", job_id, index or index_alias(), total, len(ranges))
+    await asyncio.gather(
+        *(_index_partition(job_id, es, session_factory, index, id_range) for id_range in ranges)
+    )
+
+
+async def run_reindex_job(
+    job_id: str,
+    es: AsyncElasticsearch,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[str, Any] | None:
+    try:
+        await bulk_load(job_id, es, session_factory)
+        await es.indices.refresh(index=index_alias())
+    except Exception as exc:
+        log.exception("Reindex %s упал", job_id)
+        await update_job(job_id, status=FAILED, finished_at=int(time.time()), error=repr(exc))
+    else:
+        await bump_search_generation()
+        await update_job(job_id, status=DONE, finished_at=int(time.time()))
+
+    return await get_reindex_job(job_id)
@@ -0,0 +1,144 @@
+"""
+Короткоживущий кэш выдачи /products/search и подсказок /products/suggest.
+
+Ключ — хэш нормализованных (q, category_id, limit, offset, позиция курсора,
+include_total, фильтры, facets); значение — id товаров в порядке релевантности,
+total, следующий курсор и фасеты. Карточки не кэшируем: их отдаёт кэш карточек.
+
+Запись помечена поколением search:gen. Переиндексация и пересборка индекса
+делают INCR — все прежние записи разом становятся промахами, без SCAN/DEL.
+Текущее поколение и запись читаются одним MGET.
+Подсказки (title/id) кэшируются целиком — они маленькие.
+Изменения отдельных товаров (outbox) кэш не сбрасывают — их покрывает короткий TTL.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Any, Optional
+
+import orjson
+from redis.exceptions import RedisError
+
+from core.cache.keys import search_generation, search_result, search_suggest
+from core.cache.redis_client import get_redis
+from core.config import settings
+from .metrics import SEARCH_RESULT_CACHE
+
+log = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+
+# kind в метриках
+SEARCH, SUGGEST = "search", "suggest"
+# Без этих полей запись не отдаём (get_result / get_suggestions читают их напрямую)
+_FIELDS = {
+    SEARCH: frozenset({"ids", "total", "relation", "next"}),
+    SUGGEST: frozenset({"items"}),
+}
+
+
+def normalize_query(q: str) -> str:
+    """«  iPhone   15 » и «iphone 15» — один и тот же запрос."""
+    return _SPACES.sub(" ", (q or "").strip().lower())
+
+
+def result_key(
+    q: str,
+    category_id: Optional[int],
+    limit: int,
+    offset: int,
+    cursor: Optional[dict[str, Any]],
+    include_total: bool,
+    filters: Optional[dict[str, Any]] = None,
+    facets: bool = False,
+    backend: str = "elasticsearch",
+) -> str:
+    # Из курсора важна только позиция: PIT у каждого клиента свой
+    after = cursor.get("after") if cursor else None
+    raw = orjson.dumps(
+        [backend, normalize_query(q), category_id, limit, offset, after, include_total, filters, facets],
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return search_result(hashlib.sha1(raw).hexdigest())
+
+
+def suggest_key(prefix: str, limit: int, backend: str = "elasticsearch") -> str:
+    raw = orjson.dumps([backend, normalize_query(prefix), limit])
+    return search_suggest(hashlib.sha1(raw).hexdigest())
+
+
+async def _get(kind: str, key: str, ttl: int) -> Optional[dict[str, Any]]:
+    if ttl <= 0:
+        return None
+    try:
+        gen, raw = await get_redis().mget([search_generation(), key])
+    except RedisError:
+        log.warning("Redis недоступен, кэш %s пропущен", kind, exc_info=True)
+        SEARCH_RESULT_CACHE.labels(kind, "error").inc()
+        return None
+    if raw is None:
+        SEARCH_RESULT_CACHE.labels(kind, "miss").inc()
+        return None
+    try:
+        entry = orjson.loads(raw)
+        # Битая/обрезанная запись или запись старого формата — как промах
+        if not isinstance(entry, dict) or not _FIELDS[kind] <= entry.keys():
+            raise ValueError(f"неожиданный формат записи: {type(entry).__name__}")
+        current_gen = int(gen or 0)
+    except (orjson.JSONDecodeError, ValueError, TypeError):
+        log.warning("Невалидная запись кэша %s (%s), идём в бэкенд", kind, key, exc_info=True)
+        SEARCH_RESULT_CACHE.labels(kind, "error").inc()
+        return None
+    if entry.get("gen") != current_gen:
+        SEARCH_RESULT_CACHE.labels(kind, "stale_generation").inc()
+        return None
+    SEARCH_RESULT_CACHE.labels(kind, "hit").inc()
+    return entry
+
+
+async def _store(kind: str, key: str, payload: dict[str, Any], ttl: int) -> None:
+    if ttl <= 0:
+        return
+    r = get_redis()
+    try:
+        # Поколение — на момент записи: если индекс успели пересобрать, запись сразу устареет
+        gen = int(await r.get(search_generation()) or 0)
+        await r.set(key, orjson.dumps({**payload, "gen": gen}), ex=ttl)
+    except (RedisError, ValueError):
+        log.warning("Redis недоступен, %s не закэширован", kind, exc_info=True)
+
+
+async def get_result(key: str) -> Optional[dict[str, Any]]:
+    """{"ids", "total", "relation", "next", "facets"} или None (промах/другое поколение/Redis недоступен)."""
+    return await _get(SEARCH, key, settings.es.search_cache_ttl)
+
+
+async def store_result(
+    key: str,
+    ids: list[int],
+    total: Optional[int],
+    relation: Optional[str],
+    next_cursor: Optional[dict[str, Any]],
+    facets: Optional[dict[str, Any]] = None,
+) -> None:
+    payload = {"ids": ids, "total": total, "relation": relation, "next": next_cursor, "facets": facets}
+    await _store(SEARCH, key, payload, settings.es.search_cache_ttl)
+
+
+async def get_suggestions(key: str) -> Optional[list[dict[str, Any]]]:
+    entry = await _get(SUGGEST, key, settings.es.suggest_cache_ttl)
+    return entry["items"] if entry is not None else None
+
+
+async def store_suggestions(key: str, items: list[dict[str, Any]]) -> None:
+    await _store(SUGGEST, key, {"items": items}, settings.es.suggest_cache_ttl)
+
+
+async def bump_search_generation() -> None:
+    """Вызывать после переиндексации/переключения алиаса: сбрасывает весь кэш выдачи."""
+    try:
+        await get_redis().incr(search_generation())
+    except RedisError:
+        # Не повод валить переиндексацию: старые записи доживут свой TTL
+        log.warning("Не удалось сменить поколение кэша выдачи поиска", exc_info=True)
@@ -13,15 +13,33 @@ from starlette.responses import HTMLResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from core import broker
+from core.cache.local_cache import (
+    start_invalidation_listener,
+    stop_invalidation_listener,
+)
+from core.cache.lua import load_scripts
+from core.cache.redis_client import close_redis
+from core.cache.warmup import start_startup_warmup, stop_startup_warmup
+from core.change_tracker import drain_pending_invalidations, install_change_tracker
 from core.models import db_helper
+from core.search.outbox import start_outbox_metrics, stop_outbox_metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # startup
     await broker.startup()
+    await load_scripts()
+    start_invalidation_listener()
+    start_startup_warmup(db_helper.session_factory)
+    start_outbox_metrics(db_helper.session_factory)
     yield
     # shutdown
+    await stop_outbox_metrics()
+    await stop_startup_warmup()
+    await drain_pending_invalidations()
+    await stop_invalidation_listener()
+    await close_redis()
     await db_helper.dispose()
     await broker.shutdown()
 
@@ -62,6 +80,9 @@ def create_app(
     if create_custom_static_urls:
         register_static_docs_routes(app)
 
+    # Сброс кэша/индекса товаров по commit'ам сессий
+    install_change_tracker()
+
     instrumentator = Instrumentator()
     instrumentator.instrument(app).expose(app)  # добавляет эндпоинт /metrics
 
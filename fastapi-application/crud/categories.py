@@ -3,6 +3,7 @@ from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.models.category import Category
+from core.change_tracker import commit_and_invalidate
 
 # crud/categories.py
 
@@ -53,7 +54,8 @@ async def update_category(session: AsyncSession, category_id: int, name: str):
         raise HTTPException(status_code=404, detail="Категория не найдена")
 
     category.name = name
-    await session.commit()
+    # Название категории лежит в карточках её товаров
+    await commit_and_invalidate(session)
     await session.refresh(category)
     return category
 
@@ -1,6 +1,6 @@
-from typing import Sequence, List, Tuple, Optional
+from typing import Sequence, List, Tuple
 from fastapi import HTTPException, UploadFile
-from sqlalchemy import select, update, func
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from core.models.product import Product, ProductImage
@@ -9,15 +9,14 @@ from core.models.product_attribute import (
     ProductAttributeDefinition,
 )
 from core.schemas.product import ProductCreate, ProductUpdate
+from core.cache.products_count import adjust_products_count, get_products_total
+from core.change_tracker import commit_and_invalidate
+import logging
 import os
 import uuid
 import shutil
 
-from elasticsearch import AsyncElasticsearch
-from core.search.indexer import (
-    index_product as es_index_product,
-    delete_product as es_delete_product,
-)
+log = logging.getLogger(__name__)
 
 # =========================
 # ВСПОМОГАТЕЛЬНЫЕ ХЕЛПЕРЫ
@@ -61,28 +60,6 @@ async def _load_full_product(session: AsyncSession, product_id: int) -> Product
     return result.scalar_one_or_none()
 
 
-async def _es_try_index(
-    es: Optional[AsyncElasticsearch], product: Optional[Product]
-) -> None:
-    """Безопасная индексация: опциональный клиент ES, проглатываем сетевые ошибки."""
-    if es is None or product is None:
-        return
-    try:
-        await es_index_product(es, product)
-    except Exception:
-        # Добавьте логирование по месту (sentry/logger)
-        pass
-
-
-async def _es_try_delete(es: Optional[AsyncElasticsearch], product_id: int) -> None:
-    if es is None:
-        return
-    try:
-        await es_delete_product(es, product_id)
-    except Exception:
-        pass
-
-
 # =========================
 # ЧТЕНИЕ
 # =========================
@@ -105,12 +82,13 @@ async def get_all_products(session: AsyncSession) -> Sequence[Product]:
 
 
 async def get_products_with_pagination(
-    session: AsyncSession, limit: int, offset: int
-) -> Tuple[List[Product], int]:
-    total_result = await session.execute(
-        select(func.count()).select_from(Product).where(Product.is_deleted == False)
-    )
-    total = total_result.scalar_one()
+    session: AsyncSession, limit: int, offset: int, include_total: bool = True
+) -> Tuple[List[Product], int | None, bool]:
+    # total из Redis-счётчика/оценки планировщика, без count(*) на каждый запрос;
+    # include_total=False — не считаем вовсе
+    total, total_is_estimate = None, False
+    if include_total:
+        total, total_is_estimate = await get_products_total(session)
 
     result = await session.execute(
         select(Product)
@@ -126,7 +104,70 @@ async def get_products_with_pagination(
         .limit(limit)
     )
     products = result.scalars().all()
-    return products, total
+    return products, total, total_is_estimate
+
+
+async def get_products_after_id(
+    session: AsyncSession,
+    limit: int,
+    after_id: int | None = None,
+) -> Tuple[List[Product], int | None]:
+    """
+    Keyset-пагинация: `WHERE id > :after_id ORDER BY id LIMIT :limit`.
+    Стоимость страницы не зависит от её номера (идём по PK-индексу).
+    Возвращает (товары, id для следующего курсора или None).
+    """
+    stmt = (
+        select(Product)
+        .options(
+            selectinload(Product.attributes).selectinload(
+                ProductAttributeValue.attribute
+            ),
+            selectinload(Product.category),
+        )
+        .where(Product.is_deleted == False)
+        .order_by(Product.id)
+        .limit(limit + 1)  # +1 — чтобы понять, есть ли следующая страница
+    )
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+
+    result = await session.execute(stmt)
+    products = list(result.scalars().all())
+
+    next_after_id = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_after_id = products[-1].id
+
+    return products, next_after_id
+
+
+async def get_first_page_ids_per_category(
+    session: AsyncSession, per_category: int
+) -> List[int]:
+    """
+    id первых `per_category` живых товаров каждой категории (в порядке листинга, по id).
+    Одним запросом через row_number() — для прогрева кэша.
+    """
+    rn = (
+        func.row_number()
+        .over(partition_by=Product.category_id, order_by=Product.id)
+        .label("rn")
+    )
+    ranked = (
+        select(Product.id, rn)
+        .where(
+            Product.is_deleted == False,  # noqa: E712
+            Product.is_active == True,  # noqa: E712
+            Product.category_id.is_not(None),
+        )
+        .subquery()
+    )
+    result = await session.execute(
+        select(ranked.c.id).where(ranked.c.rn <= per_category).order_by(ranked.c.id)
+    )
+    return list(result.scalars().all())
 
 
 async def get_product_by_id(session: AsyncSession, product_id: int) -> Product | None:
@@ -141,7 +182,6 @@ async def get_product_by_id(session: AsyncSession, product_id: int) -> Product |
 async def create_product(
     session: AsyncSession,
     product_create: ProductCreate,
-    es: Optional[AsyncElasticsearch] = None,
 ) -> Product:
     # 🔒 Валидация уникальности атрибутов
     validate_unique_attributes(product_create.attributes or [])
@@ -171,13 +211,12 @@ async def create_product(
         ]
 
     session.add(product)
-    await session.commit()
+    await commit_and_invalidate(session)
 
-    # Перезагружаем с зависимостями (для индексации и ответа)
+    # Перезагружаем с зависимостями (для ответа).
+    # Кэш сброшен в commit_and_invalidate, индекс ES обновит outbox.
     product = await _load_full_product(session, product.id)
-
-    # Индексация после успешного commit (индексируем только title/description/category)
-    await _es_try_index(es, product)
+    await adjust_products_count(+1)
 
     return product  # type: ignore[return-value]
 
@@ -186,7 +225,6 @@ async def update_product(
     session: AsyncSession,
     product_id: int,
     update_data: dict,
-    es: Optional[AsyncElasticsearch] = None,
 ) -> Product:
     result = await session.execute(select(Product).where(Product.id == product_id))
     product = result.scalar_one_or_none()
@@ -229,41 +267,40 @@ async def update_product(
             if attr_id not in incoming_attrs:
                 await session.delete(db_attrs[attr_id])
 
-    await session.commit()
+    await commit_and_invalidate(session)
 
-    # Перезагрузка с зависимостями (для индексации и ответа)
+    # Перезагрузка с зависимостями (для ответа)
     product = await _load_full_product(session, product_id)
     if product is None:
         raise HTTPException(
             status_code=404, detail="Продукт не найден после обновления"
         )
 
-    # Индексация (индексируем только title/description/category)
-    await _es_try_index(es, product)
-
     return product
 
 
 async def delete_product(
     session: AsyncSession,
     product_id: int,
-    es: Optional[AsyncElasticsearch] = None,
 ) -> bool:
     product = await session.get(Product, product_id)
     if not product:
         return False
 
-    # Мягкое удаление в БД
+    was_deleted = product.is_deleted
+
+    # Мягкое удаление в БД (документ из ES удалит change_tracker)
     product.is_deleted = True
-    await session.commit()
+    await commit_and_invalidate(session)
 
-    # Для поиска — удаляем документ из индекса
-    await _es_try_delete(es, product_id)
+    if not was_deleted:
+        await adjust_products_count(-1)
     return True
 
 
 # =========================
-# ИЗОБРАЖЕНИЯ (без индексации — поиск по ним не строим)
+# ИЗОБРАЖЕНИЯ (без индексации — поиск по ним не строим,
+# но картинки входят в кэшированную карточку: её сбросит change_tracker)
 # =========================
 
 
@@ -272,7 +309,7 @@ async def add_product_image(
 ) -> ProductImage:
     image = ProductImage(product_id=product_id, image_path=image_path)
     session.add(image)
-    await session.commit()
+    await commit_and_invalidate(session)
     await session.refresh(image)
     return image
 
@@ -320,7 +357,7 @@ async def delete_product_image(session: AsyncSession, image_id: int) -> bool:
             pass
 
     await session.delete(image)
-    await session.commit()
+    await commit_and_invalidate(session)
     return True
 
 
@@ -332,17 +369,14 @@ async def set_main_product_image(session: AsyncSession, image_id: int) -> bool:
     if not target:
         return False
 
-    # Снимаем главный со всех картинок продукта
-    await session.execute(
-        update(ProductImage)
-        .where(ProductImage.product_id == target.product_id)
-        .values(is_main=False)
-    )
-    # Ставим выбранную как главную
-    await session.execute(
-        update(ProductImage).where(ProductImage.id == image_id).values(is_main=True)
+    # Через ORM-объекты, а не UPDATE-выражение: так изменение видит
+    # change_tracker (bulk UPDATE мимо flush кэш бы не сбросил)
+    images = await session.scalars(
+        select(ProductImage).where(ProductImage.product_id == target.product_id)
     )
-    await session.commit()
+    for image in images:
+        image.is_main = image.id == image_id
+    await commit_and_invalidate(session)
     return True
 
 
@@ -1,97 +1,494 @@
 # crud/products_search.py
-from typing import Any, Optional, Tuple, List
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Literal, Optional, Sequence, Tuple, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from elasticsearch import AsyncElasticsearch
+from fastapi import HTTPException
+from redis.exceptions import RedisError
 
+from core.cache.products_cache import assemble_products_many
+from core.config import settings
 from core.models.product import Product
-from core.models.product_attribute import ProductAttributeValue
-from core.search.es import index_alias
-
-# Поля, по которым ищем (под v2 маппинг: RU + EN)
-SEARCH_FIELDS = [
-    "title^3",            # русский анализатор (основное поле)
-    "title.prefix^2",     # русские префиксы (edge_ngram)
-    "title.en^2",         # английский
-    "title.prefix_en^2",  # английские префиксы
-    "description",
-    "description.en",
-    "category_name^0.75",
-    "category_name.en^0.6",
-]
-
-
-def _build_es_query(q: str, category_id: Optional[int]) -> dict[str, Any]:
-    filters: list[dict[str, Any]] = []
-    if category_id is not None:
-        # В индексе category_id — keyword, безопаснее приводить к строке
-        filters.append({"term": {"category_id": str(category_id)}})
-
-    should: list[dict[str, Any]] = []
-    q = (q or "").strip()
-    if q:
-        should.append({
-            "multi_match": {
-                "query": q,
-                "type": "best_fields",
-                "fields": SEARCH_FIELDS,
-                "fuzziness": "AUTO",
-                "operator": "and",
-            }
-        })
-
-    return {
-        "bool": {
-            "filter": filters,
-            "should": should,
-            "minimum_should_match": 1 if should else 0,
+from core.search.backend import SearchBackend, SearchHits, SearchQueryError, search_filters
+from core.search.breaker import SearchUnavailable
+from core.search.es import get_client
+from core.search.es_backend import ElasticsearchBackend
+from core.search.indexer import DOC_LOAD_OPTIONS, product_display
+from core.search.metrics import SEARCH_DEGRADED, SEARCH_HYDRATED, SUGGEST_LATENCY
+from core.search.pg_backend import PostgresSearchBackend, fallback_search, fallback_suggest
+from core.search.result_cache import (
+    get_result,
+    get_suggestions,
+    normalize_query,
+    result_key,
+    store_result,
+    store_suggestions,
+    suggest_key,
+)
+
+log = logging.getLogger(__name__)
+
+Hydration = Literal["source", "cache", "db"]
+
+# Карточки сериализуются с exclude_none, а в ProductRead* эти поля обязательные
+_CARD_DEFAULTS = {"retail_price": None, "quantity": None, "category_id": None, "main_image": None}
+
+# Дальше offset-пагинация дорогая (а ES её и не пустит — index.max_result_window)
+MAX_RESULT_WINDOW = 10_000
+
+
+async def get_search_backend() -> SearchBackend:
+    """FastAPI-зависимость: бэкенд по settings.search.backend."""
+    if settings.search.backend == "postgres":
+        return PostgresSearchBackend()
+    return ElasticsearchBackend(await get_client())
+
+
+# =========================
+# ГИДРАЦИЯ ВЫДАЧИ
+# =========================
+
+async def _hydrate_from_db(
+    session: AsyncSession, ids: List[int], include_inactive: bool
+) -> dict[int, dict]:
+    """Запасной путь: один `WHERE id IN (...)` с теми же связями, что у индексатора."""
+    if not ids:
+        return {}
+    rows = await session.execute(
+        select(Product)
+        .options(*DOC_LOAD_OPTIONS)
+        .where(Product.id.in_(ids), Product.is_deleted == False)  # noqa: E712
+    )
+    cards: dict[int, dict] = {}
+    for p in rows.scalars().all():
+        if p.is_active or include_inactive:
+            cards[p.id] = {**_CARD_DEFAULTS, **product_display(p), "description": p.description}
+    SEARCH_HYDRATED.labels("db").inc(len(cards))
+    return cards
+
+
+async def _hydrate_from_cache(
+    session: AsyncSession, ids: List[int], include_inactive: bool
+) -> dict[int, dict]:
+    """
+    Кэш карточек (L1 + MGET, промахи дочитывает и кладёт в Redis сам assemble_products_many).
+    Неактивных товаров в кэше нет — для суперпользователя добираем их из БД.
+    """
+    if not ids:
+        return {}
+    try:
+        cards = await assemble_products_many(ids, session)
+    except RedisError:
+        log.warning("Redis недоступен, выдачу поиска гидрируем из БД", exc_info=True)
+        return await _hydrate_from_db(session, ids, include_inactive)
+
+    hydrated: dict[int, dict] = {}
+    for pid, card in cards.items():
+        images = card.get("images") or []
+        hydrated[pid] = {**_CARD_DEFAULTS, **card, "main_image": images[0] if images else None}
+    SEARCH_HYDRATED.labels("cache").inc(len(hydrated))
+
+    missing = [pid for pid in ids if pid not in hydrated]
+    if missing and include_inactive:
+        hydrated.update(await _hydrate_from_db(session, missing, include_inactive))
+    return hydrated
+
+
+# =========================
+# ПОИСК
+# =========================
+
+def _check_cursor(
+    cursor: dict[str, Any],
+    backend: SearchBackend,
+    q: str,
+    category_id: Optional[int],
+    filters: dict[str, Any],
+) -> list:
+    after = cursor.get("after")
+    # позиция — (релевантность, id) у обоих бэкендов; курсор приходит от клиента,
+    # в keyset-условие и search_after уходят только конечное число и id в диапазоне int4
+    if not isinstance(after, list) or len(after) != 2:
+        raise HTTPException(status_code=400, detail="Невалидный курсор")
+    rank, last_id = after
+    if (
+        isinstance(rank, bool)
+        or not isinstance(rank, (int, float))
+        or not math.isfinite(rank)
+        or isinstance(last_id, bool)
+        or not isinstance(last_id, int)
+        or not 0 <= last_id < 2**31
+        or not isinstance(cursor.get("pit") or "", str)
+    ):
+        raise HTTPException(status_code=400, detail="Невалидный курсор")
+    if (
+        cursor.get("b", "elasticsearch") != backend.name
+        or cursor.get("q") != normalize_query(q)
+        or cursor.get("c") != category_id
+        or cursor.get("f") != filters
+    ):
+        raise HTTPException(status_code=400, detail="Курсор выдан для другого запроса")
+    return [float(rank), last_id]
+
+
+@dataclass
+class _Query:
+    """Один поисковый запрос после проверки параметров."""
+    q: str
+    category_id: Optional[int]
+    limit: int
+    offset: int
+    cursor: Optional[dict[str, Any]]
+    include_total: bool
+    filters: dict[str, Any]
+    facets: bool
+    after: Optional[list]
+    cache_key: str
+
+    def backend_args(self, with_source: bool) -> dict[str, Any]:
+        return dict(
+            q=self.q,
+            category_id=self.category_id,
+            filters=self.filters,
+            limit=self.limit,
+            offset=self.offset,
+            after=self.after,
+            pit=self.cursor.get("pit") if self.cursor else None,
+            include_total=self.include_total,
+            facets=self.facets,
+            with_source=with_source,
+        )
+
+
+@dataclass
+class _Page:
+    """id страницы в порядке релевантности + всё, что отдаётся рядом с карточками."""
+    ids: List[int]
+    total: Optional[int]
+    total_relation: Optional[str]
+    next_cursor: Optional[dict[str, Any]] = None
+    facets: Optional[dict[str, Any]] = None
+    sources: Optional[dict[int, dict]] = None
+    degraded: bool = False
+
+
+def _prepare_query(
+    backend: SearchBackend,
+    *,
+    q: str = "",
+    category_id: Optional[int] = None,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[dict[str, Any]] = None,
+    include_total: bool = True,
+    include_inactive: bool = False,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    in_stock: Optional[bool] = None,
+    attrs: Sequence[tuple[int, str]] = (),
+    facets: bool = False,
+) -> _Query:
+    filters = search_filters(
+        price_min=price_min,
+        price_max=price_max,
+        in_stock=in_stock,
+        attrs=attrs,
+        include_inactive=include_inactive,
+    )
+    facets = facets and cursor is None
+    after = _check_cursor(cursor, backend, q, category_id, filters) if cursor is not None else None
+    if after is None and offset + limit > MAX_RESULT_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"offset + limit больше {MAX_RESULT_WINDOW}: листайте через cursor",
+        )
+    return _Query(
+        q=q,
+        category_id=category_id,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total,
+        filters=filters,
+        facets=facets,
+        after=after,
+        cache_key=result_key(
+            q, category_id, limit, offset, cursor, include_total, filters, facets, backend.name
+        ),
+    )
+
+
+def _cached_page(cached: Optional[dict[str, Any]]) -> Optional[_Page]:
+    if cached is None:
+        return None
+    return _Page(
+        ids=cached["ids"],
+        total=cached["total"],
+        total_relation=cached["relation"],
+        next_cursor=cached["next"],
+        facets=cached.get("facets"),
+    )
+
+
+async def _page_from_hits(backend: SearchBackend, query: _Query, hits: SearchHits) -> _Page:
+    next_cursor = None
+    if hits.after is not None:
+        next_cursor = {
+            "after": hits.after, "pit": hits.pit, "b": backend.name,
+            "q": normalize_query(query.q), "c": query.category_id, "f": query.filters,
         }
-    }
+    page = _Page(
+        ids=hits.ids,
+        total=hits.total,
+        total_relation=hits.total_relation,
+        next_cursor=next_cursor,
+        facets=hits.facets,
+        sources=hits.sources,
+    )
+    # PIT — только этого клиента: из кэша выдачи курсор отдаётся без него
+    # (следующая страница откроет свой), иначе чужой PIT жил бы, пока жив кэш
+    shared_cursor = {k: v for k, v in next_cursor.items() if k != "pit"} if next_cursor else None
+    await store_result(query.cache_key, page.ids, page.total, page.total_relation, shared_cursor, page.facets)
+    return page
+
+
+async def _degraded_page(session: AsyncSession, query: _Query, exc: SearchUnavailable) -> _Page:
+    """Бэкенд недоступен: упрощённая выдача из Postgres, в кэш выдачи не кладём."""
+    if query.after is not None:
+        raise HTTPException(status_code=503, detail="Поиск временно недоступен, повторите позже")
+    SEARCH_DEGRADED.labels("search", exc.reason).inc()
+    hits = await fallback_search(
+        session,
+        q=query.q,
+        category_id=query.category_id,
+        filters=query.filters,
+        limit=query.limit,
+        offset=query.offset,
+    )
+    return _Page(ids=hits.ids, total=None, total_relation=None, degraded=True)
+
+
+async def _fetch_page(
+    session: AsyncSession, backend: SearchBackend, query: _Query, with_source: bool
+) -> _Page:
+    # Повторный запрос (тот же q/фильтр/страница) — без похода в поисковый бэкенд
+    page = _cached_page(await get_result(query.cache_key))
+    if page is not None:
+        return page
+    try:
+        hits = await backend.search(session, **query.backend_args(with_source))
+    except SearchUnavailable as exc:
+        return await _degraded_page(session, query, exc)
+    return await _page_from_hits(backend, query, hits)
+
+
+async def _hydrate_pages(
+    session: AsyncSession, pages: Sequence[_Page], hydrate: Hydration, include_inactive: bool
+) -> dict[int, dict]:
+    """Карточки для всех страниц разом: объединение id — один поход в кэш/БД."""
+    ids = list(dict.fromkeys(pid for page in pages for pid in page.ids))
+    if not ids:
+        return {}
+    sources: Optional[dict[int, dict]] = None
+    if hydrate == "source" and any(page.sources is not None for page in pages):
+        sources = {}
+        for page in pages:
+            sources.update(page.sources or {})
+
+    cards: dict[int, dict] = {}
+    if sources is not None:
+        for pid, card in sources.items():
+            if card.get("is_active", True) or include_inactive:
+                cards[pid] = {**_CARD_DEFAULTS, **card}
+        SEARCH_HYDRATED.labels("es_source").inc(len(cards))
+        missing = [pid for pid in ids if pid not in sources]
+        cards.update(await _hydrate_from_cache(session, missing, include_inactive))
+    elif hydrate in ("source", "cache"):
+        # из кэша выдачи (и от Postgres-бэкенда) приходят только id — карточки из кэша карточек
+        cards = await _hydrate_from_cache(session, ids, include_inactive)
+    else:
+        cards = await _hydrate_from_db(session, ids, include_inactive)
+    return cards
+
+
+def _page_result(
+    page: _Page, cards: dict[int, dict]
+) -> Tuple[List[dict], Optional[int], Optional[str], Optional[dict[str, Any]], Optional[dict[str, Any]], bool]:
+    # Порядок как в выдаче бэкенда (по релевантности)
+    return (
+        [cards[i] for i in page.ids if i in cards],
+        page.total,
+        page.total_relation,
+        page.next_cursor,
+        page.facets,
+        page.degraded,
+    )
 
 
 async def search_products(
     session: AsyncSession,
-    es: AsyncElasticsearch,
+    backend: SearchBackend,
     *,
     q: str = "",
     category_id: Optional[int] = None,
     limit: int = 10,
     offset: int = 0,
-) -> Tuple[List[Product], int]:
+    cursor: Optional[dict[str, Any]] = None,
+    include_total: bool = True,
+    hydrate: Optional[Hydration] = None,
+    include_inactive: bool = False,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    in_stock: Optional[bool] = None,
+    attrs: Sequence[tuple[int, str]] = (),
+    facets: bool = False,
+) -> Tuple[List[dict], Optional[int], Optional[str], Optional[dict[str, Any]], Optional[dict[str, Any]], bool]:
     """
-    Ищем id в Elasticsearch, затем гидрируем полные модели из Postgres
-    и возвращаем их в порядке релевантности ES + общее количество совпадений.
+    Ищем через backend (Elasticsearch или Postgres, см. get_search_backend) и
+    возвращаем карточки (dict) в порядке релевантности.
+    Откуда берутся карточки — hydrate (по умолчанию settings.es.search_hydration):
+      - source — из самого индекса (ES _source, поле display), без похода в Postgres;
+        бэкенд без _source (Postgres) — как cache;
+      - cache  — по id из кэша карточек Redis;
+      - db     — из Postgres одним запросом.
+    Промахи source добираются через кэш, промахи кэша — из Postgres.
+    include_inactive — показывать неактивные товары (для суперпользователя).
+
+    Фильтры (цена, наличие, attrs — пары (attribute_id, value)) применяет бэкенд.
+    facets=True — в том же запросе агрегации: категории, гистограмма цен,
+    наличие, а при category_id — топ значений атрибутов; только на первой странице.
+
+    id страницы и total кэшируются на search_cache_ttl (core/search/result_cache.py).
+
+    Пагинация — cursor (decode_cursor от next_cursor предыдущей страницы);
+    offset оставлен для обратной совместимости и ограничен MAX_RESULT_WINDOW.
+    total считается точно до search_track_total_hits, дальше total_relation="gte";
+    include_total=False — не считать вовсе.
+
+    Если бэкенд недоступен (SearchUnavailable от circuit breaker'а ES) —
+    деградированная выдача из Postgres по названию (pg_backend.fallback_search):
+    без total, фасетов и курсора, в кэш выдачи не кладётся. Продолжить по
+    курсору в этом режиме нельзя — 503.
+
+    Возвращает (карточки, total, total_relation, payload следующего курсора, фасеты, degraded).
     """
-    query = _build_es_query(q, category_id)
-
-    res = await es.search(
-        index=index_alias(),
-        query=query,
-        sort=[{"_score": "desc"}],
-        from_=offset,
-        size=limit,
-        track_total_hits=True,
-        _source=False,  # берём только _id/_score
+    hydrate = hydrate or settings.es.search_hydration
+    query = _prepare_query(
+        backend,
+        q=q,
+        category_id=category_id,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total,
+        include_inactive=include_inactive,
+        price_min=price_min,
+        price_max=price_max,
+        in_stock=in_stock,
+        attrs=attrs,
+        facets=facets,
     )
+    page = await _fetch_page(session, backend, query, with_source=hydrate == "source")
+    cards = await _hydrate_pages(session, [page], hydrate, include_inactive)
+    return _page_result(page, cards)
 
-    total = int(res["hits"]["total"]["value"])
-    ids = [int(h["_id"]) for h in res["hits"]["hits"]]
-    if not ids:
-        return [], total
 
-    # Жадно подгружаем связи, чтобы избежать lazy-load в async (MissingGreenlet)
-    rows = await session.execute(
-        select(Product)
-        .options(
-            selectinload(Product.attributes).selectinload(ProductAttributeValue.attribute),
-            selectinload(Product.category),
-        )
-        .where(Product.id.in_(ids))
-    )
-    products = rows.scalars().all()
+async def msearch_products(
+    session: AsyncSession,
+    backend: SearchBackend,
+    specs: Sequence[dict[str, Any]],
+    *,
+    hydrate: Optional[Hydration] = None,
+    include_inactive: bool = False,
+) -> List[
+    Tuple[List[dict], Optional[int], Optional[str], Optional[dict[str, Any]], Optional[dict[str, Any]], bool]
+    | SearchQueryError
+]:
+    """
+    Несколько поисков за раз (страница каталога: основной запрос, тизеры категорий,
+    новинки). specs — аргументы search_products (q, category_id, limit, offset,
+    cursor, include_total, price_min, price_max, in_stock, attrs, facets).
+      - кэш выдачи проверяется для всех запросов сразу;
+      - промахи первых страниц уходят в бэкенд одним backend.msearch
+        (у ES — один _msearch); страницы по курсору — по одной, им нужен свой PIT;
+      - карточки объединения id всех страниц — одним походом в кэш/БД.
+    Недоступность бэкенда для одного запроса в _msearch (или для всех) — деградированная
+    выдача только для него; запрос, отклонённый бэкендом (4xx), — SearchQueryError
+    на его месте, без деградации. Возвращает результаты в порядке specs, как у search_products.
+    """
+    hydrate = hydrate or settings.es.search_hydration
+    with_source = hydrate == "source"
+    queries = [
+        _prepare_query(backend, include_inactive=include_inactive, **spec) for spec in specs
+    ]
+
+    cached = await asyncio.gather(*(get_result(query.cache_key) for query in queries))
+    pages: list[Optional[_Page]] = [_cached_page(c) for c in cached]
+    errors: dict[int, SearchQueryError] = {}
+
+    batch = [i for i, page in enumerate(pages) if page is None and queries[i].after is None]
+    if batch:
+        try:
+            results: list[SearchHits | SearchUnavailable | SearchQueryError] = await backend.msearch(
+                session, [queries[i].backend_args(with_source) for i in batch]
+            )
+        except SearchUnavailable as exc:
+            results = [exc] * len(batch)
+        found = [(i, hits) for i, hits in zip(batch, results) if isinstance(hits, SearchHits)]
+        # запись в кэш выдачи — параллельно; фолбэк ходит в сессию — по одному
+        for (i, _), page in zip(
+            found,
+            await asyncio.gather(*(_page_from_hits(backend, queries[i], hits) for i, hits in found)),
+        ):
+            pages[i] = page
+        for i, hits in zip(batch, results):
+            if isinstance(hits, SearchUnavailable):
+                pages[i] = await _degraded_page(session, queries[i], hits)
+            elif isinstance(hits, SearchQueryError):
+                errors[i] = hits
+
+    for i, page in enumerate(pages):
+        if page is None and i not in errors:
+            pages[i] = await _fetch_page(session, backend, queries[i], with_source)
+
+    cards = await _hydrate_pages(session, [page for page in pages if page is not None], hydrate, include_inactive)
+    return [errors[i] if i in errors else _page_result(page, cards) for i, page in enumerate(pages)]
+
+
+# =========================
+# АВТОДОПОЛНЕНИЕ
+# =========================
+
+async def suggest_titles(
+    session: AsyncSession,
+    backend: SearchBackend,
+    *,
+    prefix: str,
+    limit: int = 10,
+) -> List[dict[str, Any]]:
+    """
+    Подсказки [{id, title}] по префиксу: кэш Redis, при промахе — лёгкий запрос в бэкенд.
+    Бэкенд недоступен — префикс по названию в Postgres (pg_backend.fallback_suggest), без кэша.
+    """
+    cfg = settings.es
+    prefix = normalize_query(prefix)
+    limit = max(1, min(limit, cfg.suggest_max_size))
+    if len(prefix) < cfg.suggest_min_prefix:
+        return []
+
+    with SUGGEST_LATENCY.time():
+        key = suggest_key(prefix, limit, backend.name)
+        cached = await get_suggestions(key)
+        if cached is not None:
+            return cached
 
-    # Восстанавливаем порядок как в ES (по релевантности)
-    by_id = {p.id: p for p in products}
-    ordered = [by_id[i] for i in ids if i in by_id]
-    return ordered, total
+        try:
+            items = await backend.suggest(session, prefix=prefix, limit=limit)
+        except SearchUnavailable as exc:
+            SEARCH_DEGRADED.labels("suggest", exc.reason).inc()
+            return await fallback_suggest(session, prefix=prefix, limit=limit)
+        await store_suggestions(key, items)
+        return items
@@ -32,3 +32,17 @@ async def top_products(db: AsyncSession, limit: int = 5):
     res = await db.execute(stmt)
     # вернёт список кортежей (title, total)
     return res.all()
+
+
+async def top_product_ids(db: AsyncSession, limit: int = 100) -> list[int]:
+    """id самых продаваемых товаров (только живые) — для прогрева кэша."""
+    stmt = (
+        select(OrderItem.product_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Product.is_deleted == False, Product.is_active == True)  # noqa: E712
+        .group_by(OrderItem.product_id)
+        .order_by(desc(func.sum(OrderItem.quantity)))
+        .limit(limit)
+    )
+    res = await db.execute(stmt)
+    return list(res.scalars().all())
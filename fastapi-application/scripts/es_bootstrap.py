@@ -1,70 +1,19 @@
 # scripts/es_bootstrap.py
 import asyncio
+import sys
+from pathlib import Path
+
 from elasticsearch import AsyncElasticsearch
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
 # Настройки подключения и имен
 ES_URL = "http://localhost:9200"
 ALIAS = "products"
 INDEX = f"{ALIAS}_v1"  # (совмещаем RU + EN)
 
-# Маппинг/настройки: русский + английский анализаторы.
-# Сохраняем back-compat: поле title имеет подполе "prefix" (RU-префикс),
-# добавляем англ. подполя: "title.en" и "title.prefix_en".
-BODY = {
-    "settings": {
-        "analysis": {
-            "filter": {
-                # RU
-                "ru_stop": {"type": "stop", "stopwords": "_russian_"},
-                "ru_stemmer": {"type": "stemmer", "language": "russian"},
-                # EN
-                "en_stop": {"type": "stop", "stopwords": "_english_"},
-                "en_stemmer": {"type": "stemmer", "language": "english"},
-                # Общий edge-ngram для префиксного поиска
-                "edge": {"type": "edge_ngram", "min_gram": 2, "max_gram": 15},
-            },
-            "analyzer": {
-                # Базовые анализаторы
-                "ru": {"tokenizer": "standard", "filter": ["lowercase", "ru_stop", "ru_stemmer"]},
-                "en": {"tokenizer": "standard", "filter": ["lowercase", "en_stop", "en_stemmer"]},
-                # Префиксные
-                "ru_prefix": {"tokenizer": "standard", "filter": ["lowercase", "ru_stop", "ru_stemmer", "edge"]},
-                "en_prefix": {"tokenizer": "standard", "filter": ["lowercase", "en_stop", "en_stemmer", "edge"]},
-            },
-        }
-    },
-    "mappings": {
-        "properties": {
-            # Что ищем (RU + EN + префиксы)
-            "title": {
-                "type": "text",
-                "analyzer": "ru",  # основное поле — русский
-                "fields": {
-                    "prefix": {"type": "text", "analyzer": "ru_prefix"},     # back-compat для текущего запроса "title.prefix"
-                    "en": {"type": "text", "analyzer": "en"},
-                    "prefix_en": {"type": "text", "analyzer": "en_prefix"},
-                },
-            },
-            "description": {
-                "type": "text",
-                "analyzer": "ru",
-                "fields": {
-                    "en": {"type": "text", "analyzer": "en"},
-                },
-            },
-            "category_name": {
-                "type": "text",
-                "analyzer": "ru",
-                "fields": {
-                    "en": {"type": "text", "analyzer": "en"},
-                },
-            },
-
-            # Фильтры
-            "category_id": {"type": "keyword"},
-        }
-    },
-}
+# Маппинг/настройки: core/search/mapping.py (общие с пересборкой индекса)
+from core.search.mapping import BODY  # noqa: E402
 
 
 async def main():
@@ -95,11 +44,11 @@ async def main():
                 print(f"Alias {ALIAS} already points to {INDEX} — OK")
             else:
                 # Не переключаем автоматически, чтобы случайно не задеть продовые данные.
+                # Смена маппинга — через пересборку без простоя: scripts/es_rebuild.py
                 print(
                     f"Alias {ALIAS} already exists and points to {indices_with_alias}. "
-                    f"Not switching automatically. If you want to switch to {INDEX}, run update-aliases:\n"
-                    f"  POST /_aliases {{'actions':[{{'remove':{{'index':'{indices_with_alias[0]}','alias':'{ALIAS}'}}}},"
-                    f"{{'add':{{'index':'{INDEX}','alias':'{ALIAS}'}}}}]}}"
+                    f"Not switching automatically. To apply a new mapping, run:\n"
+                    f"  python scripts/es_rebuild.py"
                 )
     finally:
         await es.close()
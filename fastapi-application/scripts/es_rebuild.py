@@ -0,0 +1,45 @@
+# scripts/es_rebuild.py
+"""
+Пересборка индекса товаров без простоя: products_v{N+1} по маппингу из
+core/search/mapping.py, заливка, сверка с Postgres и атомарное
+переключение алиаса. Старые версии сверх rebuild_keep_indices удаляются.
+
+    python scripts/es_rebuild.py
+
+То же из API: POST /api/v1/products/reindex/rebuild.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch import AsyncElasticsearch
+
+from core.cache.redis_client import close_redis
+from core.config import settings
+from core.models.db_helper import db_helper
+from core.search.rebuild import rebuild_index
+from core.search.reindex import create_reindex_job
+
+
+async def main() -> int:
+    es = AsyncElasticsearch(settings.es.url, request_timeout=60)
+    try:
+        job_id = await create_reindex_job()
+        print(f"Rebuild job {job_id}")
+        job = await rebuild_index(job_id, es, db_helper.session_factory)
+        print(json.dumps(job, ensure_ascii=False, indent=2))
+        return 0 if job and job.get("status") == "done" else 1
+    finally:
+        await es.close()
+        await close_redis()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,50 @@
+# scripts/es_reconcile.py
+"""
+Сверка индекса товаров в Elasticsearch с Postgres (core/search/reconcile.py):
+считает missing / extra / stale и, если не --dry-run, чинит их через _bulk.
+
+    python scripts/es_reconcile.py
+    python scripts/es_reconcile.py --dry-run
+
+По расписанию то же делает celery beat (tasks.search_reconcile.reconcile).
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch import AsyncElasticsearch
+
+from core.cache.redis_client import close_redis
+from core.config import settings
+from core.models.db_helper import db_helper
+from core.search.reconcile import reconcile_index_once
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Сверка индекса ES с Postgres")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать расхождения")
+    args = parser.parse_args()
+
+    es = AsyncElasticsearch(settings.es.url, request_timeout=60)
+    try:
+        report = await reconcile_index_once(es, db_helper.session_factory, repair=not args.dry_run)
+        if report is None:
+            print("Пропущено: идёт пересборка индекса или другая сверка")
+            return 1
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if not report["failed"] else 1
+    finally:
+        await es.close()
+        await close_redis()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
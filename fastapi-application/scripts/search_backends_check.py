@@ -0,0 +1,120 @@
+# scripts/search_backends_check.py
+"""
+Сравнение поисковых бэкендов на одном и том же каталоге: прогоняет набор
+запросов через Elasticsearch и Postgres (core/search/*_backend.py) и печатает
+совпадение top-k (доля общих id) и задержки p50/p99 по каждому бэкенду.
+
+    python scripts/search_backends_check.py
+    python scripts/search_backends_check.py --k 20 --runs 30 "iphone" "чехол силикон"
+
+Кэш выдачи не участвует — бэкенды вызываются напрямую.
+Перед переключением settings.search.backend стоит прогнать на проде-копии.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from elasticsearch import AsyncElasticsearch
+
+from core.config import settings
+from core.models.db_helper import db_helper
+from core.search.backend import SearchBackend, search_filters
+from core.search.es_backend import ElasticsearchBackend
+from core.search.pg_backend import PostgresSearchBackend
+
+# Опечатки, префиксы, смесь языков — то, на чём бэкенды расходятся сильнее всего
+DEFAULT_QUERIES = [
+    "iphone",
+    "iphone 15 pro",
+    "айфон",
+    "смартфон",
+    "смартф",
+    "чехол силикон",
+    "наушники беспроводные",
+    "ноутбук",
+    "нотбук",
+    "samsung galaxy",
+    "зарядка usb-c",
+    "телевизор 55",
+]
+
+
+async def _run(
+    backend: SearchBackend, session, q: str, k: int, runs: int
+) -> tuple[list[int], list[float]]:
+    ids: list[int] = []
+    timings: list[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        hits = await backend.search(
+            session,
+            q=q,
+            category_id=None,
+            filters=search_filters(),
+            limit=k,
+            offset=0,
+            after=None,
+            pit=None,
+            include_total=False,
+            facets=False,
+            with_source=False,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        ids = hits.ids
+    return ids, timings
+
+
+def _percentile(values: list[float], p: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(p) - 1]
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=10, help="глубина сравнения top-k")
+    parser.add_argument("--runs", type=int, default=20, help="повторов на запрос для задержек")
+    args = parser.parse_args()
+
+    es = AsyncElasticsearch(settings.es.url, request_timeout=30)
+    backends: list[SearchBackend] = [ElasticsearchBackend(es), PostgresSearchBackend()]
+    timings: dict[str, list[float]] = {b.name: [] for b in backends}
+    overlaps: list[float] = []
+    try:
+        async with db_helper.session_factory() as session:
+            print(f"{'запрос':<28} {'es':>4} {'pg':>4} {'top-k ∩':>8}")
+            for q in args.queries:
+                results = {}
+                for backend in backends:
+                    ids, t = await _run(backend, session, q, args.k, args.runs)
+                    results[backend.name] = ids
+                    timings[backend.name].extend(t)
+                es_ids, pg_ids = results["elasticsearch"], results["postgres"]
+                base = max(len(es_ids), len(pg_ids))
+                overlap = len(set(es_ids) & set(pg_ids)) / base if base else 1.0
+                overlaps.append(overlap)
+                print(f"{q[:28]:<28} {len(es_ids):>4} {len(pg_ids):>4} {overlap:>8.0%}")
+    finally:
+        await es.close()
+        await db_helper.dispose()
+
+    print(f"\nсреднее совпадение top-{args.k}: {statistics.mean(overlaps):.0%}")
+    for name, values in timings.items():
+        print(
+            f"{name:<14} p50 {_percentile(values, 50):7.1f} ms"
+            f"   p99 {_percentile(values, 99):7.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
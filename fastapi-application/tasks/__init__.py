@@ -1,9 +1,19 @@
-__all__ = ("send_welcome_email",)
+__all__ = (
+    "drain_search_outbox",
+    "rebuild_search_index",
+    "reindex_products",
+    "send_welcome_email",
+    "warm_product_cache",
+)
 
 import logging
 import sys
 
+from core.change_tracker import install_change_tracker
 from core.config import settings
+from .cache_warmup import warm_product_cache
+from .search_outbox import drain_search_outbox
+from .search_reindex import rebuild_search_index, reindex_products
 from .welcome_email_notification import send_welcome_email
 
 if sys.argv[0] == "worker":
@@ -11,3 +21,5 @@ if sys.argv[0] == "worker":
         level=settings.logging.log_level_value,
         format=settings.logging.log_format,
     )
+
+install_change_tracker()
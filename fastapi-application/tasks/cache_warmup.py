@@ -0,0 +1,17 @@
+import logging
+
+from core import broker
+from core.cache.warmup import warm_products_cache
+from core.models import db_helper
+
+log = logging.getLogger(__name__)
+
+
+@broker.task
+async def warm_product_cache() -> dict:
+    """
+    Ручной/внешний прогрев (например, после FLUSHALL или рестарта Redis):
+    в отличие от хука старта, выполняется без lock'а — всегда.
+    """
+    log.info("Warming product cache")
+    return await warm_products_cache(db_helper.session_factory)
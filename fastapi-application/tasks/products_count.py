@@ -0,0 +1,28 @@
+import asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from core.cache.products_count import reconcile_products_count
+from core.cache.redis_client import close_redis
+from core.celery_app import celery_app
+from core.config import settings
+
+
+@celery_app.task(name="tasks.products_count.reconcile")
+def reconcile():
+    """Периодическая сверка Redis-счётчика товаров с Postgres (через beat)."""
+    return asyncio.run(_reconcile())
+
+
+async def _reconcile():
+    # Свой движок и свой Redis-клиент на каждую таску: event loop у каждой свой
+    engine = create_async_engine(settings.db.url, echo=settings.db.echo)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    try:
+        async with Session() as db:
+            total = await reconcile_products_count(db)
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+    return {"products_total": total}
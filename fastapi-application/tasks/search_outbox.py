@@ -0,0 +1,44 @@
+import asyncio
+import contextlib
+import logging
+
+from taskiq import TaskiqEvents, TaskiqState
+
+from core import broker
+from core.config import settings
+from core.models import db_helper
+from core.search.es import get_client
+from core.search.outbox import drain_once, run_outbox_consumer
+
+log = logging.getLogger(__name__)
+
+
+@broker.on_event(TaskiqEvents.WORKER_STARTUP)
+async def start_search_outbox_consumer(state: TaskiqState) -> None:
+    if settings.search.backend != "elasticsearch":
+        return
+    # Цикл есть в каждом процессе воркера, но пачку за раз берёт только один
+    # (advisory lock в drain_once) — остальные подхватят, если он упадёт
+    es = await get_client()
+    state.search_outbox_consumer = asyncio.create_task(
+        run_outbox_consumer(es, db_helper.session_factory),
+        name="search-outbox-consumer",
+    )
+    log.info("Search outbox consumer started")
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def stop_search_outbox_consumer(state: TaskiqState) -> None:
+    task = getattr(state, "search_outbox_consumer", None)
+    if task is None:
+        return
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+@broker.task
+async def drain_search_outbox() -> int:
+    """Разовый проход по outbox (например, вручную после простоя ES)."""
+    es = await get_client()
+    return await drain_once(es, db_helper.session_factory)
@@ -0,0 +1,30 @@
+import asyncio
+from elasticsearch import AsyncElasticsearch
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from core.cache.redis_client import close_redis
+from core.celery_app import celery_app
+from core.config import settings
+from core.search.reconcile import reconcile_index_once
+
+
+@celery_app.task(name="tasks.search_reconcile.reconcile")
+def reconcile():
+    """Периодическая сверка индекса ES с Postgres и починка расхождений (через beat)."""
+    return asyncio.run(_reconcile())
+
+
+async def _reconcile():
+    # Свои движок, ES- и Redis-клиенты на каждую таску: event loop у каждой свой
+    engine = create_async_engine(settings.db.url, echo=settings.db.echo)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    es = AsyncElasticsearch(settings.es.url, request_timeout=60)
+
+    try:
+        report = await reconcile_index_once(es, Session)
+    finally:
+        await es.close()
+        await close_redis()
+        await engine.dispose()
+
+    return report or {"skipped": True}
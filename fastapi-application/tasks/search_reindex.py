@@ -0,0 +1,25 @@
+import logging
+
+from core import broker
+from core.models import db_helper
+from core.search.es import get_client
+from core.search.rebuild import rebuild_index
+from core.search.reindex import run_reindex_job
+
+log = logging.getLogger(__name__)
+
+
+@broker.task
+async def reindex_products(job_id: str) -> dict | None:
+    """Полная переиндексация ES; прогресс — GET /products/reindex/{job_id}."""
+    log.info("Reindexing products, job %s", job_id)
+    es = await get_client()
+    return await run_reindex_job(job_id, es, db_helper.session_factory)
+
+
+@broker.task
+async def rebuild_search_index(job_id: str) -> dict | None:
+    """Пересборка в products_v{N+1} с переключением алиаса (без простоя)."""
+    log.info("Rebuilding search index, job %s", job_id)
+    es = await get_client()
+    return await rebuild_index(job_id, es, db_helper.session_factory)
@@ -0,0 +1,124 @@
+"""
+Общие заглушки для тестов поиска: ES-клиент и AsyncSession без сервисов.
+Запуск — из fastapi-application (там .env.template с настройками): `pytest`.
+Async-тесты идут через плагин anyio (pytest и anyio — dev-зависимости в pyproject.toml).
+"""
+
+from collections import namedtuple
+from typing import Any
+
+import pytest
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from sqlalchemy.dialects import postgresql
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def api_meta(status: int) -> ApiResponseMeta:
+    return ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+
+
+class FakeES:
+    """Отвечает заранее заданными ответами по очереди и запоминает аргументы вызовов."""
+
+    def __init__(self, *responses: Any) -> None:
+        self.responses = list(responses)
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+        self.pits = 0
+
+    def _next(self, method: str, kwargs: dict[str, Any]) -> Any:
+        self.calls.append((method, kwargs))
+        res = self.responses.pop(0)
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+    async def search(self, **kwargs: Any) -> Any:
+        return self._next("search", kwargs)
+
+    async def msearch(self, **kwargs: Any) -> Any:
+        return self._next("msearch", kwargs)
+
+    async def open_point_in_time(self, **kwargs: Any) -> dict[str, Any]:
+        self.calls.append(("open_point_in_time", kwargs))
+        self.pits += 1
+        return {"id": f"pit-{self.pits}"}
+
+    async def close_point_in_time(self, **kwargs: Any) -> dict[str, Any]:
+        self.calls.append(("close_point_in_time", kwargs))
+        return {"succeeded": True}
+
+    def method_calls(self, method: str) -> list[dict[str, Any]]:
+        return [kwargs for name, kwargs in self.calls if name == method]
+
+
+def es_response(hits: list[tuple[int, float]], total: int | None = None, **extra: Any) -> dict[str, Any]:
+    """Ответ _search: hits — (id, score), sort как у SEARCH_SORT."""
+    body: dict[str, Any] = {
+        "hits": {
+            "hits": [
+                {"_id": str(pid), "_score": score, "sort": [score, pid]} for pid, score in hits
+            ]
+        },
+        **extra,
+    }
+    if total is not None:
+        body["hits"]["total"] = {"value": total, "relation": "eq"}
+    return body
+
+
+# Строка результата с доступом по имени колонки, как sqlalchemy Row
+RankRow = namedtuple("RankRow", "id rank")
+
+
+class _Result:
+    def __init__(self, rows: list) -> None:
+        self._rows = rows
+
+    def all(self) -> list:
+        return list(self._rows)
+
+    def one(self) -> Any:
+        (row,) = self._rows
+        return row
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeSession:
+    """
+    AsyncSession без БД: запросы компилируются под диалект Postgres (ошибка
+    построения SQL всплывёт здесь), ответы — заранее заданные, по очереди.
+    """
+
+    def __init__(self, *results: Any) -> None:
+        self.results = list(results)
+        self.statements: list = []
+
+    def _next(self, stmt: Any) -> Any:
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+        return self.results.pop(0)
+
+    async def execute(self, stmt: Any) -> _Result:
+        return _Result(self._next(stmt))
+
+    async def scalar(self, stmt: Any) -> Any:
+        return self._next(stmt)
+
+    @property
+    def sql(self) -> list[str]:
+        return [str(compiled) for compiled in self.statements]
+
+    @property
+    def params(self) -> list[dict[str, Any]]:
+        return [compiled.params for compiled in self.statements]
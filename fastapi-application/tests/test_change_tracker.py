@@ -0,0 +1,71 @@
+"""core/change_tracker: когда уходит пачка сброса кэша после commit."""
+
+import pytest
+
+import core.change_tracker as tracker
+
+pytestmark = pytest.mark.anyio
+
+
+class _Session:
+    """Хватает info и commit, который, как настоящий, вызывает after_commit."""
+
+    def __init__(self, card=(), dynamic=()) -> None:
+        self.info: dict = {}
+        changes = tracker.ProductChanges()
+        changes.card.update(card)
+        changes.dynamic.update(dynamic)
+        self.info[tracker._INFO_KEY] = changes
+
+    async def commit(self) -> None:
+        tracker._after_commit(self)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    async def invalidate_products(card_ids, dynamic_ids, client=None):
+        calls.append((sorted(card_ids), sorted(dynamic_ids)))
+
+    monkeypatch.setattr(tracker, "invalidate_products", invalidate_products)
+    return calls
+
+
+async def test_request_session_waits_for_flush(sent):
+    session = _Session(card=[1], dynamic=[2])
+    tracker.defer_invalidation(session)
+    await session.commit()
+
+    assert sent == [] and not tracker._tasks
+    await tracker.flush_invalidations(session)
+    assert sent == [([1], [2])]
+    # Второй раз отправлять нечего
+    await tracker.flush_invalidations(session)
+    assert len(sent) == 1
+
+
+async def test_commit_and_invalidate_sends_before_return(sent):
+    session = _Session(card=[5])
+    await tracker.commit_and_invalidate(session)
+
+    assert sent == [([5], [])]
+    assert not tracker._tasks
+    # Флаг сессии восстановлен: следующий обычный commit — снова фоном
+    assert not session.info.get(tracker._DEFER_KEY)
+
+
+async def test_other_sessions_dispatch_in_background(sent):
+    session = _Session(card=[7])
+    await session.commit()
+
+    assert len(tracker._tasks) == 1
+    await tracker.drain_pending_invalidations()
+    assert sent == [([7], [])]
+
+
+def test_without_event_loop(sent):
+    session = _Session(dynamic=[3])
+    tracker._after_commit(session)
+
+    assert sent == [([], [3])]
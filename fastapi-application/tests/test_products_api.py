@@ -0,0 +1,59 @@
+"""api/api_v1/products: что клиент получает, когда поисковый бэкенд отклонил запрос."""
+
+import pytest
+from fastapi import HTTPException
+
+import api.api_v1.products as products_api
+import crud.products_search as products_search
+from core.search.backend import SearchQueryError
+
+pytestmark = pytest.mark.anyio
+
+
+class _Backend:
+    name = "elasticsearch"
+
+    def __init__(self, status: int) -> None:
+        self.error = SearchQueryError("elasticsearch: rejected", status)
+
+    async def search(self, session, **kwargs):
+        raise self.error
+
+    async def suggest(self, session, **kwargs):
+        raise self.error
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    async def miss(key):
+        return None
+
+    monkeypatch.setattr(products_search, "get_result", miss)
+    monkeypatch.setattr(products_search, "get_suggestions", miss)
+
+
+def _search(backend):
+    return products_api.search_products_endpoint(
+        session=None, backend=backend, current_user=None,
+        q="iphone", category_id=None, limit=10, offset=0, cursor=None,
+        include_total=True, hydrate="db", price_min=None, price_max=None,
+        in_stock=None, attr=[], facets=False,
+    )
+
+
+def _suggest(backend):
+    return products_api.suggest_products_endpoint(
+        session=None, backend=backend, prefix="iphone", limit=5
+    )
+
+
+@pytest.mark.parametrize("call", [_search, _suggest], ids=["search", "suggest"])
+@pytest.mark.parametrize(
+    "backend_status, http_status",
+    [(400, 400), (404, 503)],
+    ids=["bad-query", "missing-index"],
+)
+async def test_query_error_is_http_error(call, backend_status, http_status):
+    with pytest.raises(HTTPException) as exc_info:
+        await call(_Backend(backend_status))
+    assert exc_info.value.status_code == http_status
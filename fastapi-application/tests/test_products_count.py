@@ -0,0 +1,74 @@
+"""core/cache/products_count: оценка при промахе и фоновый засев счётчика."""
+
+import asyncio
+import contextlib
+
+import pytest
+
+import core.cache.products_count as products_count
+
+pytestmark = pytest.mark.anyio
+
+
+class _Redis:
+    """get/set с nx — всё, что нужно счётчику."""
+
+    def __init__(self) -> None:
+        self.data: dict = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = _Redis()
+    monkeypatch.setattr(products_count, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def exact_counts(monkeypatch):
+    calls = []
+
+    async def estimate(session):
+        return 1000
+
+    async def exact(session):
+        calls.append(session)
+        return 7
+
+    @contextlib.asynccontextmanager
+    async def session_factory():
+        yield "seed-session"
+
+    monkeypatch.setattr(products_count, "estimate_products_count", estimate)
+    monkeypatch.setattr(products_count, "count_products_exact", exact)
+    monkeypatch.setattr(products_count.db_helper, "session_factory", session_factory)
+    return calls
+
+
+async def test_miss_returns_estimate_and_seeds_once(redis, exact_counts):
+    first, second = await asyncio.gather(
+        products_count.get_products_total(None), products_count.get_products_total(None)
+    )
+
+    assert first == second == (1000, True)
+    await asyncio.gather(*products_count._tasks)
+    # Засев один на все промахи, своей сессией, а не сессией запроса
+    assert exact_counts == ["seed-session"]
+
+    assert await products_count.get_products_total(None) == (7, False)
+
+
+async def test_cached_counter(redis, exact_counts):
+    redis.data["products:count"] = "42"
+
+    assert await products_count.get_products_total(None) == (42, False)
+    assert not products_count._tasks and exact_counts == []
@@ -0,0 +1,85 @@
+"""crud/products_search.msearch_products: разбор ответов backend.msearch по запросам."""
+
+import pytest
+
+import crud.products_search as products_search
+from core.search.backend import SearchHits, SearchQueryError
+from core.search.breaker import SearchUnavailable
+from core.search.metrics import SEARCH_DEGRADED
+from .conftest import FakeSession
+
+pytestmark = pytest.mark.anyio
+
+
+class _Backend:
+    name = "elasticsearch"
+
+    def __init__(self, results) -> None:
+        self.results = results
+        self.calls = 0
+
+    async def msearch(self, session, queries):
+        self.calls += 1
+        assert len(queries) == len(self.results)
+        return self.results
+
+    async def search(self, session, **kwargs):
+        raise AssertionError("страницы без курсора идут только через msearch")
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    async def get_result(key):
+        return None
+
+    async def store_result(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(products_search, "get_result", get_result)
+    monkeypatch.setattr(products_search, "store_result", store_result)
+
+
+def _degraded() -> float:
+    return sum(
+        sample.value
+        for metric in SEARCH_DEGRADED.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total") and sample.labels["kind"] == "search"
+    )
+
+
+async def test_rejected_query_is_returned_in_place():
+    backend = _Backend([
+        SearchHits(ids=[], total=0, total_relation="eq"),
+        SearchQueryError("elasticsearch: bad query", 400),
+    ])
+    degraded = _degraded()
+    results = await products_search.msearch_products(
+        FakeSession(), backend, [{"q": "iphone"}, {"q": "samsung"}], hydrate="db"
+    )
+
+    ok, rejected = results
+    assert ok == ([], 0, "eq", None, None, False)
+    assert isinstance(rejected, SearchQueryError) and rejected.status == 400
+    # Ни деградации, ни повторного запроса по одному
+    assert _degraded() == degraded
+    assert backend.calls == 1
+
+
+async def test_unavailable_query_is_degraded(monkeypatch):
+    async def fallback_search(session, **kwargs):
+        return SearchHits(ids=[], total=None, total_relation=None)
+
+    monkeypatch.setattr(products_search, "fallback_search", fallback_search)
+    backend = _Backend([
+        SearchUnavailable("elasticsearch: no shard", reason="error"),
+        SearchHits(ids=[], total=0, total_relation="eq"),
+    ])
+    degraded = _degraded()
+    results = await products_search.msearch_products(
+        FakeSession(), backend, [{"q": "iphone"}, {"q": "samsung"}], hydrate="db"
+    )
+
+    assert results[0] == ([], None, None, None, None, True)
+    assert results[1] == ([], 0, "eq", None, None, False)
+    assert _degraded() == degraded + 1
@@ -0,0 +1,325 @@
+"""
+Оба SearchBackend (core/search/es_backend.py, core/search/pg_backend.py):
+запрос, фильтры, фасеты, keyset-пагинация и подсказки — без ES и Postgres,
+через заглушки из conftest.py.
+"""
+
+import pytest
+from elasticsearch import BadRequestError, NotFoundError
+
+from core.config import settings
+from core.search.backend import SearchQueryError, search_filters
+from core.search.breaker import SearchUnavailable
+from core.search.es_backend import SEARCH_SORT, ElasticsearchBackend
+from core.search.pg_backend import PostgresSearchBackend
+from .conftest import FakeES, FakeSession, RankRow, api_meta, es_response
+
+pytestmark = pytest.mark.anyio
+
+FILTERS = search_filters(price_min=1000, price_max=5000, in_stock=True, attrs=[(7, "red")])
+
+# Фасеты в общем формате — его обязаны отдавать оба бэкенда
+FACETS = {
+    "categories": [{"category_id": 3, "count": 5}, {"category_id": 4, "count": 2}],
+    "price": {
+        "min": 1500.0,
+        "max": 4200.0,
+        "histogram": [{"from": 1000, "count": 4}, {"from": 4000, "count": 3}],
+    },
+    "in_stock": 6,
+    "attributes": [
+        {"attribute_id": 7, "name": "color", "values": [{"value": "red", "count": 4}, {"value": "blue", "count": 1}]},
+    ],
+}
+
+
+def _args(**overrides):
+    args = dict(
+        q="iphone",
+        category_id=None,
+        filters=search_filters(),
+        limit=2,
+        offset=0,
+        after=None,
+        pit=None,
+        include_total=False,
+        facets=False,
+        with_source=False,
+    )
+    args.update(overrides)
+    return args
+
+
+# =========================
+# ELASTICSEARCH
+# =========================
+
+async def test_es_query_first_page():
+    es = FakeES(es_response([(10, 2.5), (11, 1.5)], total=5))
+    hits = await ElasticsearchBackend(es).search(None, **_args(offset=4, include_total=True))
+
+    (call,) = es.method_calls("search")
+    assert call["index"] == settings.es.index_alias
+    assert call["from_"] == 4
+    assert call["sort"] == SEARCH_SORT
+    assert call["size"] == 2
+    assert call["track_total_hits"] == settings.es.search_track_total_hits
+    (match,) = call["query"]["bool"]["should"]
+    assert match["multi_match"]["query"] == "iphone"
+    assert call["query"]["bool"]["minimum_should_match"] == 1
+    # Первая страница — без PIT
+    assert not es.method_calls("open_point_in_time")
+
+    assert hits.ids == [10, 11]
+    assert (hits.total, hits.total_relation) == (5, "eq")
+    assert hits.after == [1.5, 11]
+    assert hits.pit is None
+
+
+async def test_es_empty_query_matches_everything():
+    es = FakeES(es_response([]))
+    hits = await ElasticsearchBackend(es).search(None, **_args(q="  "))
+
+    query = es.method_calls("search")[0]["query"]["bool"]
+    assert query["should"] == []
+    assert query["minimum_should_match"] == 0
+    assert hits.ids == [] and hits.after is None and hits.total is None
+
+
+async def test_es_filters():
+    es = FakeES(es_response([]))
+    await ElasticsearchBackend(es).search(None, **_args(category_id=3, filters=FILTERS))
+
+    query = es.method_calls("search")[0]["query"]["bool"]
+    assert {"term": {"category_id": "3"}} in query["filter"]
+    assert {"range": {"retail_price": {"gte": 1000, "lte": 5000}}} in query["filter"]
+    assert {"term": {"in_stock": True}} in query["filter"]
+    (nested,) = [c["nested"] for c in query["filter"] if "nested" in c]
+    assert nested["query"]["bool"]["filter"] == [
+        {"term": {"attributes.attribute_id": 7}},
+        {"term": {"attributes.value": "red"}},
+    ]
+    assert query["must_not"] == [{"term": {"is_active": False}}]
+
+
+async def test_es_include_inactive():
+    es = FakeES(es_response([]))
+    await ElasticsearchBackend(es).search(None, **_args(filters=search_filters(include_inactive=True)))
+
+    assert es.method_calls("search")[0]["query"]["bool"]["must_not"] == []
+
+
+async def test_es_facets():
+    aggs = {
+        "categories": {"buckets": [{"key": "3", "doc_count": 5}, {"key": "4", "doc_count": 2}]},
+        "price_stats": {"min": 1500.0, "max": 4200.0},
+        "price": {"buckets": [{"key": 1000.0, "doc_count": 4}, {"key": 4000.0, "doc_count": 3}]},
+        "in_stock": {"doc_count": 6},
+        "attributes": {
+            "by_attribute": {
+                "buckets": [
+                    {
+                        "key": 7,
+                        "name": {"buckets": [{"key": "meta_color"}]},
+                        "values": {"buckets": [{"key": "red", "doc_count": 4}, {"key": "blue", "doc_count": 1}]},
+                    }
+                ]
+            }
+        },
+    }
+    es = FakeES(es_response([(10, 1.0)], aggregations=aggs))
+    hits = await ElasticsearchBackend(es).search(None, **_args(category_id=3, facets=True))
+
+    call = es.method_calls("search")[0]
+    assert set(call["aggs"]) == {"categories", "price_stats", "price", "in_stock", "attributes"}
+    assert hits.facets == FACETS
+
+
+async def test_es_facets_attributes_only_inside_category():
+    aggs = {
+        "categories": {"buckets": []},
+        "price_stats": {"min": None, "max": None},
+        "price": {"buckets": []},
+        "in_stock": {"doc_count": 0},
+    }
+    es = FakeES(es_response([], aggregations=aggs))
+    hits = await ElasticsearchBackend(es).search(None, **_args(facets=True))
+
+    assert "attributes" not in es.method_calls("search")[0]["aggs"]
+    assert hits.facets == {
+        "categories": [],
+        "price": {"min": None, "max": None, "histogram": []},
+        "in_stock": 0,
+    }
+
+
+async def test_es_suggest():
+    es = FakeES({"hits": {"hits": [{"_id": "5", "_source": {"title": "iPhone 15"}}]}})
+    items = await ElasticsearchBackend(es).suggest(None, prefix="iph", limit=5)
+
+    call = es.method_calls("search")[0]
+    assert call["size"] == 5
+    fields = [next(iter(c["match"])) for c in call["query"]["bool"]["should"]]
+    assert fields == ["title.prefix", "title.prefix_en"]
+    assert call["query"]["bool"]["must_not"] == [{"term": {"is_active": False}}]
+    assert items == [{"id": 5, "title": "iPhone 15"}]
+
+
+@pytest.mark.parametrize(
+    "method, kwargs",
+    [("search", _args()), ("suggest", {"prefix": "iph", "limit": 5})],
+)
+@pytest.mark.parametrize(
+    "error, status",
+    [
+        (BadRequestError("parsing_exception", api_meta(400), {}), 400),
+        (NotFoundError("index_not_found_exception", api_meta(404), {}), 404),
+    ],
+)
+async def test_es_rejected_request_is_query_error(method, kwargs, error, status):
+    backend = ElasticsearchBackend(FakeES(error))
+
+    # Не недоступность: ни SearchUnavailable (деградации), ни сырого ApiError (500)
+    with pytest.raises(SearchQueryError) as exc_info:
+        await getattr(backend, method)(None, **kwargs)
+    assert exc_info.value.status == status
+
+
+# =========================
+# POSTGRES
+# =========================
+
+async def test_pg_query_first_page():
+    session = FakeSession([RankRow(10, 0.9), RankRow(11, 0.4)], 5)
+    hits = await PostgresSearchBackend().search(session, **_args(q="iphone 15 pr", offset=4, include_total=True))
+
+    sql, params = session.sql[0], session.params[0]
+    assert "@@ to_tsquery" in sql and "<%" in sql
+    assert "DESC, products.id \n LIMIT" in sql
+    assert "OFFSET" in sql
+    assert "iphone & 15 & pr:*" in params.values()
+    assert 4 in params.values()
+    assert "products.is_active = true" in sql
+
+    assert hits.ids == [10, 11]
+    assert (hits.total, hits.total_relation) == (5, "eq")
+    assert hits.after == [0.4, 11]
+    assert hits.pit is None
+
+
+async def test_pg_total_is_capped():
+    cap = settings.es.search_track_total_hits
+    session = FakeSession([RankRow(10, 0.9)], cap + 1)
+    hits = await PostgresSearchBackend().search(session, **_args(include_total=True))
+
+    assert "LIMIT" in session.sql[1]
+    assert cap + 1 in session.params[1].values()
+    assert (hits.total, hits.total_relation) == (cap, "gte")
+    assert hits.after is None
+
+
+async def test_pg_empty_query_matches_everything():
+    session = FakeSession([])
+    await PostgresSearchBackend().search(session, **_args(q="  "))
+
+    assert "@@" not in session.sql[0] and "<%" not in session.sql[0]
+
+
+async def test_pg_filters():
+    session = FakeSession([])
+    await PostgresSearchBackend().search(session, **_args(category_id=3, filters=FILTERS))
+
+    sql, params = session.sql[0], session.params[0]
+    assert "products.category_id = %(category_id_1)s" in sql
+    assert "products.retail_price >=" in sql and "products.retail_price <=" in sql
+    assert "coalesce(products.quantity" in sql
+    assert "EXISTS (SELECT" in sql and "product_attribute_values_1.value" in sql
+    assert {3, 1000, 5000, 7, "red"} <= set(params.values())
+
+
+async def test_pg_include_inactive():
+    session = FakeSession([])
+    await PostgresSearchBackend().search(session, **_args(filters=search_filters(include_inactive=True)))
+
+    assert "is_active" not in session.sql[0]
+
+
+async def test_pg_facets():
+    session = FakeSession(
+        [RankRow(10, 0.9)],
+        [(3, 5), (4, 2)],
+        [(1500, 4200, 6)],
+        [(1000, 4), (4000, 3)],
+        [(7, "meta_color", "blue", 1), (7, "meta_color", "red", 4)],
+    )
+    hits = await PostgresSearchBackend().search(session, **_args(category_id=3, filters=FILTERS, facets=True))
+
+    # Фильтры выдачи действуют и на фасеты; EXISTS по атрибуту не цепляется за внешний JOIN
+    for sql in session.sql[1:]:
+        assert "products.category_id =" in sql
+        assert "EXISTS (SELECT" in sql
+    assert hits.facets == FACETS
+
+
+async def test_pg_facets_attributes_only_inside_category():
+    session = FakeSession([], [], [(None, None, 0)], [])
+    hits = await PostgresSearchBackend().search(session, **_args(facets=True))
+
+    assert len(session.sql) == 4
+    assert hits.facets == {
+        "categories": [],
+        "price": {"min": None, "max": None, "histogram": []},
+        "in_stock": 0,
+    }
+
+
+async def test_pg_keyset():
+    session = FakeSession([RankRow(12, 0.3), RankRow(13, 0.3)])
+    hits = await PostgresSearchBackend().search(session, **_args(after=[0.4, 11]))
+
+    sql, params = session.sql[0], session.params[0]
+    assert "OFFSET" not in sql
+    # (rank DESC, id ASC): строго ниже по релевантности или та же релевантность и больший id
+    assert " < %(param_" in sql and "products.id > %(id_1)s" in sql
+    assert 0.4 in params.values() and params["id_1"] == 11
+    assert hits.after == [0.3, 13]
+    assert hits.pit is None
+
+
+async def test_pg_suggest():
+    session = FakeSession([(5, "iPhone 15")])
+    items = await PostgresSearchBackend().suggest(session, prefix="iph_", limit=5)
+
+    sql, params = session.sql[0], session.params[0]
+    assert "ILIKE" in sql and "similarity(products.title" in sql
+    # _ в префиксе — буква, а не шаблон LIKE
+    assert "iph\\_%" in params.values()
+    assert "products.is_active = true" in sql
+    assert items == [{"id": 5, "title": "iPhone 15"}]
+
+
+async def test_pg_suggest_without_words():
+    session = FakeSession()
+    assert await PostgresSearchBackend().suggest(session, prefix="--", limit=5) == []
+    assert session.sql == []
+
+
+async def test_es_msearch_item_errors():
+    es = FakeES({
+        "responses": [
+            es_response([(10, 1.0)]),
+            {"status": 400, "error": {"type": "search_phase_execution_exception", "reason": "bad query"}},
+            {"status": 429, "error": {"type": "es_rejected_execution_exception", "reason": "queue full"}},
+            {"status": 503, "error": {"type": "no_shard_available_action_exception", "reason": "no shard"}},
+        ]
+    })
+    results = await ElasticsearchBackend(es).msearch(None, [_args(limit=5) for _ in range(4)])
+
+    ok, rejected, busy, down = results
+    assert ok.ids == [10]
+    # 4xx — ошибка самого запроса, не недоступность
+    assert isinstance(rejected, SearchQueryError) and rejected.status == 400
+    assert "bad query" in str(rejected)
+    assert isinstance(busy, SearchUnavailable) and isinstance(down, SearchUnavailable)
+    (call,) = es.method_calls("msearch")
+    assert len(call["searches"]) == 8
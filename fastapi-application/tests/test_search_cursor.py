@@ -0,0 +1,50 @@
+"""Проверка курсора поиска (crud/products_search._check_cursor): позиция приходит от клиента."""
+
+import pytest
+from fastapi import HTTPException
+
+from core.search.backend import search_filters
+from core.search.pg_backend import PostgresSearchBackend
+from crud.products_search import _check_cursor
+
+BACKEND = PostgresSearchBackend()
+FILTERS = search_filters()
+
+
+def _cursor(after) -> dict:
+    return {"after": after, "b": BACKEND.name, "q": "iphone", "c": None, "f": FILTERS}
+
+
+@pytest.mark.parametrize("after", [[0.5, 11], [1, 11], [0, 0]])
+def test_valid_position(after):
+    assert _check_cursor(_cursor(after), BACKEND, " iPhone ", None, FILTERS) == [float(after[0]), after[1]]
+
+
+@pytest.mark.parametrize(
+    "after",
+    [
+        None,
+        [0.5],
+        [0.5, 11, 1],
+        ["0.5", 11],
+        [True, 11],
+        [float("nan"), 11],
+        [float("inf"), 11],
+        [0.5, "11"],
+        [0.5, 11.0],
+        [0.5, False],
+        [0.5, -1],
+        [0.5, 2**31],
+        [{"x": 1}, 11],
+    ],
+)
+def test_invalid_position(after):
+    with pytest.raises(HTTPException) as exc:
+        _check_cursor(_cursor(after), BACKEND, "iphone", None, FILTERS)
+    assert exc.value.status_code == 400
+
+
+def test_cursor_of_another_query():
+    with pytest.raises(HTTPException) as exc:
+        _check_cursor(_cursor([0.5, 11]), BACKEND, "samsung", None, FILTERS)
+    assert exc.value.status_code == 400
@@ -0,0 +1,93 @@
+"""
+Keyset-пагинация поиска в ES через search_after + PIT (core/search/es_backend.py)
+и курсор в кэше выдачи (crud/products_search.py): чей PIT, когда открывается
+и когда закрывается.
+"""
+
+import pytest
+from elasticsearch import NotFoundError
+
+import crud.products_search as products_search
+from core.search.backend import SearchHits, search_filters
+from core.search.es_backend import ElasticsearchBackend
+from .conftest import FakeES, api_meta, es_response
+
+pytestmark = pytest.mark.anyio
+
+
+def _args(**overrides):
+    args = dict(
+        q="iphone",
+        category_id=None,
+        filters=search_filters(),
+        limit=2,
+        offset=0,
+        after=None,
+        pit=None,
+        include_total=False,
+        facets=False,
+        with_source=False,
+    )
+    args.update(overrides)
+    return args
+
+
+async def test_es_keyset_opens_pit_from_second_page():
+    es = FakeES(
+        es_response([(12, 1.0), (13, 0.5)], pit_id="pit-1b"),
+        es_response([(14, 0.4)]),
+    )
+    backend = ElasticsearchBackend(es)
+
+    page2 = await backend.search(None, **_args(after=[1.5, 11]))
+    first = es.method_calls("search")[0]
+    assert "index" not in first and "from_" not in first
+    assert first["pit"]["id"] == "pit-1"
+    assert first["search_after"] == [1.5, 11]
+    assert page2.ids == [12, 13]
+    assert page2.after == [0.5, 13]
+    # ES может вернуть обновлённый id PIT — дальше ходим с ним
+    assert page2.pit == "pit-1b"
+
+    page3 = await backend.search(None, **_args(after=page2.after, pit=page2.pit))
+    assert es.method_calls("search")[1]["pit"]["id"] == "pit-1b"
+    assert len(es.method_calls("open_point_in_time")) == 1
+    assert page3.ids == [14]
+    assert page3.after is None
+    # Последняя страница — PIT закрыт сразу, в курсор не попадает
+    assert es.method_calls("close_point_in_time") == [{"id": "pit-1b"}]
+    assert page3.pit is None
+
+
+async def test_es_keyset_reopens_expired_pit():
+    es = FakeES(
+        NotFoundError("search_context_missing_exception", api_meta(404), {}),
+        es_response([(12, 1.0)]),
+    )
+    hits = await ElasticsearchBackend(es).search(None, **_args(after=[1.5, 11], pit="pit-old"))
+
+    first, second = es.method_calls("search")
+    assert first["pit"]["id"] == "pit-old"
+    assert second["pit"]["id"] == "pit-1"
+    assert second["search_after"] == [1.5, 11]
+    assert hits.ids == [12]
+    assert es.method_calls("close_point_in_time") == [{"id": "pit-1"}]
+
+
+async def test_cached_cursor_has_no_pit(monkeypatch):
+    stored = []
+
+    async def store_result(key, ids, total, relation, next_cursor, facets):
+        stored.append(next_cursor)
+
+    monkeypatch.setattr(products_search, "store_result", store_result)
+    backend = ElasticsearchBackend(FakeES())
+    query = products_search._prepare_query(backend, q="iphone", limit=1)
+    page = await products_search._page_from_hits(
+        backend, query, SearchHits(ids=[10], total=None, total_relation=None, after=[1.0, 10], pit="pit-1")
+    )
+
+    # Клиенту — со своим PIT, в общий кэш выдачи — без него
+    assert page.next_cursor["pit"] == "pit-1"
+    assert "pit" not in stored[0]
+    assert stored[0]["after"] == [1.0, 10]
@@ -0,0 +1,80 @@
+"""core/search/reconcile: merge-join Postgres и ES по полю id."""
+
+import contextlib
+
+import pytest
+
+import core.search.reconcile as reconcile
+from .conftest import FakeES
+
+pytestmark = pytest.mark.anyio
+
+
+def _hit(doc_id: str, source: dict) -> dict:
+    return {"_id": doc_id, "_source": source, "sort": [source.get("id", 2**63 - 1)]}
+
+
+class _Redis:
+    def __init__(self) -> None:
+        self.data: dict = {}
+
+    async def set(self, key, value, **kwargs):
+        self.data[key] = value
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    calls = []
+
+    async def db_rows(session, page_size):
+        for row in [(1, "a", "x"), (2, "b", "x"), (3, "c", "x"), (5, "e", "x")]:
+            yield row
+
+    async def sync_products(es, session, ids, partial_ids=()):
+        calls.append((sorted(ids), sorted(partial_ids)))
+        return len(ids) + len(partial_ids), {}
+
+    async def mark_dirty(ids):
+        return None
+
+    monkeypatch.setattr(reconcile, "_db_rows", db_rows)
+    monkeypatch.setattr(reconcile, "sync_products", sync_products)
+    monkeypatch.setattr(reconcile, "mark_dirty", mark_dirty)
+    monkeypatch.setattr(reconcile, "get_redis", lambda: _Redis())
+    return calls
+
+
+@contextlib.asynccontextmanager
+async def _session_factory():
+    yield None
+
+
+async def test_merge_on_id_field(synced):
+    es = FakeES({
+        "hits": {
+            "hits": [
+                _hit("1", {"id": 1, "fp": "a", "fp_dyn": "x"}),
+                # Динамика разъехалась — частичный update
+                _hit("2", {"id": 2, "fp": "b", "fp_dyn": "old"}),
+                # Лишний документ между живыми товарами
+                _hit("4", {"id": 4, "fp": "d", "fp_dyn": "x"}),
+                _hit("5", {"id": 5, "fp": "e", "fp_dyn": "x"}),
+                # Без поля id — в конце выдачи, чиним по _id
+                _hit("3", {"fp": "c", "fp_dyn": "x"}),
+                _hit("junk", {}),
+            ]
+        }
+    })
+    report = await reconcile.reconcile_index(es, _session_factory, repair=True)
+
+    (call,) = es.method_calls("search")
+    assert call["sort"] == [{"id": {"order": "asc", "missing": "_last", "unmapped_type": "long"}}]
+    assert "id" in call["_source"]
+    assert (report["missing"], report["extra"], report["stale"], report["broken"]) == (1, 1, 1, 2)
+    assert report["samples"]["missing"] == [3]
+    assert report["samples"]["extra"] == [4]
+    assert report["samples"]["broken"] == [3, "junk"]
+    assert (report["db"], report["es"]) == (4, 6)
+    # Товар 3 переиндексируется (с полем id), 4 удалится; «junk» sync_products не трогает
+    assert synced == [([3, 4], [2])]
+    assert es.method_calls("close_point_in_time")
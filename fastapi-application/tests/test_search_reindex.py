@@ -0,0 +1,55 @@
+"""core/search/reindex: разбиение каталога на диапазоны id для параллельных потоков."""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import core.search.reindex as reindex
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(
+    "min_id, max_id, parts, expected",
+    [
+        (1, 100, 4, [(1, 25), (26, 50), (51, 75), (76, None)]),
+        (10, 17, 3, [(10, 12), (13, 15), (16, None)]),
+        # Товаров меньше, чем потоков — лишние потоки не запускаем
+        (1, 2, 4, [(1, 1), (2, None)]),
+        (5, 5, 4, [(5, None)]),
+        (1, 100, 1, [(1, None)]),
+        (None, None, 4, []),
+    ],
+)
+def test_id_ranges(min_id, max_id, parts, expected):
+    assert reindex._id_ranges(min_id, max_id, parts) == expected
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.sql: list[str] = []
+
+    async def stream_scalars(self, stmt):
+        self.sql.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+        async def rows():
+            return
+            yield
+
+        return rows()
+
+
+@pytest.mark.parametrize(
+    "id_range, condition",
+    [
+        ((1, 25), "products.id BETWEEN %(id_1)s AND %(id_2)s"),
+        ((76, None), "products.id >= %(id_1)s"),
+    ],
+)
+async def test_partition_is_id_range(id_range, condition):
+    session = _Session()
+    actions = [a async for a in reindex._stream_actions(session, None, id_range, 100)]
+
+    assert actions == []
+    (sql,) = session.sql
+    assert condition in sql
+    assert "%" not in sql.replace("%(", "")
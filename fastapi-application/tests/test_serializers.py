@@ -0,0 +1,123 @@
+"""core/cache/serializers: бинарный формат записей кэша карточек."""
+
+import json
+import zlib
+
+import pytest
+
+import core.cache.serializers as serializers
+from core.cache.serializers import TOMBSTONE, decode_entry, encode_entry, encode_tombstone
+
+CARD = {"id": 42, "title": "iPhone 15", "images": ["a.jpg", "b.jpg"], "attributes": []}
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """Переключает кодек и сжатие записи, как это делает RedisConfig."""
+
+    def use(codec: str = "orjson", compression: str = "none", min_size: int = 0) -> None:
+        monkeypatch.setattr(serializers, "_WRITE_CODEC", serializers._CODECS[codec])
+        monkeypatch.setattr(
+            serializers, "_WRITE_COMPRESSION", serializers._COMPRESSIONS[compression]
+        )
+        monkeypatch.setattr(serializers, "_COMPRESS_MIN_SIZE", min_size)
+
+    return use
+
+
+@pytest.mark.parametrize(
+    "codec, compression, module",
+    [
+        ("orjson", "none", None),
+        ("orjson", "zlib", None),
+        ("orjson", "zstd", "zstandard"),
+        ("orjson", "lz4", "lz4"),
+        ("msgpack", "none", "msgpack"),
+        ("msgpack", "zlib", "msgpack"),
+    ],
+)
+def test_round_trip(writer, codec, compression, module):
+    if module is not None:
+        pytest.importorskip(module)
+    writer(codec, compression)
+    # Тело должно сжиматься, иначе запись уйдёт несжатой
+    data = {**CARD, "description": "x" * 500}
+
+    raw = encode_entry(data, stale_at=100, expire_at=200, delta_ms=35)
+
+    assert raw[0] == serializers.ENTRY_MAGIC
+    assert raw[1] == serializers.ENTRY_FORMAT_V2
+    assert (raw[2] >> 2) & 0x03 == serializers._COMPRESSIONS[compression]
+    assert decode_entry(raw) == (data, 100, 200, 35)
+
+
+def test_small_body_is_not_compressed(writer):
+    writer("orjson", "zlib", min_size=1024)
+    raw = encode_entry(CARD, stale_at=1, expire_at=2)
+
+    assert (raw[2] >> 2) & 0x03 == serializers.COMPRESSION_NONE
+    assert decode_entry(raw) == (CARD, 1, 2, 0)
+
+
+def test_delta_ms_is_clamped(writer):
+    writer()
+    assert decode_entry(encode_entry(CARD, 1, 2, delta_ms=-5))[3] == 0
+    assert decode_entry(encode_entry(CARD, 1, 2, delta_ms=2**40))[3] == 0xFFFFFFFF
+
+
+def test_v1_entry_has_no_delta():
+    body = zlib.compress(json.dumps(CARD).encode())
+    flags = serializers.CODEC_JSON | (serializers.COMPRESSION_ZLIB << 2)
+    raw = serializers._HEADER_V1.pack(
+        serializers.ENTRY_MAGIC, serializers.ENTRY_FORMAT_V1, flags, 10, 20
+    ) + body
+
+    assert decode_entry(raw) == (CARD, 10, 20, 0)
+
+
+def test_tombstone():
+    raw = encode_tombstone(stale_at=5, expire_at=9)
+
+    assert len(raw) == serializers._HEADER_V2.size
+    data, stale_at, expire_at, delta_ms = decode_entry(raw)
+    assert data is TOMBSTONE
+    assert (stale_at, expire_at, delta_ms) == (5, 9, 0)
+
+
+@pytest.mark.parametrize("as_str", [False, True])
+def test_legacy_json_entry(as_str):
+    raw = json.dumps({"data": CARD, "stale_at": 7, "expire_at": 8})
+
+    assert decode_entry(raw if as_str else raw.encode()) == (CARD, 7, 8, 0)
+
+
+@pytest.mark.parametrize("raw", [None, b"", ""])
+def test_empty_is_miss(raw):
+    assert decode_entry(raw) == (None, None, None, 0)
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        pytest.param(lambda raw: raw[:5], id="truncated-header"),
+        pytest.param(lambda raw: raw[:-3], id="truncated-body"),
+        pytest.param(lambda raw: raw[:1] + b"\x09" + raw[2:], id="unknown-format"),
+        pytest.param(lambda raw: raw[:2] + b"\x03" + raw[3:], id="wrong-flags"),
+        pytest.param(lambda raw: b"{not json", id="broken-legacy"),
+    ],
+)
+def test_corrupt_entry_is_miss(writer, corrupt):
+    writer("orjson", "zlib")
+    raw = encode_entry({**CARD, "description": "x" * 500}, 1, 2)
+
+    assert decode_entry(corrupt(raw)) == (None, None, None, 0)
+
+
+def test_missing_library_is_miss(writer, monkeypatch):
+    pytest.importorskip("zstandard")
+    writer("orjson", "zstd")
+    raw = encode_entry({**CARD, "description": "x" * 500}, 1, 2)
+
+    # Запись от инстанса с zstandard читает инстанс без него — промах, не 500
+    monkeypatch.setattr(serializers, "zstandard", None)
+    assert decode_entry(raw) == (None, None, None, 0)
@@ -0,0 +1,35 @@
+"""
+Непрозрачные курсоры для keyset-пагинации.
+Клиент получает строку `next_cursor` и передаёт её обратно как есть —
+внутреннее устройство курсора (ключ сортировки) наружу не торчит.
+"""
+
+import base64
+import json
+from typing import Any
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+    """
+    >>> encode_cursor({"id": 42})
+    'eyJpZCI6NDJ9'
+    """
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """
+    >>> decode_cursor("eyJpZCI6NDJ9")
+    {'id': 42}
+
+    Бросает ValueError, если курсор повреждён.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as exc:
+        raise ValueError("Невалидный курсор") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("Невалидный курсор")
+    return payload
@@ -56,6 +56,15 @@ export async function getProductById(productId: number | string) {
   }
 }
 
+// Получение нескольких карточек товаров одним запросом (до 200 id)
+export async function getProductsBatch(ids: Array<number | string>) {
+  if (ids.length === 0) return { items: [], missing: [] };
+  const response = await api.get("/products/batch", {
+    params: { ids: ids.join(",") },
+  });
+  return response.data as { items: any[]; missing: number[] };
+}
+
 // Создание нового товара
 export async function createProduct(data: {
   title: string;